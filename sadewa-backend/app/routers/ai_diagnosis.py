@@ -8,7 +8,7 @@ import time
 import json
 import hashlib
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Tuple, Union
 from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
 from sqlalchemy import text
 from sqlalchemy.orm import Session
@@ -17,6 +17,15 @@ from pydantic import BaseModel, Field, validator
 from enum import Enum
 
 from app.database import get_db
+from services.allergen_index import allergen_index
+from services.drug_canonicalizer import drug_canonicalizer
+from services.icd_contraindications import contraindication_engine
+from services.interaction_cache import interaction_cache, max_severity
+from services.interaction_index import interaction_index
+from services.interaction_matrix import interaction_matrix
+from services.knowledge_base import knowledge_base
+from services.patient_context import patient_context_loader
+from services.single_flight import drug_interaction_flight
 import logging
 import asyncio
 import aiohttp
@@ -124,82 +133,27 @@ class AIAnalysisResponse(BaseModel):
 
 # ===== UTILITY FUNCTIONS =====
 
-def generate_drug_combination_hash(medications: List[str]) -> str:
-    """Generate hash untuk drug combination caching"""
-    sorted_meds = sorted([med.lower().strip() for med in medications])
-    combined = "|".join(sorted_meds)
+def generate_drug_combination_hash(
+    medications: List[str], patient_context: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Generate hash untuk drug combination caching (berbasis drug ID kanonik).
+    Stamp knowledge base obat-obat tersebut ikut di-hash: edit interaksi/formularium
+    obat ini membuat cache lama tidak terbaca, kombinasi obat lain tidak terpengaruh.
+    Hasil dengan patient_id memuat alergi & kontraindikasi pasien, sehingga konteks
+    pasien (ID, alergi, riwayat medis) juga ikut di-hash.
+    """
+    sorted_meds = sorted(drug_canonicalizer.canonical_ids(medications))
+    combined = "|".join(sorted_meds) + "#" + knowledge_base.stamp(medications)
+    if patient_context is not None:
+        combined += "#" + json.dumps(patient_context, sort_keys=True, default=str)
     return hashlib.md5(combined.encode()).hexdigest()
 
-async def get_cached_interaction_result(
-    drug_hash: str,
-    db: Session
-) -> Optional[Dict[str, Any]]:
-    """Get cached drug interaction result"""
-    try:
-        cache_query = text("""
-            SELECT interaction_result, severity_max, last_checked
-            FROM drug_interaction_cache
-            WHERE drug_combination_hash = :hash
-            AND expiry_date > NOW()
-            LIMIT 1
-        """)
-        
-        cached = db.execute(cache_query, {"hash": drug_hash}).fetchone()
-        
-        if cached:
-            return {
-                "result": json.loads(cached.interaction_result),
-                "severity_max": cached.severity_max,
-                "last_checked": cached.last_checked
-            }
-        
-        return None
-        
-    except Exception as e:
-        logger.error(f"Error getting cached result: {e}")
-        return None
-
-async def save_interaction_cache(
-    drug_hash: str,
-    medications: List[str],
-    interaction_result: Dict[str, Any],
-    severity_max: str,
-    db: Session
-):
-    """Save interaction result to cache"""
-    try:
-        # Set cache expiry (7 days)
-        expiry_date = datetime.now() + timedelta(days=7)
-        
-        cache_query = text("""
-            INSERT INTO drug_interaction_cache 
-            (drug_combination_hash, drug_names, interaction_result, severity_max, expiry_date)
-            VALUES (:hash, :drugs, :result, :severity, :expiry)
-            ON DUPLICATE KEY UPDATE 
-                interaction_result = :result,
-                severity_max = :severity,
-                last_checked = NOW(),
-                expiry_date = :expiry
-        """)
-        
-        db.execute(cache_query, {
-            "hash": drug_hash,
-            "drugs": json.dumps(medications),
-            "result": json.dumps(interaction_result),
-            "severity": severity_max,
-            "expiry": expiry_date
-        })
-        db.commit()
-        
-    except Exception as e:
-        logger.error(f"Error saving cache: {e}")
-        db.rollback()
-
-async def analyze_drug_interactions_db(
+async def _analyze_drug_interactions_pairwise(
     medications: List[str],
     db: Session
 ) -> List[DrugInteractionResult]:
-    """Analyze drug interactions using database"""
+    """Analyze drug interactions using one database query per medication pair"""
     interactions = []
     
     try:
@@ -234,10 +188,8 @@ async def analyze_drug_interactions_db(
                     AND is_active = 1
                 """)
                 
-                drug1_pattern = f"%{drug_1.lower()}%"
-                drug2_pattern = f"%{drug_2.lower()}%"
-                drug1_partial = f"%{drug_1.lower()[:5]}%" if len(drug_1) > 5 else drug1_pattern
-                drug2_partial = f"%{drug_2.lower()[:5]}%" if len(drug_2) > 5 else drug2_pattern
+                drug1_pattern, drug1_partial = _drug_like_patterns(drug_1)
+                drug2_pattern, drug2_partial = _drug_like_patterns(drug_2)
                 
                 results = db.execute(interaction_query, {
                     "drug1": drug1_pattern,
@@ -250,7 +202,7 @@ async def analyze_drug_interactions_db(
                     interactions.append(DrugInteractionResult(
                         drug_1=result.drug_1,
                         drug_2=result.drug_2,
-                        severity=InteractionSeverity(result.severity),
+                        severity=InteractionSeverity(str(result.severity).upper()),
                         description=result.description or "Interaksi obat terdeteksi",
                         mechanism=result.mechanism,
                         clinical_effect=result.clinical_effect,
@@ -264,6 +216,169 @@ async def analyze_drug_interactions_db(
         logger.error(f"Error analyzing drug interactions: {e}")
         return []
 
+def _drug_like_patterns(drug: str) -> Tuple[str, str]:
+    """Build the (full, canonical) LIKE patterns used to match a medication name"""
+    pattern = f"%{drug.lower()}%"
+    canonical = f"%{_longest_token(drug_canonicalizer.canonical_id(drug))}%"
+    return pattern, canonical
+
+def _longest_token(name: str) -> str:
+    """Most selective token of a normalized drug name (for SQL prefiltering)"""
+    return max(name.split(), key=len) if name.split() else name
+
+async def _analyze_drug_interactions_batched(
+    medications: List[str],
+    db: Session
+) -> List[DrugInteractionResult]:
+    """
+    Analyze drug interactions for all medication pairs with a single query.
+
+    Medications and interaction rows are resolved to canonical drug IDs; one
+    round trip prefilters candidate rows from both interaction tables by the
+    aliases of the prescribed drugs, and pairs are matched in memory by ID.
+    Pair order, row order and the per-pair UNION de-duplication follow the
+    pairwise mode.
+    """
+    interactions = []
+    
+    try:
+        drugs = [med.strip() for med in medications]
+        if len(drugs) < 2:
+            return interactions
+        
+        drug_ids = drug_canonicalizer.canonical_ids(drugs)
+        unique_patterns = list(dict.fromkeys(
+            f"%{_longest_token(alias)}%"
+            for drug_id in dict.fromkeys(drug_ids)
+            for alias in drug_canonicalizer.aliases(drug_id)
+        ))
+        params = {f"p{k}": pattern for k, pattern in enumerate(unique_patterns)}
+        
+        def any_pattern(column: str) -> str:
+            return " OR ".join(f"LOWER({column}) LIKE :p{k}" for k in range(len(unique_patterns)))
+        
+        candidates_query = text(f"""
+            SELECT 
+                0 as source_order, id, drug_a as drug_1, drug_b as drug_2, severity, description,
+                recommendation, NULL as mechanism, NULL as clinical_effect, NULL as evidence_level,
+                is_active
+            FROM simple_drug_interactions 
+            WHERE ({any_pattern("drug_a")}) AND ({any_pattern("drug_b")})
+            
+            UNION ALL
+            
+            SELECT 
+                1 as source_order, id, drug_1, drug_2, severity, description,
+                recommendation, mechanism, clinical_effect, evidence_level,
+                is_active
+            FROM drug_interactions 
+            WHERE ({any_pattern("drug_1")}) AND ({any_pattern("drug_2")})
+            
+            ORDER BY source_order, id
+        """)
+        
+        candidates = db.execute(candidates_query, params).fetchall()
+        
+        # (drug_1 ID, drug_2 ID) -> candidate positions, resolved once per row
+        by_pair: Dict[Tuple[str, str], List[int]] = {}
+        for position, row in enumerate(candidates):
+            key = (drug_canonicalizer.canonical_id(row.drug_1 or ""),
+                   drug_canonicalizer.canonical_id(row.drug_2 or ""))
+            by_pair.setdefault(key, []).append(position)
+        
+        for i in range(len(drugs)):
+            for j in range(i + 1, len(drugs)):
+                id_1, id_2 = drug_ids[i], drug_ids[j]
+                # Same precedence as the pairwise query: the is_active
+                # filter only binds to the reversed-direction branch
+                positions = set(by_pair.get((id_1, id_2), []))
+                positions.update(
+                    k for k in by_pair.get((id_2, id_1), []) if candidates[k].is_active == 1
+                )
+                
+                seen = set()
+                for position in sorted(positions):
+                    row = candidates[position]
+                    # UNION (not UNION ALL) semantics within a pair
+                    row_key = (
+                        row.drug_1, row.drug_2, row.severity, row.description, row.recommendation,
+                        row.mechanism, row.clinical_effect, row.evidence_level
+                    )
+                    if row_key in seen:
+                        continue
+                    seen.add(row_key)
+                    
+                    interactions.append(DrugInteractionResult(
+                        drug_1=row.drug_1,
+                        drug_2=row.drug_2,
+                        severity=InteractionSeverity(str(row.severity).upper()),
+                        description=row.description or "Interaksi obat terdeteksi",
+                        mechanism=row.mechanism,
+                        clinical_effect=row.clinical_effect,
+                        recommendation=row.recommendation,
+                        evidence_level=row.evidence_level
+                    ))
+        
+        return interactions
+        
+    except Exception as e:
+        logger.error(f"Error analyzing drug interactions (batched): {e}")
+        return []
+
+async def _analyze_drug_interactions_matrix(
+    medications: List[str]
+) -> List[DrugInteractionResult]:
+    """
+    Analyze drug interactions with the precomputed pairwise severity matrix.
+
+    Both interaction tables are already loaded (interaction index + knowledge
+    base); all pairs are checked with one vectorized lookup and the text comes
+    from the matrix side table. Returns the same rows, in the same order (pair
+    order, then simple_drug_interactions before drug_interactions by id, duplicates
+    within a pair dropped), as _analyze_drug_interactions_batched, with one
+    deliberate difference: inactive rows are never returned, while the batched
+    query's operator precedence lets inactive rows through in the drug_1 -> drug_2
+    direction. Class rules from drug_classes.json are not included here.
+    """
+    try:
+        drugs = [med.strip() for med in medications]
+        if len(drugs) < 2:
+            return []
+        
+        return [
+            DrugInteractionResult(
+                drug_1=row.get("drug_a"),
+                drug_2=row.get("drug_b"),
+                severity=InteractionSeverity(str(row.get("severity", "MODERATE")).upper()),
+                description=row.get("description") or "Interaksi obat terdeteksi",
+                mechanism=row.get("mechanism"),
+                clinical_effect=row.get("clinical_effect"),
+                recommendation=row.get("recommendation"),
+                evidence_level=row.get("evidence_level")
+            )
+            for row in interaction_matrix.find_interactions(drugs, include_rules=False)
+        ]
+        
+    except Exception as e:
+        logger.error(f"Error analyzing drug interactions (matrix): {e}")
+        return []
+
+async def analyze_drug_interactions_db(
+    medications: List[str],
+    db: Session,
+    batched: bool = True
+) -> List[DrugInteractionResult]:
+    """Analyze drug interactions (interaction matrix, else a single batched query by default)"""
+    # The matrix is only authoritative when both tables were loaded from the database
+    matrix_complete = (
+        knowledge_base.simple_rows_loaded and interaction_index.source == "database"
+    )
+    if batched and interaction_matrix.enabled and matrix_complete:
+        return await _analyze_drug_interactions_matrix(medications)
+    if batched:
+        return await _analyze_drug_interactions_batched(medications, db)
+    return await _analyze_drug_interactions_pairwise(medications, db)
+
 async def get_patient_allergies(patient_id: int, db: Session) -> List[str]:
     """Get patient allergies"""
     try:
@@ -279,22 +394,55 @@ async def get_patient_allergies(patient_id: int, db: Session) -> List[str]:
         logger.error(f"Error getting patient allergies: {e}")
         return []
 
+async def get_patient_medical_history(patient_id: int, db: Session) -> List[str]:
+    """Get patient medical history (diagnoses) for contraindication checking"""
+    patient_query = text("""
+        SELECT medical_history FROM patients 
+        WHERE id = :patient_id
+    """)
+    patient_data = db.execute(patient_query, {"patient_id": patient_id}).fetchone()
+
+    medical_history = []
+    if patient_data and patient_data.medical_history:
+        try:
+            history_data = json.loads(patient_data.medical_history)
+            medical_history = history_data.get("medical_history", [])
+        except:
+            pass
+    return medical_history
+
+async def get_patient_diagnosis_codes(patient_id: int, db: Session) -> List[str]:
+    """Get patient ICD-10 diagnosis codes (patient_diagnoses) for contraindication checking"""
+    try:
+        patient_context = patient_context_loader.load(db, str(patient_id))
+    except Exception as e:
+        logger.error(f"Error getting patient diagnosis codes: {e}")
+        db.rollback()
+        return []
+    if not patient_context:
+        return []
+    return [code for code in patient_context.get("diagnoses_icd10") or [] if code]
+
 async def check_contraindications(
     medications: List[str],
     patient_allergies: List[str],
-    medical_history: List[str]
+    diagnosis_codes: List[str]
 ) -> List[str]:
     """Check for contraindications"""
     contraindications = []
     
-    # Check allergy contraindications
-    for med in medications:
-        for allergy in patient_allergies:
-            if allergy.lower() in med.lower() or med.lower() in allergy.lower():
-                contraindications.append(f"ALERGI: {med} - pasien alergi terhadap {allergy}")
+    # Check allergy contraindications (canonical drug ID + drug class cross-reactivity)
+    for hit in allergen_index.screen(medications, patient_allergies):
+        if hit.level == "direct":
+            contraindications.append(f"ALERGI: {hit.medication} - pasien alergi terhadap {hit.allergen}")
+        else:
+            contraindications.append(
+                f"ALERGI ({hit.class_name}): {hit.medication} - kemungkinan reaksi silang dengan {hit.allergen}"
+            )
     
-    # Add more contraindication logic here based on medical history
-    # This would be expanded with more comprehensive rules
+    # Drug-disease contraindications from the formulary (patient ICD-10 diagnosis codes)
+    for hit in contraindication_engine.check(medications, diagnosis_codes):
+        contraindications.append(f"KONTRAINDIKASI: {hit.medication} - {hit.to_dict()['reason']}")
     
     return contraindications
 
@@ -387,91 +535,114 @@ async def analyze_drug_interactions(
     
     try:
         # 1. Generate cache hash
-        drug_hash = generate_drug_combination_hash(request.medications)
+        drug_canonicalizer.ensure_fresh(db)
+        knowledge_base.ensure_fresh(db, refresh_index=True)
+        
+        # Patient context is part of the cached result, so it is part of the key too
+        patient_allergies = []
+        medical_history = []
+        diagnosis_codes = []
+        patient_context = None
+        if request.patient_id:
+            patient_allergies = await get_patient_allergies(request.patient_id, db)
+            medical_history = await get_patient_medical_history(request.patient_id, db)
+            # Contraindications are matched on ICD-10 codes; history entries that are
+            # themselves codes count too, free text ("Hipertensi") is ignored by the engine
+            diagnosis_codes = await get_patient_diagnosis_codes(request.patient_id, db)
+            diagnosis_codes += [str(entry) for entry in medical_history]
+            patient_context = {
+                "patient_id": request.patient_id,
+                "allergies": sorted(str(allergy) for allergy in patient_allergies),
+                "medical_history": sorted(str(entry) for entry in medical_history),
+                "diagnosis_codes": sorted(set(diagnosis_codes))
+            }
+        drug_hash = generate_drug_combination_hash(request.medications, patient_context)
         
         # 2. Check cache if enabled
         cached_result = None
         if request.include_cache:
-            cached_result = await get_cached_interaction_result(drug_hash, db)
+            cached_result = await interaction_cache.get_async(drug_hash, db)
         
         if cached_result:
-            # Return cached result
+            # Return cached result (copy: L1 entries are shared between requests)
             processing_time = (time.time() - start_time) * 1000
-            cached_result["result"]["processing_time_ms"] = processing_time
-            cached_result["result"]["cache_used"] = True
+            cached_result = {
+                **cached_result,
+                "processing_time_ms": processing_time,
+                "cache_used": True,
+                # Cache key is per canonical drug ID, echo this request's spelling
+                "input_medications": request.medications
+            }
             
             logger.info(f"Drug interaction analysis completed from cache in {processing_time:.2f}ms")
-            return DrugInteractionResponse(**cached_result["result"])
-        
-        # 3. Analyze interactions from database
-        interactions = await analyze_drug_interactions_db(request.medications, db)
-        
-        # 4. Get patient-specific data if patient_id provided
-        patient_allergies = []
-        contraindications = []
-        
-        if request.patient_id:
-            patient_allergies = await get_patient_allergies(request.patient_id, db)
-            
-            # Get medical history for contraindication checking
-            patient_query = text("""
-                SELECT medical_history FROM patients 
-                WHERE id = :patient_id
-            """)
-            patient_data = db.execute(patient_query, {"patient_id": request.patient_id}).fetchone()
-            
-            medical_history = []
-            if patient_data and patient_data.medical_history:
-                try:
-                    history_data = json.loads(patient_data.medical_history)
-                    medical_history = history_data.get("medical_history", [])
-                except:
-                    pass
-            
-            contraindications = await check_contraindications(
-                request.medications, 
-                patient_allergies, 
-                medical_history
-            )
-        
-        # 5. Calculate risk metrics
-        high_risk_count = len([i for i in interactions if i.severity == InteractionSeverity.MAJOR])
-        
-        # 6. Prepare AI analysis if interactions found
-        ai_analysis = None
-        if interactions or contraindications:
-            ai_input = {
-                "medications": request.medications,
-                "interactions_found": len(interactions),
+            return DrugInteractionResponse(**cached_result)
+        
+        async def run_analysis() -> Dict[str, Any]:
+            # 3. Analyze interactions from database
+            interactions = await analyze_drug_interactions_db(request.medications, db)
+        
+            # 4. Patient-specific contraindications if patient_id provided
+            contraindications = []
+        
+            if request.patient_id:
+                contraindications = await check_contraindications(
+                    request.medications, 
+                    patient_allergies, 
+                    diagnosis_codes
+                )
+        
+            # 5. Calculate risk metrics
+            high_risk_count = len([i for i in interactions if i.severity == InteractionSeverity.MAJOR])
+        
+            # 6. Prepare AI analysis if interactions found
+            ai_input = None
+            ai_analysis = None
+            if interactions or contraindications:
+                ai_input = {
+                    "medications": request.medications,
+                    "interactions_found": len(interactions),
+                    "contraindications": contraindications,
+                    "patient_allergies": patient_allergies
+                }
+                ai_analysis = await call_ai_analysis(ai_input, "drug_interaction")
+        
+            # 7. Prepare response
+            response_data = {
+                "input_medications": request.medications,
+                "total_interactions": len(interactions),
+                "high_risk_interactions": high_risk_count,
+                "interactions": interactions,
+                "patient_allergies": patient_allergies,
                 "contraindications": contraindications,
-                "patient_allergies": patient_allergies
+                "processing_time_ms": (time.time() - start_time) * 1000,
+                "cache_used": False,
+                "ai_analysis": ai_analysis
             }
-            ai_analysis = await call_ai_analysis(ai_input, "drug_interaction")
-        
-        # 7. Prepare response
-        response_data = {
-            "input_medications": request.medications,
-            "total_interactions": len(interactions),
-            "high_risk_interactions": high_risk_count,
-            "interactions": interactions,
-            "patient_allergies": patient_allergies,
-            "contraindications": contraindications,
-            "processing_time_ms": (time.time() - start_time) * 1000,
-            "cache_used": False,
-            "ai_analysis": ai_analysis
-        }
-        
-        # 8. Save to cache (background task)
-        if len(interactions) > 0:
-            severity_max = max([i.severity.value for i in interactions])
-            background_tasks.add_task(
-                save_interaction_cache,
-                drug_hash,
-                request.medications,
-                response_data,
-                severity_max,
-                db
-            )
+            return {"response_data": response_data, "ai_input": ai_input, "ai_analysis": ai_analysis}
+
+        # Identical concurrent requests share one analysis; only the first one schedules cache/log writes
+        analysis, shared = await drug_interaction_flight.do(drug_hash, run_analysis)
+        response_data = analysis["response_data"]
+        interactions = response_data["interactions"]
+        ai_input = analysis["ai_input"]
+        ai_analysis = analysis["ai_analysis"]
+        if shared:
+            logger.info(f"Coalesced identical in-flight drug interaction analysis {drug_hash}")
+            return DrugInteractionResponse(**{
+                **response_data,
+                "input_medications": request.medications,
+                "processing_time_ms": (time.time() - start_time) * 1000
+            })
+
+        # 8. Save to cache (L1 now, L2 write-behind); "no interactions" is cached too
+        interaction_cache.set(
+            drug_hash,
+            response_data,
+            drug_names=request.medications,
+            severity_max=max_severity(i.severity for i in interactions),
+            ttl=timedelta(days=7),
+            negative=not interactions
+        )
         
         # 9. Log AI analysis (background task)
         if request.patient_id and ai_analysis:
@@ -3,6 +3,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
 from app.database import engine
 from sqlalchemy import text
+from services.drug_canonicalizer import drug_canonicalizer
+from services.interaction_matrix import interaction_matrix
 import time
 
 router = APIRouter()
@@ -213,9 +215,19 @@ async def check_drug_interactions(drug_names: str = Query(..., description="Comm
             }
         
         with engine.connect() as connection:
+            drug_canonicalizer.ensure_fresh(connection)
+            
             # Validate drugs exist in database
             validated_drugs = []
             for drug_name in drugs:
+                # Known drugs resolve from the in-memory dictionary
+                database_name = drug_canonicalizer.database_name(
+                    drug_canonicalizer.canonical_id(drug_name)
+                )
+                if database_name:
+                    validated_drugs.append(database_name)
+                    continue
+                
                 search_query = text("""
                     SELECT nama_obat, nama_obat_internasional
                     FROM drugs 
@@ -232,7 +244,7 @@ async def check_drug_interactions(drug_names: str = Query(..., description="Comm
                 else:
                     validated_drugs.append(drug_name)  # Keep original if not found
         
-        # Check for known interactions using pattern matching
+        # Check for known interactions using the indexed interaction matrix
         interactions = generate_interaction_warnings(validated_drugs)
         
         return {
@@ -240,7 +252,7 @@ async def check_drug_interactions(drug_names: str = Query(..., description="Comm
             "validated_drugs": validated_drugs,
             "interactions_found": len(interactions),
             "interactions": interactions,
-            "analysis_source": "pattern_matching"
+            "analysis_source": "interaction_matrix"
         }
         
     except Exception as e:
@@ -319,113 +331,30 @@ async def validate_drug_names(drug_names: str = Query(..., description="Comma-se
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 def generate_interaction_warnings(drug_names: List[str]) -> List[dict]:
-    """Generate interaction warnings based on drug patterns"""
+    """Generate interaction warnings from the precomputed interaction matrix"""
     interactions = []
-    drug_names_lower = [name.lower() for name in drug_names]
-    
-    # Known interaction patterns
-    interaction_patterns = [
-        {
-            "drugs": ["warfarin", "ibuprofen"],
-            "severity": "Major",
-            "description": "Increased bleeding risk with concurrent use",
-            "recommendation": "Avoid concurrent use. Consider paracetamol as alternative.",
-            "mechanism": "Warfarin anticoagulant effect enhanced by NSAID"
-        },
-        {
-            "drugs": ["warfarin", "aspirin"],
-            "severity": "Major",
-            "description": "Significantly increased bleeding risk",
-            "recommendation": "Avoid concurrent use unless closely monitored.",
-            "mechanism": "Dual antiplatelet/anticoagulant effect"
-        },
-        {
-            "drugs": ["clopidogrel", "omeprazole"],
-            "severity": "Moderate", 
-            "description": "Omeprazole may reduce effectiveness of Clopidogrel",
-            "recommendation": "Consider alternative PPI (pantoprazole) or H2 blocker.",
-            "mechanism": "CYP2C19 inhibition reduces clopidogrel activation"
-        },
-        {
-            "drugs": ["simvastatin", "amlodipine"],
-            "severity": "Moderate",
-            "description": "Increased statin levels, risk of myopathy",
-            "recommendation": "Limit simvastatin dose to 20mg daily.",
-            "mechanism": "CYP3A4 inhibition increases statin exposure"
-        },
-        {
-            "drugs": ["metformin", "furosemide"],
-            "severity": "Moderate",
-            "description": "Risk of lactic acidosis in dehydration",
-            "recommendation": "Monitor kidney function and hydration status.",
-            "mechanism": "Diuretic may worsen kidney function"
-        }
-    ]
-    
-    # Check each pattern
-    for pattern in interaction_patterns:
-        # Check if all drugs in pattern are present
-        pattern_matches = []
-        for pattern_drug in pattern["drugs"]:
-            matching_input = None
-            for input_drug in drug_names:
-                if pattern_drug in input_drug.lower():
-                    matching_input = input_drug
-                    break
-            
-            if matching_input:
-                pattern_matches.append(matching_input)
-        
-        # If we found matches for all drugs in the pattern
-        if len(pattern_matches) == len(pattern["drugs"]):
-            interactions.append({
-                "drug_a": pattern_matches[0],
-                "drug_b": pattern_matches[1],
-                "severity": pattern["severity"],
-                "description": pattern["description"],
-                "recommendation": pattern["recommendation"],
-                "mechanism": pattern["mechanism"],
-                "pattern_matched": pattern["drugs"]
-            })
-    
-    # Add category-based interactions (NSAIDs + anticoagulants, etc.)
-    nsaids = ["ibuprofen", "diclofenac", "naproxen", "celecoxib", "meloxicam"]
-    anticoagulants = ["warfarin", "heparin", "rivaroxaban", "apixaban", "dabigatran"]
+    seen_ids = set()
     
-    found_nsaid = None
-    found_anticoag = None
-    
-    for drug in drug_names_lower:
-        if not found_nsaid:
-            for nsaid in nsaids:
-                if nsaid in drug:
-                    found_nsaid = next(d for d in drug_names if nsaid in d.lower())
-                    break
-        
-        if not found_anticoag:
-            for anticoag in anticoagulants:
-                if anticoag in drug:
-                    found_anticoag = next(d for d in drug_names if anticoag in d.lower())
-                    break
-    
-    # Add generic NSAID-anticoagulant warning if not already covered
-    if found_nsaid and found_anticoag:
-        # Check if this interaction is not already in the list
-        already_exists = any(
-            (i["drug_a"] == found_nsaid and i["drug_b"] == found_anticoag) or
-            (i["drug_a"] == found_anticoag and i["drug_b"] == found_nsaid)
-            for i in interactions
-        )
-        
-        if not already_exists:
-            interactions.append({
-                "drug_a": found_nsaid,
-                "drug_b": found_anticoag,
-                "severity": "Major",
-                "description": "NSAIDs increase bleeding risk when used with anticoagulants",
-                "recommendation": "Avoid concurrent use. Consider paracetamol for pain relief.",
-                "mechanism": "Enhanced anticoagulant effect and GI bleeding risk",
-                "interaction_type": "category_based"
-            })
+    # Satu lookup vektor atas matriks pasangan (knowledge base + rule kelas obat)
+    for i, j, rows in interaction_matrix.pair_interactions(drug_names):
+        for row in rows:
+            # Satu warning per pasangan obat input per row interaksi
+            key = (drug_names[i].lower(), drug_names[j].lower(), row.get("description"))
+            if key in seen_ids:
+                continue
+            seen_ids.add(key)
+            warning = {
+                "drug_a": drug_names[i],
+                "drug_b": drug_names[j],
+                "severity": row.get("severity"),
+                "description": row.get("description"),
+                "recommendation": row.get("recommendation"),
+                "mechanism": row.get("mechanism"),
+            }
+            if row.get("interaction_type") == "category_based":
+                warning["interaction_type"] = "category_based"
+            if row.get("rule"):
+                warning["rule"] = row["rule"]
+            interactions.append(warning)
     
-    return interactions
\ No newline at end of file
+    return interactions
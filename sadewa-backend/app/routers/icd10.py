@@ -1,6 +1,8 @@
 """
 ICD-10 router dengan database integration
 Menggunakan table icds yang sudah ada dengan 10,469 records
+Pencarian dijawab dari index n-gram di memori (services/icd10_index.py);
+query LIKE ke database hanya dipakai jika index belum bisa dimuat.
 """
 import time
 from typing import List
@@ -12,6 +14,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import ICD10
 from app.schemas import ICD10Result
+from services.icd10_index import icd10_index
 
 router = APIRouter()
 
@@ -29,10 +32,23 @@ async def search_icd10(
     - Kode ICD-10 (code)
     - Nama diagnosis bahasa Indonesia (name_id)
     - Nama diagnosis bahasa Inggris (name_en)
+
+    Hasil diurutkan: prefix kode, prefix kata, lalu substring.
     """
     start_time = time.time()
 
     try:
+        icd10_index.ensure_fresh(db)
+        if icd10_index.loaded:
+            icd_results = [
+                ICD10Result(code=hit["code"], name_id=hit["name_id"], name_en=hit["name_en"])
+                for hit in icd10_index.search(q, limit)
+            ]
+            processing_time = time.time() - start_time
+            print(f"✅ ICD-10 search '{q}' returned {len(icd_results)} results "
+                  f"in {processing_time * 1000:.2f}ms (index)")
+            return icd_results
+
         # Query dengan LIKE search pada semua field
         search_pattern = f"%{q.lower()}%"
 
@@ -78,6 +94,11 @@ async def get_icd10_by_code(
     Get specific ICD-10 diagnosis by code
     """
     try:
+        icd10_index.ensure_fresh(db)
+        hit = icd10_index.get(icd_code.upper())
+        if hit:
+            return ICD10Result(**hit)
+
         result = db.query(ICD10).filter(ICD10.code == icd_code.upper()).first()
 
         if not result:
@@ -115,6 +136,7 @@ async def get_icd10_statistics(db: Session = Depends(get_db)):
         return {
             "total_icd10_codes": total_codes,
             "database_status": "active",
+            "search_index": icd10_index.stats(),
             "sample_codes": [
                 {
                     "code": code.code,
@@ -11,95 +11,74 @@ import json
 import os
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 # Database imports
+from app import database
 from app.database import get_db
-from app.models import Patient, PatientMedication, PatientDiagnosis, DrugInteraction, PatientAllergy
+from app.models import Patient
 
 # Third-party imports
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session
 
 # Local application imports
 from app.schemas import InteractionRequest, InteractionResponse, GroqTestResponse
 from services.groq_service import groq_service
+from services.deadline import Deadline
+from services.drug_canonicalizer import drug_canonicalizer
+from services.interaction_cache import interaction_cache, max_severity
+from services.allergen_index import allergen_index
+from services.clinical_rules import clinical_rules
+from services.icd_contraindications import contraindication_engine
+from services.interaction_index import interaction_index
+from services.knowledge_base import knowledge_base
+from services.patient_context import patient_context_loader
+from services.precompute import PRECOMPUTE_LLM, PRECOMPUTE_LLM_TIMEOUT
+from services.rule_engine import rule_engine
+from services.single_flight import interaction_analysis_flight
+from services.term_scanner import term_scanner
 
 router = APIRouter()
 
-# Simple in-memory cache for optimization (production: use Redis)
-analysis_cache: Dict[str, Dict] = {}
-CACHE_DURATION = timedelta(hours=1)  # Cache for 1 hour
+# Analysis results live in the shared two-tier cache (L1 in-process, L2 drug_interaction_cache)
+# Keys carry the patient context and knowledge-base stamps, so entries never go stale
+# on data changes and can live longer than the old 1 hour
+CACHE_DURATION = timedelta(hours=float(os.getenv("ANALYSIS_CACHE_TTL_HOURS", "24")))
+CACHE_KEY_PREFIX = "analysis:"
+# Only complete analyses are cached; timeout/circuit/LLM fallbacks must not outlive the outage
+CACHEABLE_ANALYSIS_PATHS = frozenset({"rules", "llm"})
 
+# Per-request analysis budget (context load + LLM attempts) and safety-net grace
+ANALYSIS_TIMEOUT_SECONDS = float(os.getenv("ANALYSIS_TIMEOUT_SECONDS", "2.5"))
+DEADLINE_GRACE_SECONDS = 0.1
 
-async def load_drug_interactions(db: Session) -> List[Dict]:
-    """Load drug interactions from database with fallback to JSON."""
-    try:
-        interactions = db.query(DrugInteraction).filter(
-            DrugInteraction.is_active == True
-        ).all()
-        
-        result = [
-            {
-                "id": interaction.id,
-                "drug_a": interaction.drug_a,
-                "drug_b": interaction.drug_b,
-                "severity": interaction.severity.value,
-                "mechanism": interaction.mechanism,
-                "clinical_effect": interaction.clinical_effect,
-                "recommendation": interaction.recommendation,
-                "monitoring": interaction.monitoring
-            }
-            for interaction in interactions
-        ]
-        
-        print(f"✅ Loaded {len(result)} drug interactions from database")
-        return result
-        
-    except Exception as e:
-        print(f"❌ Database error loading interactions: {e}")
-        print("🔄 Falling back to JSON file...")
-        return load_drug_interactions_from_json()
+# Batch endpoint: LLM fan-out per batch (Groq-wide limit still applies) and size cap
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "1000"))
 
 
-async def load_patients(db: Session) -> List[Dict]:
-    """Load patients from database with optimized queries and JSON fallback."""
+def ensure_interaction_index(db: Optional[Session]) -> str:
+    """Refresh drug dictionary and interaction index from database, falling back to JSON."""
+    drug_canonicalizer.ensure_fresh(db)
     try:
-        patients = db.query(Patient)\
-            .options(joinedload(Patient.medications))\
-            .options(joinedload(Patient.diagnoses))\
-            .options(joinedload(Patient.allergies))\
-            .all()
-        
-        result = [
-            {
-                "id": patient.id,
-                "no_rm": patient.no_rm,
-                "name": patient.name,
-                "age": patient.age,
-                "gender": patient.gender.value,
-                "weight_kg": getattr(patient, 'weight_kg', 70.0),
-                "current_medications": [
-                    f"{med.medication_name} {med.dosage or ''}".strip()
-                    for med in patient.medications if med.is_active
-                ],
-                "diagnoses_text": [
-                    diag.diagnosis_text for diag in patient.diagnoses
-                ],
-                "allergies": [
-                    allergy.allergen for allergy in patient.allergies
-                ]
-            }
-            for patient in patients
-        ]
-        
-        print(f"✅ Loaded {len(result)} patients from database")
-        return result
-        
+        if db is None:
+            raise RuntimeError("database session not available")
+        interaction_index.ensure_fresh(db)
+        knowledge_base.ensure_fresh(db)
+        return "database"
     except Exception as e:
-        print(f"❌ Database error loading patients: {e}")
-        print("🔄 Falling back to JSON file...")
-        return load_patients_from_json()
+        print(f"❌ Database error loading interactions: {e}")
+        if interaction_index.source != "json_fallback":
+            print("🔄 Falling back to JSON file...")
+            interaction_index.build(
+                load_drug_interactions_from_json(), source="json_fallback"
+            )
+        knowledge_base.ensure_fresh()
+        return "json_fallback"
 
 
 def load_drug_interactions_from_json() -> List[Dict]:
@@ -156,37 +135,73 @@ def load_patients_from_json() -> List[Dict]:
         }]
 
 
-def create_cache_key(patient_id: int, medications: List[str], notes: str) -> str:
-    """Create a unique cache key for an analysis request."""
-    content = f"{patient_id}|{sorted(medications)}|{notes}"
+def create_cache_key(
+    patient_id: int, medications: List[str], notes: str,
+    patient_data: Optional[Dict] = None
+) -> str:
+    """
+    Create a unique cache key for an analysis request (canonical drug IDs + dose).
+
+    With patient_data, the key also covers the patient's active medications and
+    clinical profile, plus the knowledge-base stamp of every drug involved, so a
+    medication write or an edit to those drugs' interactions/formulary entries
+    makes earlier results unreachable while unrelated entries keep hitting.
+    """
+    signatures = sorted(drug_canonicalizer.signature(med) for med in medications)
+    content = f"{patient_id}|{signatures}|{notes}"
+    if patient_data is not None:
+        current = patient_data.get("current_medications", [])
+        active = sorted(drug_canonicalizer.signature(med) for med in current)
+        profile = [patient_data.get(field) for field in ("age", "gender", "weight_kg")] + [
+            sorted(str(value) for value in patient_data.get(field) or [])
+            for field in ("allergies", "diagnoses_text", "diagnoses_icd10")
+        ]
+        content += f"|{active}|{profile}|{knowledge_base.stamp(list(medications) + list(current))}"
     return hashlib.md5(content.encode()).hexdigest()
 
 
-def is_cache_valid(timestamp: datetime) -> bool:
-    """Check if a cache entry is still valid based on its timestamp."""
-    return datetime.now() - timestamp < CACHE_DURATION
+def _request_cache_key(request: InteractionRequest, patient_data: Dict) -> str:
+    """Cache key for a request against the patient's current context."""
+    return create_cache_key(
+        request.patient_id, request.new_medications, request.notes or "", patient_data
+    )
 
 
-async def get_cached_analysis(cache_key: str) -> Optional[Dict]:
-    """Get analysis from cache if it exists and is still valid."""
-    if cache_key in analysis_cache:
-        cached_data = analysis_cache[cache_key]
-        if is_cache_valid(cached_data['timestamp']):
-            cached_data['result']['from_cache'] = True
-            return cached_data['result']
-        # Remove expired cache entry
-        del analysis_cache[cache_key]
-    return None
+async def get_cached_analysis(cache_key: str, db: Optional[Session] = None) -> Optional[Dict]:
+    """Get analysis from cache (L1, then shared L2) if it exists and is still valid."""
+    cached_result = await interaction_cache.get_async(CACHE_KEY_PREFIX + cache_key, db)
+    if cached_result is None:
+        return None
+    return {**cached_result, 'from_cache': True}
 
 
-def cache_analysis(cache_key: str, result: Dict) -> None:
-    """Cache an analysis result with the current timestamp."""
-    analysis_cache[cache_key] = {
-        'timestamp': datetime.now(),
-        'result': result.copy()
+async def get_cached_analyses(cache_keys: List[str], db: Optional[Session] = None) -> Dict[str, Dict]:
+    """Get analyses for many cache keys at once (L1, then one shared L2 query)."""
+    found = await interaction_cache.get_many_async(
+        [CACHE_KEY_PREFIX + cache_key for cache_key in cache_keys], db
+    )
+    return {
+        cache_key: {**found[CACHE_KEY_PREFIX + cache_key], 'from_cache': True}
+        for cache_key in cache_keys
+        if CACHE_KEY_PREFIX + cache_key in found
     }
 
 
+def cache_analysis(cache_key: str, result: Dict, medications: List[str]) -> None:
+    """Cache a complete analysis result (expires after CACHE_DURATION); fallbacks are skipped."""
+    if (result.get('analysis_path') not in CACHEABLE_ANALYSIS_PATHS
+            or result.get('error') or result.get('timeout_error')):
+        return
+    interaction_cache.set(
+        CACHE_KEY_PREFIX + cache_key,
+        result.copy(),
+        drug_names=medications,
+        severity_max=max_severity([result.get('overall_risk_level')]),
+        ttl=CACHE_DURATION,
+        negative=not result.get('warnings') and not result.get('contraindications')
+    )
+
+
 def _create_timeout_fallback_response(patient_data: Dict, new_medications: List[str]) -> Dict:
     """Create fallback response when Groq API times out."""
     return {
@@ -208,9 +223,10 @@ def _create_timeout_fallback_response(patient_data: Dict, new_medications: List[
         "contraindications": [],
         "dosing_adjustments": [], 
         "monitoring_plan": ["Pharmacist consultation recommended"],
-        "llm_reasoning": "Analysis timed out after 2.5 seconds. Manual review recommended to ensure patient safety.",
+        "llm_reasoning": f"Analysis timed out after {ANALYSIS_TIMEOUT_SECONDS:g} seconds. Manual review recommended to ensure patient safety.",
         "confidence_score": 0.0,
-        "timeout_error": True
+        "timeout_error": True,
+        "analysis_path": "timeout_fallback"
     }
 
 
@@ -265,45 +281,41 @@ def _enhance_analysis_result(
                 "reason": adj_str
             })
 
-    # Add patient age-related warnings if necessary (geriatric check)
-    patient_age = patient_data.get('age', 0)
-    if patient_age >= 65:
-        pim_medications = ['ibuprofen', 'diclofenac', 'indomethacin', 'ketorolac']
-        for med in new_medications:
-            for pim in pim_medications:
-                if pim.lower() in med.lower():
-                    result['warnings'].append({
-                        "severity": "MODERATE",
-                        "type": "AGE_RELATED",
-                        "drugs_involved": [med],
-                        "description": f"Potentially inappropriate medication in elderly patient (age {patient_age})",
-                        "clinical_significance": "Increased risk of adverse effects in geriatric population",
-                        "recommendation": "Consider alternative medication or dose reduction",
-                        "monitoring_required": "Enhanced monitoring for adverse effects"
-                    })
-                    
-                    result['dosing_adjustments'].append({
-                        "drug": med,
-                        "standard_dose": "Adult dose",
-                        "recommended_dose": "Reduce dose by 25-50% or consider alternative",
-                        "reason": f"Age-related dose adjustment for {patient_age} year old patient"
-                    })
-
-    # Add kidney function warnings for nephrotoxic drugs if CKD is diagnosed
-    diagnoses = patient_data.get('diagnoses_text', [])
-    kidney_related = any('kidney' in diag.lower() or 'ginjal' in diag.lower() for diag in diagnoses)
-    
-    if kidney_related:
-        nephrotoxic_drugs = ['ibuprofen', 'diclofenac', 'naproxen', 'metformin']
-        for med in new_medications:
-            for nephro in nephrotoxic_drugs:
-                if nephro.lower() in med.lower():
-                    result['contraindications'].append({
-                        "drug": med,
-                        "diagnosis": "Chronic Kidney Disease",
-                        "reason": "Nephrotoxic medication contraindicated in kidney disease",
-                        "alternative_suggested": "Paracetamol (if pain relief needed)"
-                    })
+    # Table-driven geriatric / renal / condition rules, one pass over the prescription
+    reported_warnings = {
+        (warning.get('type'), tuple(warning.get('drugs_involved') or ()), warning.get('description'))
+        for warning in result['warnings'] if isinstance(warning, dict)
+    }
+    for firing in clinical_rules.evaluate(patient_data, new_medications):
+        warning = firing.to_warning()
+        if warning and (warning['type'], tuple(warning['drugs_involved']),
+                        warning['description']) not in reported_warnings:
+            result['warnings'].append(warning)
+        contraindication = firing.to_contraindication()
+        if contraindication and contraindication not in result['contraindications']:
+            result['contraindications'].append(contraindication)
+        dosing = firing.to_dosing()
+        if dosing and dosing not in result['dosing_adjustments']:
+            result['dosing_adjustments'].append(dosing)
+
+    # Allergy and class cross-reactivity findings are deterministic; add any the analysis missed
+    warned = {
+        str(drug).lower()
+        for warning in result['warnings'] if warning.get('type') == 'ALLERGY'
+        for drug in warning.get('drugs_involved') or []
+    }
+    for hit in allergen_index.screen(new_medications, patient_data.get('allergies') or []):
+        if hit.medication.lower() not in warned:
+            result['warnings'].append(hit.to_warning())
+
+    # Formulary ICD-10 contraindications are deterministic; add any the analysis missed
+    reported = {
+        (str(item.get('drug', '')).lower(), str(item.get('diagnosis', '')).upper())
+        for item in result['contraindications'] if isinstance(item, dict)
+    }
+    for hit in contraindication_engine.check(new_medications, patient_data.get('diagnoses_icd10') or []):
+        if (hit.medication.lower(), hit.icd_code) not in reported:
+            result['contraindications'].append(hit.to_dict())
 
     # Ensure required timestamp format
     if 'analysis_timestamp' not in result:
@@ -312,6 +324,122 @@ def _enhance_analysis_result(
     return result
 
 
+def _load_analysis_context(
+    request: InteractionRequest, db: Session
+) -> Tuple[Dict, str, List[Dict]]:
+    """Load patient context and relevant interactions, database first with JSON fallback."""
+    try:
+        patient_data = patient_context_loader.load(db, request.patient_id)
+        data_source = ensure_interaction_index(db)
+    except Exception as db_error:
+        print(f"⚠️ Database unavailable, using JSON fallback: {db_error}")
+        patients = load_patients_from_json()
+        data_source = ensure_interaction_index(None)
+        patient_data = next((p for p in patients if p.get("no_rm") == request.patient_id or str(p.get("id")) == str(request.patient_id)), None)
+
+    if not patient_data:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Patient {request.patient_id} not found in {data_source}"
+        )
+
+    # Only interactions touching the prescribed drugs are handed to the LLM
+    drug_interactions_db = interaction_index.lookup(
+        patient_data.get("current_medications", []) + request.new_medications
+    )
+    return patient_data, data_source, drug_interactions_db
+
+
+def _finalize_analysis(
+    analysis_result: Dict, patient_data: Dict, request: InteractionRequest,
+    data_source: str, start_time: float, cache_key: str
+) -> Dict:
+    """Add performance metadata, apply rule-based enhancements and cache the result."""
+    processing_time = time.time() - start_time
+    analysis_result['processing_time'] = round(processing_time, 3)
+    analysis_result['from_cache'] = False
+    analysis_result['data_source'] = data_source  # Track where data came from
+    analysis_result.setdefault('analysis_path', 'llm')
+    enhanced_result = _enhance_analysis_result(
+        analysis_result, patient_data, request.new_medications
+    )
+
+    # Cache the new result (fallback responses are not cached)
+    cache_analysis(cache_key, enhanced_result, request.new_medications)
+    print(f"✅ Analysis completed for {request.patient_id} in {processing_time:.3f}s using {data_source}")
+    return enhanced_result
+
+
+async def _analyze_with_context(
+    request: InteractionRequest, patient_data: Dict, data_source: str,
+    drug_interactions_db: List[Dict], start_time: float, cache_key: str,
+    deadline: Deadline
+) -> Dict:
+    """Rule-engine fast path, then the LLM within the request deadline, then finalize."""
+    # Deterministic fast path: clearly safe / clearly MAJOR prescriptions skip the LLM
+    analysis_result = rule_engine.evaluate(
+        patient_data, request.new_medications, drug_interactions_db
+    )
+    if analysis_result is not None:
+        return _finalize_analysis(
+            analysis_result, patient_data, request, data_source, start_time, cache_key
+        )
+
+    # Enhanced AI analysis; retries are budgeted from the deadline inside the service,
+    # the outer wait_for is only a safety net
+    try:
+        analysis_task = groq_service.analyze_drug_interactions(
+            patient_data=patient_data,
+            new_medications=request.new_medications,
+            drug_interactions_db=drug_interactions_db,
+            notes=request.notes or "",
+            deadline=deadline
+        )
+        analysis_result = await asyncio.wait_for(
+            analysis_task, timeout=deadline.remaining() + DEADLINE_GRACE_SECONDS
+        )
+
+    except asyncio.TimeoutError:
+        # Fallback response if Groq API times out
+        analysis_result = _create_timeout_fallback_response(
+            patient_data, request.new_medications
+        )
+
+    return _finalize_analysis(
+        analysis_result, patient_data, request, data_source, start_time, cache_key
+    )
+
+
+def _create_error_response(request: InteractionRequest, error: Exception, start_time: float) -> Dict:
+    """Create a safety-first error response when the analysis itself fails."""
+    processing_time = time.time() - start_time
+    return {
+        "analysis_timestamp": datetime.now().isoformat(),
+        "patient_id": request.patient_id,
+        "overall_risk_level": "MODERATE",  # Default to moderate for safety
+        "safe_to_prescribe": False,
+        "warnings": [
+            {
+                "severity": "MAJOR",
+                "type": "SYSTEM_ERROR",
+                "drugs_involved": request.new_medications,
+                "description": "Unable to complete automated drug interaction analysis",
+                "clinical_significance": "Manual pharmacist review required before prescribing",
+                "recommendation": "Consult clinical pharmacist for manual drug interaction review",
+                "monitoring_required": "Manual assessment of all drug interactions"
+            }
+        ],
+        "contraindications": [],
+        "dosing_adjustments": [],
+        "monitoring_plan": ["Manual pharmacist consultation required"],
+        "llm_reasoning": f"System error prevented automated analysis: {error}. Manual review strongly recommended for patient safety.",
+        "confidence_score": 0.0,
+        "processing_time": round(processing_time, 3),
+        "from_cache": False,
+        "analysis_path": "error"
+    }
+
+
 @router.post("/analyze-interactions", response_model=InteractionResponse)
 async def analyze_interactions(
     request: InteractionRequest, 
@@ -322,99 +450,320 @@ async def analyze_interactions(
     decision support using database with JSON fallback.
     """
     start_time = time.time()
-    cache_key = create_cache_key(
-        request.patient_id, request.new_medications, request.notes or ""
-    )
+    deadline = Deadline(ANALYSIS_TIMEOUT_SECONDS)
 
     try:
+        # Try database first, fallback to JSON if database unavailable; the patient
+        # context is cached per patient and its active medications are part of the key
+        patient_data, data_source, drug_interactions_db = _load_analysis_context(request, db)
+        cache_key = _request_cache_key(request, patient_data)
+
         # Check cache first for performance optimization
-        cached_result = await get_cached_analysis(cache_key)
+        cached_result = await get_cached_analysis(cache_key, db)
         if cached_result:
             print(f"✅ Cache hit for patient {request.patient_id}")
             return InteractionResponse(**cached_result)
 
-        # Try database first, fallback to JSON if database unavailable
-        try:
-            patients = await load_patients(db)
-            drug_interactions_db = await load_drug_interactions(db)
-            data_source = "database"
-        except Exception as db_error:
-            print(f"⚠️ Database unavailable, using JSON fallback: {db_error}")
-            patients = load_patients_from_json()
-            drug_interactions_db = load_drug_interactions_from_json()
-            data_source = "json_fallback"
-
-        patient_data = next((p for p in patients if p.get("no_rm") == request.patient_id or str(p.get("id")) == str(request.patient_id)), None)
-        if not patient_data:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Patient {request.patient_id} not found in {data_source}"
+        async def run_analysis() -> Dict:
+            return await _analyze_with_context(
+                request, patient_data, data_source, drug_interactions_db, start_time, cache_key,
+                deadline
             )
 
-        # Enhanced AI analysis with timeout protection
-        try:
-            analysis_task = groq_service.analyze_drug_interactions(
-                patient_data=patient_data,
-                new_medications=request.new_medications,
-                drug_interactions_db=drug_interactions_db,
-                notes=request.notes or ""
-            )
-            analysis_result = await asyncio.wait_for(analysis_task, timeout=2.5)
-
-        except asyncio.TimeoutError:
-            # Fallback response if Groq API times out
-            analysis_result = _create_timeout_fallback_response(
-                patient_data, request.new_medications
-            )
-
-        # Add performance metadata and enhance the result
-        processing_time = time.time() - start_time
-        analysis_result['processing_time'] = round(processing_time, 3)
-        analysis_result['from_cache'] = False
-        analysis_result['data_source'] = data_source  # Track where data came from
-        enhanced_result = _enhance_analysis_result(
-            analysis_result, patient_data, request.new_medications
-        )
-
-        # Cache the new result
-        cache_analysis(cache_key, enhanced_result)
-        print(f"✅ Analysis completed for {request.patient_id} in {processing_time:.3f}s using {data_source}")
-
+        # Identical concurrent requests share one analysis (and one Groq call)
+        enhanced_result, shared = await interaction_analysis_flight.do(cache_key, run_analysis)
+        if shared:
+            print(f"🔗 Coalesced identical in-flight analysis for {request.patient_id}")
         return InteractionResponse(**enhanced_result)
 
     except HTTPException:
         raise  # Re-raise HTTPException to let FastAPI handle it
     except Exception as e:
         # Create comprehensive error response for the client
-        processing_time = time.time() - start_time
         print(f"❌ Analysis failed for {request.patient_id}: {e}")
-        
-        error_response = {
-            "analysis_timestamp": datetime.now().isoformat(),
-            "patient_id": request.patient_id,
-            "overall_risk_level": "MODERATE",  # Default to moderate for safety
-            "safe_to_prescribe": False,
-            "warnings": [
-                {
-                    "severity": "MAJOR",
-                    "type": "SYSTEM_ERROR",
-                    "drugs_involved": request.new_medications,
-                    "description": "Unable to complete automated drug interaction analysis",
-                    "clinical_significance": "Manual pharmacist review required before prescribing",
-                    "recommendation": "Consult clinical pharmacist for manual drug interaction review",
-                    "monitoring_required": "Manual assessment of all drug interactions"
-                }
-            ],
-            "contraindications": [],
-            "dosing_adjustments": [],
-            "monitoring_plan": ["Manual pharmacist consultation required"],
-            "llm_reasoning": f"System error prevented automated analysis: {e}. Manual review strongly recommended for patient safety.",
-            "confidence_score": 0.0,
-            "processing_time": round(processing_time, 3),
-            "from_cache": False
-        }
-        
-        return InteractionResponse(**error_response)
+        return InteractionResponse(**_create_error_response(request, e, start_time))
+
+
+def _sse_event(event: str, data: Dict) -> str:
+    """Format one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+# SSE event name for each streamed section of the analysis
+SSE_SECTION_EVENTS = {
+    "warnings": "warning",
+    "contraindications": "contraindication",
+    "dosing_adjustments": "dosing_adjustment",
+}
+
+
+@router.post("/analyze-interactions/stream")
+async def analyze_interactions_stream(
+    request: InteractionRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Streaming variant of analyze-interactions (Server-Sent Events).
+
+    Emits a `warning`, `contraindication` or `dosing_adjustment` event as soon as
+    each object is complete in the LLM token stream, then a final `result` event
+    carrying the same InteractionResponse payload as the non-streaming endpoint.
+    """
+    start_time = time.time()
+
+    # Resolve the patient before streaming starts so a 404 is still a 404
+    patient_data, data_source, drug_interactions_db = _load_analysis_context(request, db)
+    cache_key = _request_cache_key(request, patient_data)
+    cached_result = await get_cached_analysis(cache_key, db)
+
+    async def event_stream():
+        if cached_result is not None:
+            print(f"✅ Cache hit for patient {request.patient_id}")
+            response = InteractionResponse(**cached_result)
+            for section, event in SSE_SECTION_EVENTS.items():
+                for item in getattr(response, section):
+                    yield _sse_event(event, item.model_dump())
+            yield _sse_event("result", response.model_dump())
+            return
+
+        try:
+            yield _sse_event("start", {
+                "patient_id": request.patient_id,
+                "data_source": data_source,
+                "known_interactions": len(drug_interactions_db)
+            })
+            emitted = {section: 0 for section in SSE_SECTION_EVENTS}
+            analysis_result = rule_engine.evaluate(
+                patient_data, request.new_medications, drug_interactions_db
+            )
+            if analysis_result is None:
+                async for section, item in groq_service.stream_drug_interactions(
+                    patient_data=patient_data,
+                    new_medications=request.new_medications,
+                    drug_interactions_db=drug_interactions_db,
+                    notes=request.notes or ""
+                ):
+                    if section == "result":
+                        analysis_result = item
+                    else:
+                        emitted[section] += 1
+                        yield _sse_event(SSE_SECTION_EVENTS[section], item)
+
+            enhanced_result = _finalize_analysis(
+                analysis_result, patient_data, request, data_source, start_time, cache_key
+            )
+            response = InteractionResponse(**enhanced_result)
+
+            # Rule-engine results, rule-based findings (geriatric, renal) and fallback items
+            # were not in the token stream
+            for section, event in SSE_SECTION_EVENTS.items():
+                for item in getattr(response, section)[emitted[section]:]:
+                    yield _sse_event(event, item.model_dump())
+        except Exception as e:
+            print(f"❌ Streaming analysis failed for {request.patient_id}: {e}")
+            response = InteractionResponse(**_create_error_response(request, e, start_time))
+        yield _sse_event("result", response.model_dump())
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _load_batch_contexts(requests: List[InteractionRequest], db: Session) -> Tuple[Dict[str, Dict], str]:
+    """Load every patient of a batch in one query, falling back to patients.json."""
+    patient_keys = [str(request.patient_id).strip() for request in requests]
+    try:
+        contexts = patient_context_loader.load_many(db, patient_keys)
+        return contexts, ensure_interaction_index(db)
+    except Exception as db_error:
+        print(f"⚠️ Database unavailable for batch, using JSON fallback: {db_error}")
+        patients = load_patients_from_json()
+        contexts = {}
+        for key in patient_keys:
+            patient = next((p for p in patients if p.get("no_rm") == key or str(p.get("id")) == key), None)
+            if patient is not None:
+                contexts[key] = patient
+        return contexts, ensure_interaction_index(None)
+
+
+def _batch_line(index: int, request: InteractionRequest, status: int, result: Dict) -> str:
+    """One NDJSON line of the batch response."""
+    line = {"index": index, "patient_id": request.patient_id, "status": status, "result": result}
+    return json.dumps(line, ensure_ascii=False, default=str) + "\n"
+
+
+@router.post("/analyze-interactions/batch")
+async def analyze_interactions_batch(
+    requests: List[InteractionRequest],
+    concurrency: int = Query(BATCH_LLM_CONCURRENCY, ge=1, le=BATCH_MAX_CONCURRENCY),
+    db: Session = Depends(get_db)
+):
+    """
+    Batch variant of analyze-interactions for bulk re-verification.
+
+    Patient contexts are loaded in one query and cached results for the whole
+    batch in one more (both off the event loop); the rule engine then runs for
+    the whole batch up front and only the remaining prescriptions go to the LLM, at
+    most `concurrency` at a time. Results stream back as NDJSON (one
+    `{index, patient_id, status, result}` object per line) in completion
+    order, followed by a final `{"summary": ...}` line.
+    """
+    if len(requests) > BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(requests)} prescriptions (max {BATCH_MAX_SIZE})"
+        )
+    batch_start = time.time()
+    contexts, data_source = await asyncio.to_thread(_load_batch_contexts, requests, db)
+
+    # Cache keys for the whole batch first, then a single cache read for all of them
+    cache_keys: Dict[int, str] = {}
+    for index, request in enumerate(requests):
+        patient_data = contexts.get(str(request.patient_id).strip())
+        if patient_data is not None:
+            try:
+                cache_keys[index] = _request_cache_key(request, patient_data)
+            except Exception as e:
+                print(f"⚠️ Batch cache key failed for {request.patient_id}: {e}")
+    cached_results = await get_cached_analyses(list(cache_keys.values()), db)
+
+    ready: List[str] = []
+    pending: List[Tuple[int, InteractionRequest, Dict, List[Dict], str]] = []
+    paths: Dict[str, int] = {}
+
+    for index, request in enumerate(requests):
+        start_time = time.time()
+        try:
+            patient_data = contexts.get(str(request.patient_id).strip())
+            if patient_data is None:
+                paths["not_found"] = paths.get("not_found", 0) + 1
+                ready.append(_batch_line(index, request, 404, {
+                    "detail": f"Patient {request.patient_id} not found in {data_source}"
+                }))
+                continue
+
+            cache_key = cache_keys.get(index) or _request_cache_key(request, patient_data)
+            cached_result = cached_results.get(cache_key)
+            if cached_result:
+                response = InteractionResponse(**cached_result).model_dump()
+                paths["cache"] = paths.get("cache", 0) + 1
+                ready.append(_batch_line(index, request, 200, response))
+                continue
+
+            drug_interactions_db = interaction_index.lookup(
+                patient_data.get("current_medications", []) + request.new_medications
+            )
+            # Bulk rule matching: decided prescriptions never wait for an LLM slot
+            analysis_result = rule_engine.evaluate(
+                patient_data, request.new_medications, drug_interactions_db
+            )
+            if analysis_result is not None:
+                enhanced_result = _finalize_analysis(
+                    analysis_result, patient_data, request, data_source, start_time, cache_key
+                )
+                paths["rules"] = paths.get("rules", 0) + 1
+                ready.append(_batch_line(index, request, 200, InteractionResponse(**enhanced_result).model_dump()))
+                continue
+            pending.append((index, request, patient_data, drug_interactions_db, cache_key))
+        except Exception as e:
+            print(f"❌ Batch analysis failed for {request.patient_id}: {e}")
+            paths["error"] = paths.get("error", 0) + 1
+            ready.append(_batch_line(
+                index, request, 200, InteractionResponse(**_create_error_response(request, e, start_time)).model_dump()
+            ))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze_one(index: int, request: InteractionRequest, patient_data: Dict,
+                          drug_interactions_db: List[Dict], cache_key: str) -> str:
+        async with semaphore:
+            # The deadline starts once an LLM slot is free, not while queued in the batch
+            start_time = time.time()
+            deadline = Deadline(ANALYSIS_TIMEOUT_SECONDS)
+            try:
+                enhanced_result, _ = await interaction_analysis_flight.do(
+                    cache_key,
+                    lambda: _analyze_with_context(
+                        request, patient_data, data_source, drug_interactions_db, start_time,
+                        cache_key, deadline
+                    )
+                )
+                result = InteractionResponse(**enhanced_result).model_dump()
+            except Exception as e:
+                print(f"❌ Batch analysis failed for {request.patient_id}: {e}")
+                result = InteractionResponse(**_create_error_response(request, e, start_time)).model_dump()
+            path = result.get("analysis_path") or "llm"
+            paths[path] = paths.get(path, 0) + 1
+            return _batch_line(index, request, 200, result)
+
+    async def line_stream():
+        for line in ready:
+            yield line
+        tasks = [asyncio.ensure_future(analyze_one(*item)) for item in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        elapsed = time.time() - batch_start
+        yield json.dumps({"summary": {
+            "total": len(requests),
+            "data_source": data_source,
+            "paths": paths,
+            "llm_concurrency": concurrency,
+            "elapsed_seconds": round(elapsed, 3),
+            "prescriptions_per_minute": round(len(requests) / max(elapsed, 1e-6) * 60, 1),
+        }}) + "\n"
+
+    return StreamingResponse(line_stream(), media_type="application/x-ndjson")
+
+
+async def precompute_patient_analysis(no_rm: str, medications: List[str]) -> str:
+    """
+    Background precompute after a medication write (registered with precompute_queue).
+
+    Runs the request the dashboard sends for the written prescription: `medications`
+    as new_medications, checked against the rest of the patient's active list. The
+    context and cache key are built exactly as analyze_interactions builds them, so
+    the clinician's next check of that prescription is a cache hit. Prescriptions
+    the rule engine cannot decide only go to the LLM when PRECOMPUTE_LLM is enabled.
+    """
+    if database.SessionLocal is None:
+        return "no_database"
+    if not medications:
+        return "no_medications"
+    start_time = time.time()
+    request = InteractionRequest(patient_id=no_rm, new_medications=medications)
+
+    def load_context():
+        # Fresh session per job; loading also re-warms the patient context cache
+        with database.SessionLocal() as db:
+            return _load_analysis_context(request, db)
+
+    patient_data, data_source, drug_interactions_db = await asyncio.to_thread(load_context)
+    cache_key = _request_cache_key(request, patient_data)
+    if await interaction_cache.get_async(CACHE_KEY_PREFIX + cache_key) is not None:
+        return "cached"
+
+    analysis_result = rule_engine.evaluate(patient_data, request.new_medications, drug_interactions_db)
+    if analysis_result is None:
+        if not PRECOMPUTE_LLM:
+            return "deferred"
+        analysis_result, _ = await interaction_analysis_flight.do(
+            cache_key,
+            lambda: _analyze_with_context(
+                request, patient_data, data_source, drug_interactions_db, start_time,
+                cache_key, Deadline(PRECOMPUTE_LLM_TIMEOUT)
+            )
+        )
+        return analysis_result.get("analysis_path") or "llm"
+
+    _finalize_analysis(analysis_result, patient_data, request, data_source, start_time, cache_key)
+    return "rules"
 
 
 @router.get("/test-groq", response_model=GroqTestResponse)
@@ -444,23 +793,25 @@ async def test_groq_connection():
 @router.get("/cache-stats")
 async def get_cache_statistics():
     """Get cache statistics for performance monitoring."""
-    total = len(analysis_cache)
-    valid = sum(1 for c in analysis_cache.values() if is_cache_valid(c['timestamp']))
-    hit_ratio = (valid / max(total, 1)) * 100
+    stats = interaction_cache.stats()
     return {
-        "total_cached_analyses": total,
-        "valid_cached_analyses": valid,
-        "cache_hit_ratio": f"{hit_ratio:.1f}%",
-        "cache_duration_hours": CACHE_DURATION.total_seconds() / 3600
+        "total_cached_analyses": stats["l1"]["entries"],
+        "cache_hit_ratio": stats["l1"]["hit_ratio"],
+        "cache_duration_hours": CACHE_DURATION.total_seconds() / 3600,
+        "cache": stats,
+        "single_flight": interaction_analysis_flight.stats(),
+        "rule_engine": rule_engine.stats(),
+        "contraindications": contraindication_engine.stats(),
+        "allergens": allergen_index.stats(),
+        "clinical_rules": clinical_rules.stats(),
+        "knowledge_base": knowledge_base.stats()
     }
 
 
 @router.delete("/clear-cache")
 async def clear_analysis_cache():
-    """Clear the analysis cache. Intended for development/testing."""
-    global analysis_cache
-    cleared_count = len(analysis_cache)
-    analysis_cache = {}  # Re-assign to a new empty dict
+    """Clear this worker's in-process (L1) cache. Intended for development/testing."""
+    cleared_count = interaction_cache.clear_l1()
     return {
         "message": "Cache cleared successfully",
         "items_cleared": cleared_count,
@@ -468,20 +819,38 @@ async def clear_analysis_cache():
     }
 
 
+@router.post("/refresh-interaction-index")
+async def refresh_interaction_index(db: Session = Depends(get_db)):
+    """Force the interaction index and knowledge-base stamps to re-check their tables."""
+    interaction_index.invalidate()
+    knowledge_base.invalidate()
+    data_source = ensure_interaction_index(db)
+    return {
+        "message": "Interaction index refreshed",
+        "data_source": data_source,
+        "index": interaction_index.stats(),
+        "knowledge_base": knowledge_base.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
 @router.get("/data-source-status")
 async def get_data_source_status(db: Session = Depends(get_db)):
     """Check status of data sources (database vs JSON fallback)."""
     try:
         # Test database connection
-        patients_db = await load_patients(db)
-        interactions_db = await load_drug_interactions(db) 
+        patients_count = db.query(func.count(Patient.no_rm)).scalar()
+        interaction_index.ensure_fresh(db)
         
         return {
             "database_status": "available",
-            "patients_count": len(patients_db),
-            "interactions_count": len(interactions_db),
+            "patients_count": patients_count,
+            "interactions_count": interaction_index.edge_count,
             "primary_source": "database",
-            "fallback_available": True
+            "fallback_available": True,
+            "interaction_index": interaction_index.stats(),
+            "term_scanner": term_scanner.stats(),
+            "patient_context_cache": patient_context_loader.stats()
         }
     except Exception as e:
         # Test JSON fallback
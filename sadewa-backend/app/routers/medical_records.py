@@ -16,6 +16,8 @@ from pydantic import BaseModel, Field, validator
 from enum import Enum
 
 from app.database import get_db
+from services.patient_context import patient_context_loader
+from services.precompute import precompute_queue
 import logging
 
 logger = logging.getLogger(__name__)
@@ -199,6 +201,11 @@ async def save_patient_medications_fixed(
             })
         
         db.commit()
+        patient_context_loader.invalidate(no_rm)
+        # Warm the interaction cache for the new active medication list in the background
+        precompute_queue.schedule(
+            no_rm, [f"{med.name} {med.dosage or ''}".strip() for med in medications]
+        )
         logger.info(f"Successfully saved {len(medications)} medications for patient {no_rm}")
         
     except Exception as e:
@@ -17,6 +17,8 @@ from pydantic import BaseModel, Field, validator
 import logging
 
 from app.database import get_db
+from services.patient_context import patient_context_loader
+from services.precompute import precompute_queue
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -425,6 +427,7 @@ async def update_patient(
         update_query = f"UPDATE patients SET {', '.join(update_fields)} WHERE no_rm = :no_rm"
         db.execute(text(update_query), params)
         db.commit()
+        patient_context_loader.invalidate(actual_no_rm)
         
         logger.info(f"✅ Updated patient {actual_no_rm}")
         
@@ -701,6 +704,7 @@ async def delete_patient(
         db.execute(text("DELETE FROM patients WHERE no_rm = :no_rm"), {"no_rm": no_rm})
         
         db.commit()
+        patient_context_loader.invalidate(no_rm)
         
         logger.info(f"✅ Deleted patient {no_rm}: {patient_name}")
         
@@ -990,6 +994,11 @@ async def _save_patient_medications(
             })
         
         db.commit()
+        patient_context_loader.invalidate(no_rm)
+        # Warm the interaction cache for the new active medication list in the background
+        precompute_queue.schedule(
+            no_rm, [f"{med.name} {med.dosage or ''}".strip() for med in medications]
+        )
         logger.info(f"✅ Successfully saved {len(medications)} medications for patient {no_rm}")
         
     except Exception as e:
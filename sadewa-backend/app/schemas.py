@@ -189,6 +189,9 @@ class InteractionResponse(BaseModel):
     llm_reasoning: Optional[str] = Field(None, description="Penalaran AI")
     processing_time: Optional[float] = Field(None, description="Waktu pemrosesan")
     from_cache: bool = Field(False, description="Dari cache atau tidak")
+    analysis_path: Optional[str] = Field(
+        None, description="Jalur yang menghasilkan analisis (rules/llm/llm_fallback/circuit_open/timeout_fallback/error)"
+    )
 
 
 class GroqTestResponse(BaseModel):
@@ -0,0 +1,139 @@
+"""
+Benchmark: /icd10/search LIKE query vs the in-memory n-gram index
+
+Seeds an in-memory SQLite icds table with ~10.5k synthetic bilingual ICD-10
+rows, then replays keystroke-style queries ("de", "dem", "demam", "a09", ...)
+against the router's `LIKE '%q%'` query (with a simulated round trip to the
+remote MySQL server) and against services/icd10_index.py. Reports p50/p99 per
+implementation and checks that every LIKE hit is also returned by the index.
+
+Usage (from sadewa-backend/):
+    python -m benchmarks.bench_icd10_search --rtt-ms 5 --rounds 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, func, or_
+from sqlalchemy.orm import sessionmaker
+
+from app.models import ICD10
+from services.icd10_index import ICD10SearchIndex
+
+# (Indonesia, English) untuk nama diagnosis sintetis
+TERMS = [
+    ("demam", "fever"), ("berdarah", "haemorrhagic"), ("dengue", "dengue"),
+    ("diare", "diarrhoea"), ("gastroenteritis", "gastroenteritis"), ("infeksi", "infection"),
+    ("diabetes", "diabetes"), ("melitus", "mellitus"), ("hipertensi", "hypertension"),
+    ("esensial", "essential"), ("gagal", "failure"), ("jantung", "heart"), ("ginjal", "kidney"),
+    ("kronis", "chronic"), ("akut", "acute"), ("pneumonia", "pneumonia"), ("bakteri", "bacterial"),
+    ("virus", "viral"), ("tuberkulosis", "tuberculosis"), ("paru", "lung"), ("asma", "asthma"),
+    ("fraktur", "fracture"), ("tulang", "bone"), ("kepala", "head"), ("nyeri", "pain"),
+    ("perut", "abdominal"), ("kanker", "cancer"), ("hati", "liver"), ("stroke", "stroke"),
+    ("iskemik", "ischaemic"), ("anemia", "anaemia"), ("defisiensi", "deficiency"),
+    ("besi", "iron"), ("kulit", "skin"), ("alergi", "allergy"), ("mata", "eye"),
+]
+QUERIES = [
+    "de", "dem", "dema", "demam", "demam ber", "demam berdarah", "fev", "fever",
+    "dia", "diab", "diabetes", "diabetes mel", "hip", "hipertensi", "heart fail",
+    "gagal jantung", "a0", "a09", "a09.0", "e11", "i10", "j18.9", "kid", "ginjal kronis",
+]
+
+
+def create_seeded_session(rows: int, seed: int):
+    """SQLite session with an icds table of `rows` synthetic bilingual diagnoses."""
+    engine = create_engine("sqlite://")
+    ICD10.__table__.create(engine)
+    rng = random.Random(seed)
+    session = sessionmaker(bind=engine)()
+    records = []
+    for n in range(rows):
+        letter = chr(ord("A") + (n // 1000) % 26)
+        category = n % 1000 // 10
+        code = f"{letter}{category:02d}.{n % 10}" if n % 10 else f"{letter}{category:02d}"
+        picked = rng.sample(TERMS, rng.randint(2, 4))
+        records.append(ICD10(code=code, name_id=" ".join(t[0] for t in picked).capitalize(),
+                             name_en=" ".join(t[1] for t in reversed(picked)).capitalize()))
+    session.add_all(records)
+    session.commit()
+    return engine, session
+
+
+def like_search(session, q: str, limit: int):
+    """Same query as app/routers/icd10.py before the index."""
+    pattern = f"%{q.lower()}%"
+    return session.query(ICD10).filter(
+        or_(
+            func.lower(ICD10.code).like(pattern),
+            func.lower(ICD10.name_id).like(pattern),
+            func.lower(ICD10.name_en).like(pattern),
+        )
+    ).limit(limit).all()
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def measure(func, queries, rounds):
+    """Latency per call in ms over all queries x rounds."""
+    timings = []
+    for _ in range(rounds):
+        for q in queries:
+            start = time.perf_counter()
+            func(q)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10469)
+    parser.add_argument("--rtt-ms", type=float, default=5.0, help="Simulated DB round trip")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    engine, session = create_seeded_session(args.rows, args.seed)
+    index = ICD10SearchIndex()
+    index.ensure_fresh(session)
+    stats = index.stats()
+    print(f"Index: {stats['codes']} codes, {stats['ngrams']} n-grams, "
+          f"{stats['postings']} postings, built in {stats['last_load_ms']}ms")
+
+    # Kelengkapan: semua hit LIKE (tanpa limit) juga dikembalikan index
+    missing = 0
+    for q in QUERIES:
+        expected = {row.code for row in like_search(session, q, args.rows)}
+        found = {hit["code"] for hit in index.search(q, args.rows)}
+        missing += len(expected - found)
+    print(f"LIKE hits missing from index: {missing}")
+
+    index_ms = measure(lambda q: index.search(q, args.limit), QUERIES, args.rounds)
+    like_local_ms = measure(lambda q: like_search(session, q, args.limit), QUERIES, args.rounds)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def simulate_round_trip(*_args):
+        time.sleep(args.rtt_ms / 1000.0)
+
+    like_ms = measure(lambda q: like_search(session, q, args.limit), QUERIES, max(1, args.rounds // 4))
+
+    print(f"{'impl':<22} {'calls':>6} {'p50_ms':>9} {'p99_ms':>9} {'max_ms':>9}")
+    for name, timings in (("like (sqlite)", like_local_ms),
+                          (f"like (+{args.rtt_ms:.0f}ms rtt)", like_ms),
+                          ("ngram index", index_ms)):
+        print(f"{name:<22} {len(timings):>6} {statistics.median(timings):>9.3f} "
+              f"{percentile(timings, 99):>9.3f} {max(timings):>9.3f}")
+
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: check_drug_interactions (app/models.py) vs the interaction matrix
+
+Seeds an in-memory SQLite simple_drug_interactions table from
+data/drug_interactions.json, builds the pairwise severity matrix from the same
+rows, then measures all-pairs checks for growing prescriptions. The ORM helper
+runs one LIKE query per pair (with a simulated round trip to the remote MySQL
+server); the matrix answers every pair with one vectorized lookup.
+
+Usage (from sadewa-backend/):
+    python -m benchmarks.bench_interaction_matrix --rtt-ms 5 --sizes 2 5 10 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.models import SimpleDrugInteraction, check_drug_interactions
+from services.interaction_matrix import InteractionMatrix
+from services.knowledge_base import knowledge_base
+
+DATA_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "drug_interactions.json"
+)
+
+
+def create_seeded_session():
+    """SQLite session with simple_drug_interactions seeded from the JSON knowledge base."""
+    engine = create_engine("sqlite://")
+    SimpleDrugInteraction.__table__.create(engine)
+    with open(DATA_FILE, "r", encoding="utf-8") as f:
+        rows = json.load(f)
+    session = sessionmaker(bind=engine)()
+    session.add_all(
+        SimpleDrugInteraction(drug_a=row["drug_a"], drug_b=row["drug_b"], severity=row["severity"],
+                              description=row.get("description") or "", is_active=True)
+        for row in rows
+    )
+    session.commit()
+    return engine, session, sorted({r["drug_a"] for r in rows} | {r["drug_b"] for r in rows})
+
+
+def measure(func, repeats):
+    """Return (median latency in ms, result) over several runs."""
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rtt-ms", type=float, default=5.0, help="Simulated DB round trip")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 5, 10, 15, 20])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    engine, session, drug_names = create_seeded_session()
+    knowledge_base.ensure_fresh(session)
+    matrix = InteractionMatrix(directory=tempfile.mkdtemp(prefix="sadewa_matrix_bench_"))
+    matrix.ensure_fresh()
+    stats = matrix.stats()
+    print(f"Matrix: {stats['drugs']} drugs, {stats['interacting_pairs']} pairs, "
+          f"{stats['matrix_bytes']} bytes, built in {stats['last_build_ms']}ms "
+          f"(memmap={stats['memory_mapped']})")
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def simulate_round_trip(*_args):
+        time.sleep(args.rtt_ms / 1000.0)
+
+    print(f"Simulated round trip: {args.rtt_ms:.1f}ms")
+    print(f"{'N':>4} {'pairs':>6} {'orm_ms':>10} {'matrix_ms':>10} {'speedup':>9} "
+          f"{'found_orm':>10} {'found_mx':>9}")
+    for n in args.sizes:
+        medications = drug_names[:n]
+        orm_ms, orm = measure(lambda: check_drug_interactions(session, medications), args.repeats)
+        matrix_ms, found = measure(lambda: matrix.find_interactions(medications), args.repeats)
+        # ORM helper returns the first LIKE match per pair, the matrix every row per pair
+        print(f"{n:>4} {n * (n - 1) // 2:>6} {orm_ms:>10.1f} {matrix_ms:>10.3f} "
+              f"{orm_ms / max(matrix_ms, 1e-9):>8.0f}x {len(orm):>10} {len(found):>9}")
+
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
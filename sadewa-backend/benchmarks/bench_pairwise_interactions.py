@@ -0,0 +1,115 @@
+"""
+Benchmark: pairwise vs batched drug interaction lookup (ai_diagnosis)
+
+Seeds an in-memory SQLite database with the interaction knowledge base from
+data/drug_interactions.json and simulates the network round trip to the remote
+MySQL server, then measures how latency grows with the number of medications.
+
+Usage (from sadewa-backend/):
+    python -m benchmarks.bench_pairwise_interactions --rtt-ms 20 --sizes 2 5 10 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.routers.ai_diagnosis import (
+    _analyze_drug_interactions_batched,
+    _analyze_drug_interactions_pairwise,
+)
+
+DATA_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "drug_interactions.json"
+)
+
+
+def create_seeded_engine(rtt_ms: float):
+    """Create a SQLite engine with both interaction tables and simulated latency."""
+    engine = create_engine("sqlite://")
+
+    with open(DATA_FILE, "r", encoding="utf-8") as f:
+        rows = json.load(f)
+
+    with engine.begin() as connection:
+        connection.execute(text("""
+            CREATE TABLE simple_drug_interactions (
+                id INTEGER PRIMARY KEY, drug_a TEXT, drug_b TEXT, severity TEXT,
+                description TEXT, recommendation TEXT, is_active INTEGER DEFAULT 1
+            )
+        """))
+        connection.execute(text("""
+            CREATE TABLE drug_interactions (
+                id INTEGER PRIMARY KEY, drug_1 TEXT, drug_2 TEXT, severity TEXT,
+                description TEXT, recommendation TEXT, mechanism TEXT,
+                clinical_effect TEXT, evidence_level TEXT, is_active INTEGER DEFAULT 1
+            )
+        """))
+        for row in rows:
+            severity = row["severity"].upper()
+            connection.execute(text("""
+                INSERT INTO simple_drug_interactions (drug_a, drug_b, severity, description)
+                VALUES (:a, :b, :severity, :description)
+            """), {"a": row["drug_a"], "b": row["drug_b"], "severity": severity,
+                   "description": row.get("description")})
+            connection.execute(text("""
+                INSERT INTO drug_interactions (drug_1, drug_2, severity, description, mechanism)
+                VALUES (:a, :b, :severity, :description, :mechanism)
+            """), {"a": row["drug_a"], "b": row["drug_b"], "severity": severity,
+                   "description": row.get("description"), "mechanism": "Knowledge base"})
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def simulate_round_trip(*_args):
+        time.sleep(rtt_ms / 1000.0)
+
+    return engine, sorted({r["drug_a"] for r in rows} | {r["drug_b"] for r in rows})
+
+
+async def measure(func, medications, session, repeats):
+    """Return (median latency in ms, result) over several runs."""
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = await func(medications, session)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="Simulated DB round trip")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 5, 10, 15, 20])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    engine, drug_names = create_seeded_engine(args.rtt_ms)
+    session = sessionmaker(bind=engine)()
+
+    print(f"Simulated round trip: {args.rtt_ms:.1f}ms")
+    print(f"{'N':>4} {'pairs':>6} {'pairwise_ms':>12} {'batched_ms':>11} {'speedup':>8} "
+          f"{'found_pw':>9} {'found_b':>8}")
+    for n in args.sizes:
+        medications = drug_names[:n]
+        pairwise_ms, pairwise = await measure(
+            _analyze_drug_interactions_pairwise, medications, session, args.repeats
+        )
+        batched_ms, batched = await measure(
+            _analyze_drug_interactions_batched, medications, session, args.repeats
+        )
+        # Batched mode matches by canonical drug ID, pairwise by LIKE patterns
+        print(f"{n:>4} {n * (n - 1) // 2:>6} {pairwise_ms:>12.1f} {batched_ms:>11.1f} "
+              f"{pairwise_ms / max(batched_ms, 1e-9):>7.1f}x {len(pairwise):>9} {len(batched):>8}")
+
+    session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,167 @@
+"""
+Benchmark: full patient registry scan vs single-patient context loader
+
+Seeds an in-memory SQLite database with synthetic patients (each with active
+and discontinued medications, diagnoses and allergies) and compares the old
+analyze-interactions path (joinedload every patient, then pick one) with
+PatientContextLoader, which only touches the requested patient.
+
+Usage (from sadewa-backend/):
+    python -m benchmarks.bench_patient_context --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from app.models import Base, Patient, PatientAllergy, PatientDiagnosis, PatientMedication
+from services.patient_context import PatientContextLoader
+
+MEDICATIONS = ["Warfarin", "Aspirin", "Metformin", "Amlodipine", "Simvastatin",
+               "Omeprazole", "Ibuprofen", "Lisinopril", "Furosemide", "Clopidogrel"]
+DIAGNOSES = ["Hypertension", "Type 2 Diabetes Mellitus", "Atrial Fibrillation",
+             "Chronic Kidney Disease", "Dyspepsia", "Osteoarthritis"]
+ALLERGENS = ["Penicillin", "Sulfa", "Aspirin", "Latex"]
+
+
+def create_seeded_engine(patients: int, rtt_ms: float):
+    """Create a SQLite engine with synthetic patients and simulated latency."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[
+        Patient.__table__, PatientMedication.__table__,
+        PatientDiagnosis.__table__, PatientAllergy.__table__,
+    ])
+    rng = random.Random(42)
+
+    with engine.begin() as connection:
+        connection.execute(text("CREATE INDEX ix_pm_no_rm ON patient_medications (no_rm)"))
+        connection.execute(text("CREATE INDEX ix_pd_no_rm ON patient_diagnoses (no_rm)"))
+        connection.execute(text("CREATE INDEX ix_pa_no_rm ON patient_allergies (no_rm)"))
+
+        patient_rows, medication_rows, diagnosis_rows, allergy_rows = [], [], [], []
+        for i in range(1, patients + 1):
+            no_rm = f"RM{i:07d}"
+            patient_rows.append({
+                "id": i, "no_rm": no_rm, "name": f"Pasien {i}",
+                "age": rng.randint(18, 90), "gender": rng.choice(["male", "female"]),
+                "weight_kg": rng.randint(45, 100),
+            })
+            for j, name in enumerate(rng.sample(MEDICATIONS, 4)):
+                medication_rows.append({
+                    "no_rm": no_rm, "medication_name": name,
+                    "dosage": f"{rng.choice([5, 10, 20, 500])}mg", "is_active": j < 3,
+                })
+            for name in rng.sample(DIAGNOSES, 2):
+                diagnosis_rows.append({"no_rm": no_rm, "diagnosis_text": name})
+            allergy_rows.append({"no_rm": no_rm, "allergen": rng.choice(ALLERGENS),
+                                 "severity": "moderate"})
+
+        connection.execute(text("""
+            INSERT INTO patients (id, no_rm, name, age, gender, weight_kg)
+            VALUES (:id, :no_rm, :name, :age, :gender, :weight_kg)
+        """), patient_rows)
+        connection.execute(text("""
+            INSERT INTO patient_medications (no_rm, medication_name, dosage, is_active)
+            VALUES (:no_rm, :medication_name, :dosage, :is_active)
+        """), medication_rows)
+        connection.execute(text("""
+            INSERT INTO patient_diagnoses (no_rm, diagnosis_text)
+            VALUES (:no_rm, :diagnosis_text)
+        """), diagnosis_rows)
+        connection.execute(text("""
+            INSERT INTO patient_allergies (no_rm, allergen, severity)
+            VALUES (:no_rm, :allergen, :severity)
+        """), allergy_rows)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def simulate_round_trip(*_args):
+        time.sleep(rtt_ms / 1000.0)
+
+    return engine
+
+
+def legacy_full_scan(session, patient_key: str):
+    """The previous path: joinedload every patient, then pick one with next()."""
+    patients = session.query(Patient)\
+        .options(joinedload(Patient.medications))\
+        .options(joinedload(Patient.diagnoses))\
+        .options(joinedload(Patient.allergies))\
+        .all()
+    result = [
+        {
+            "id": patient.id,
+            "no_rm": patient.no_rm,
+            "current_medications": [
+                f"{med.medication_name} {med.dosage or ''}".strip()
+                for med in patient.medications if med.is_active
+            ],
+            "diagnoses_text": [diag.diagnosis_text for diag in patient.diagnoses],
+            "allergies": [allergy.allergen for allergy in patient.allergies],
+        }
+        for patient in patients
+    ]
+    session.expunge_all()
+    return next((p for p in result if p["no_rm"] == patient_key), None)
+
+
+def measure(func, repeats):
+    """Median latency in ms over several runs."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="Simulated DB round trip")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--legacy-max", type=int, default=100000,
+                        help="Skip the full-scan path above this registry size")
+    args = parser.parse_args()
+
+    print(f"Simulated round trip: {args.rtt_ms:.1f}ms")
+    print(f"{'patients':>9} {'full_scan_ms':>13} {'loader_ms':>10} {'cached_ms':>10} "
+          f"{'meds':>5} {'same':>5}")
+    for size in args.sizes:
+        engine = create_seeded_engine(size, args.rtt_ms)
+        session = sessionmaker(bind=engine)()
+        patient_key = f"RM{size // 2:07d}"
+
+        uncached = PatientContextLoader(cache_ttl=0)
+        cached = PatientContextLoader(cache_ttl=300)
+        context = uncached.load(session, patient_key)
+        cached.load(session, patient_key)
+
+        loader_ms = measure(lambda: uncached.load(session, patient_key), args.repeats)
+        cached_ms = measure(lambda: cached.load(session, patient_key), args.repeats)
+
+        if size <= args.legacy_max:
+            legacy = legacy_full_scan(session, patient_key)
+            full_ms = measure(lambda: legacy_full_scan(session, patient_key),
+                              max(1, min(args.repeats, 3)))
+            same = legacy["current_medications"] == context["current_medications"] and \
+                legacy["diagnoses_text"] == context["diagnoses_text"] and \
+                legacy["allergies"] == context["allergies"]
+            full_col = f"{full_ms:>13.1f}"
+        else:
+            full_col, same = f"{'skipped':>13}", "-"
+
+        print(f"{size:>9} {full_col} {loader_ms:>10.2f} {cached_ms:>10.3f} "
+              f"{len(context['current_medications']):>5} {str(same):>5}")
+        session.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Fake LLM server: a local OpenAI/Groq-compatible chat completions endpoint
+
+Stands in for the Groq API during load tests so GroqService can be driven at
+high concurrency on an offline machine. Each completion waits for a latency
+sampled from a configurable distribution, then returns a valid clinical
+analysis JSON built from the prompt (one warning per interaction row, so the
+response size tracks the prompt). Errors, hangs and malformed JSON can be
+injected at fixed rates to exercise retries, deadlines and the circuit breaker.
+
+Usage (from sadewa-backend/):
+    python -m benchmarks.fake_llm_server --latency lognormal --latency-ms 800 --error-rate 0.05
+    LLM_BACKEND=fake LLM_FAKE_URL=http://127.0.0.1:8787 uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+NEW_MEDICATIONS_SECTION = re.compile(r"NEW MEDICATIONS TO PRESCRIBE:\n(.*?)\n\n", re.S)
+INTERACTIONS_SECTION = re.compile(r"DRUG INTERACTIONS DATABASE[^\n]*\n(.*)$", re.S)
+LIST_ITEM = re.compile(r"^\s*\d+\.\s*(.+)$")
+
+
+class LatencyModel:
+    """Latency sampler: fixed, uniform or lognormal, plus an optional slow tail."""
+
+    def __init__(self, kind: str, median_ms: float, spread: float,
+                 tail_rate: float, tail_ms: float, seed: Optional[int] = None):
+        self.kind = kind
+        self.median_ms = median_ms
+        self.spread = spread
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.rng = random.Random(seed)
+
+    def sample(self) -> float:
+        """One latency in seconds."""
+        if self.tail_rate and self.rng.random() < self.tail_rate:
+            return self.tail_ms / 1000.0
+        if self.kind == "fixed":
+            ms = self.median_ms
+        elif self.kind == "uniform":
+            ms = self.rng.uniform(self.median_ms * (1 - self.spread), self.median_ms * (1 + self.spread))
+        else:
+            # spread = sigma of the underlying normal; median stays at median_ms
+            ms = self.rng.lognormvariate(math.log(max(self.median_ms, 1e-3)), self.spread)
+        return max(ms, 0.0) / 1000.0
+
+
+def build_analysis(prompt: str) -> Dict:
+    """Deterministic, schema-valid analysis derived from the prompt sections."""
+    new_meds: List[str] = []
+    match = NEW_MEDICATIONS_SECTION.search(prompt)
+    if match:
+        for line in match.group(1).splitlines():
+            item = LIST_ITEM.match(line)
+            if item:
+                new_meds.append(item.group(1).strip())
+
+    warnings = []
+    match = INTERACTIONS_SECTION.search(prompt)
+    if match:
+        for line in match.group(1).splitlines()[1:]:
+            cells = line.split("|")
+            if len(cells) < 4:
+                continue
+            severity = cells[2].strip().upper()
+            warnings.append({
+                "severity": severity if severity in ("MAJOR", "MODERATE", "MINOR") else "MODERATE",
+                "type": "DRUG_INTERACTION",
+                "drugs_involved": [cells[0].strip(), cells[1].strip()],
+                "description": cells[3].strip(),
+                "clinical_significance": "Synthetic finding from fake LLM server",
+                "recommendation": "Review combination",
+                "monitoring_required": "Clinical monitoring",
+            })
+
+    levels = [w["severity"] for w in warnings]
+    risk = next((level for level in ("MAJOR", "MODERATE", "MINOR") if level in levels), "LOW")
+    return {
+        "overall_risk_level": risk,
+        "safe_to_prescribe": risk in ("LOW", "MINOR"),
+        "warnings": warnings,
+        "contraindications": [],
+        "dosing_adjustments": [],
+        "monitoring_plan": ["Routine clinical monitoring"],
+        "llm_reasoning": f"Fake LLM analysis for {', '.join(new_meds) or 'no medications'}.",
+        "confidence_score": 0.8,
+    }
+
+
+def create_app(args) -> FastAPI:
+    app = FastAPI(title="Fake LLM server")
+    latency = LatencyModel(args.latency, args.latency_ms, args.spread,
+                           args.tail_rate, args.tail_ms, args.seed)
+    rng = random.Random(args.seed)
+    counters = {"requests": 0, "errors": 0, "hangs": 0, "malformed": 0}
+
+    def completion_id() -> str:
+        return f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        counters["requests"] += 1
+        model = body.get("model", "fake-model")
+        prompt = "\n".join(m.get("content", "") for m in body.get("messages", []) if m.get("role") == "user")
+
+        if args.hang_rate and rng.random() < args.hang_rate:
+            counters["hangs"] += 1
+            await asyncio.sleep(args.hang_seconds)
+        else:
+            await asyncio.sleep(latency.sample())
+
+        if args.error_rate and rng.random() < args.error_rate:
+            counters["errors"] += 1
+            return JSONResponse(
+                status_code=args.error_status,
+                content={"error": {"message": "Injected failure", "type": "server_error"}},
+            )
+
+        content = json.dumps(build_analysis(prompt), indent=2)
+        if args.malformed_rate and rng.random() < args.malformed_rate:
+            counters["malformed"] += 1
+            content = content[: len(content) // 2]
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        completion_tokens = len(content) // 4
+        created = int(time.time())
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id(),
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+
+        async def events():
+            chunk_id = completion_id()
+            for start in range(0, len(content), args.chunk_chars):
+                chunk = {
+                    "id": chunk_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"content": content[start:start + args.chunk_chars]},
+                        "finish_reason": None,
+                    }],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if args.chunk_delay_ms:
+                    await asyncio.sleep(args.chunk_delay_ms / 1000.0)
+            done = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return dict(counters)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="Median latency")
+    parser.add_argument("--spread", type=float, default=0.5,
+                        help="Lognormal sigma, or +/- fraction for uniform")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="Fraction of slow-tail calls")
+    parser.add_argument("--tail-ms", type=float, default=5000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--hang-rate", type=float, default=0.0,
+                        help="Fraction of calls that stall for --hang-seconds")
+    parser.add_argument("--hang-seconds", type=float, default=60.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="Fraction of completions returned as truncated JSON")
+    parser.add_argument("--chunk-chars", type=int, default=16, help="Characters per stream chunk")
+    parser.add_argument("--chunk-delay-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Load test: end-to-end analysis endpoints against a running backend
+
+Fires concurrent requests at /interactions/analyze-interactions,
+/ai/analyze/drug-interactions or /ai/analyze/ai-diagnosis and reports latency
+percentiles, throughput, status codes and (for interactions) the analysis_path
+mix. Run the backend with LLM_BACKEND=fake (benchmarks/fake_llm_server.py) or
+LLM_BACKEND=replay to measure the service without calling Groq.
+
+Usage (from sadewa-backend/):
+    python -m benchmarks.fake_llm_server --latency-ms 800 &
+    LLM_BACKEND=fake uvicorn main:app --port 8000 &
+    python -m benchmarks.load_test_analysis --endpoint interactions --requests 500 --concurrency 100
+"""
+import argparse
+import asyncio
+import collections
+import random
+import statistics
+import time
+import uuid
+
+import httpx
+
+MEDICATIONS = ["Warfarin", "Aspirin", "Metformin", "Amlodipine", "Simvastatin",
+               "Omeprazole", "Ibuprofen", "Lisinopril", "Furosemide", "Clopidogrel",
+               "Paracetamol", "Ciprofloxacin", "Digoxin", "Allopurinol"]
+SYMPTOMS = ["demam", "batuk", "sesak napas", "nyeri dada", "pusing", "mual"]
+
+ENDPOINTS = {
+    "interactions": "/interactions/analyze-interactions",
+    "ai-drug": "/ai/analyze/drug-interactions",
+    "ai-diagnosis": "/ai/analyze/ai-diagnosis",
+}
+
+
+def build_payload(endpoint: str, rng: random.Random, patients, unique: bool):
+    """Request body for one call; unique=True varies notes to bypass result caches."""
+    meds = rng.sample(MEDICATIONS, rng.randint(1, 3))
+    patient = rng.choice(patients)
+    if endpoint == "interactions":
+        payload = {"patient_id": patient, "new_medications": meds}
+        if unique:
+            payload["notes"] = f"load-test {uuid.uuid4().hex[:8]}"
+        return payload
+    numeric_id = int("".join(ch for ch in patient if ch.isdigit()) or 1)
+    if endpoint == "ai-drug":
+        return {"medications": meds + [rng.choice(MEDICATIONS)], "patient_id": numeric_id,
+                "include_cache": not unique}
+    return {"patient_id": numeric_id, "analysis_type": "diagnosis",
+            "symptoms": rng.sample(SYMPTOMS, 2), "current_medications": meds}
+
+
+def percentile(ordered, q):
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    path = ENDPOINTS[args.endpoint]
+    payloads = [build_payload(args.endpoint, rng, args.patients, args.unique)
+                for _ in range(args.requests)]
+    latencies, statuses, paths = [], collections.Counter(), collections.Counter()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        async def one(payload):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(path, json=payload)
+                    statuses[response.status_code] += 1
+                    if response.status_code == 200 and args.endpoint == "interactions":
+                        paths[response.json().get("analysis_path") or "unknown"] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(payload) for payload in payloads))
+        wall = time.perf_counter() - started
+
+        monitoring = None
+        if args.show_llm_stats:
+            try:
+                monitoring = (await client.get("/monitoring")).json().get("llm")
+            except (httpx.HTTPError, ValueError):
+                monitoring = None
+
+    ordered = sorted(latencies)
+    print(f"endpoint     {path}")
+    print(f"requests     {len(latencies)}  concurrency {args.concurrency}  unique {args.unique}")
+    print(f"wall_s       {wall:.2f}  throughput {len(latencies) / wall:.1f} req/s")
+    print(f"latency_ms   p50 {percentile(ordered, 0.5):.1f}  p95 {percentile(ordered, 0.95):.1f}  "
+          f"p99 {percentile(ordered, 0.99):.1f}  max {ordered[-1]:.1f}  "
+          f"mean {statistics.mean(ordered):.1f}")
+    print(f"status       {dict(statuses)}")
+    if paths:
+        print(f"paths        {dict(paths)}")
+    if monitoring:
+        print(f"llm          {monitoring}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="interactions")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--patients", nargs="+", default=[f"P{i:03d}" for i in range(1, 11)])
+    parser.add_argument("--unique", action="store_true",
+                        help="Vary every request so result/prompt caches cannot answer")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--show-llm-stats", action="store_true",
+                        help="Print GroqService stats from /monitoring after the run")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
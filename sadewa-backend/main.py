@@ -15,14 +15,27 @@ from sqlalchemy.exc import SQLAlchemyError
 import uvicorn
 
 # Import optimized routers and database components
-from app.database import engine, get_database_stats, test_database_connection
+from app.database import engine, SessionLocal, get_database_stats, test_database_connection
 from app.routers.patients import router as patients_router
 from app.routers.medical_records import router as medical_records_router
 from app.routers.ai_diagnosis import router as ai_diagnosis_router
-from app.routers.interactions import router as interactions_router
+from app.routers.interactions import router as interactions_router, precompute_patient_analysis
 
 # Import existing routers
 from app.routers import drugs, icd10, interactions
+from services.allergen_index import allergen_index
+from services.clinical_rules import clinical_rules
+from services.drug_canonicalizer import drug_canonicalizer
+from services.groq_service import groq_service
+from services.interaction_cache import interaction_cache
+from services.interaction_index import interaction_index
+from services.icd_contraindications import contraindication_engine
+from services.interaction_matrix import interaction_matrix
+from services.icd10_index import icd10_index
+from services.knowledge_base import knowledge_base
+from services.precompute import precompute_queue
+from services.rule_engine import rule_engine
+from services.single_flight import drug_interaction_flight, interaction_analysis_flight
 
 # Setup logging
 logging.basicConfig(
@@ -53,9 +66,26 @@ async def lifespan(app: FastAPI):
             logger.info(f"📊 Database stats: {stats}")
         except Exception as e:
             logger.warning(f"Could not get initial database stats: {e}")
+
+        # Warm up the drug dictionary and interaction index so the first request doesn't pay for it
+        try:
+            with SessionLocal() as db:
+                drug_canonicalizer.ensure_fresh(db)
+                interaction_index.ensure_fresh(db)
+                knowledge_base.ensure_fresh(db)
+                interaction_matrix.ensure_fresh()
+                icd10_index.ensure_fresh(db)
+        except Exception as e:
+            logger.warning(f"Could not warm up interaction index: {e}")
     else:
         logger.error("❌ Database connection failed. Please check database configuration and connectivity.")
     
+    # Background L1 expiry sweep + L2 write-behind for the interaction cache
+    interaction_cache.start()
+    
+    # Background precompute of interaction analyses after medication writes
+    precompute_queue.start(precompute_patient_analysis)
+    
     logger.info("🎯 Application startup completed successfully")
     
     yield  # Application is running
@@ -63,6 +93,15 @@ async def lifespan(app: FastAPI):
     # ===== SHUTDOWN =====
     logger.info("🛑 Shutting down SADEWA API")
     
+    await precompute_queue.stop()
+    await interaction_cache.stop()
+    
+    try:
+        await groq_service.aclose()
+        logger.info("🔌 Groq HTTP connection pool closed.")
+    except Exception as e:
+        logger.error(f"Error closing Groq client: {e}")
+    
     if engine:
         try:
             engine.dispose()
@@ -213,6 +252,19 @@ async def monitoring_dashboard():
                 "connection_pool": pool_stats,
                 "activity": database_activity
             },
+            "llm": groq_service.stats(),
+            "rule_engine": rule_engine.stats(),
+            "contraindications": contraindication_engine.stats(),
+            "allergens": allergen_index.stats(),
+            "clinical_rules": clinical_rules.stats(),
+            "precompute": precompute_queue.stats(),
+            "knowledge_base": knowledge_base.stats(),
+            "interaction_matrix": interaction_matrix.stats(),
+            "icd10_index": icd10_index.stats(),
+            "single_flight": [
+                interaction_analysis_flight.stats(),
+                drug_interaction_flight.stats()
+            ],
             "last_updated": datetime.now().isoformat()
         }
         
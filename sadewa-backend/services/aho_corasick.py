@@ -0,0 +1,76 @@
+"""
+Aho-Corasick automaton untuk SADEWA
+Multi-pattern matcher: semua pattern dicari dalam satu pass linear atas teks.
+"""
+from collections import deque
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """Automaton Aho-Corasick berbasis karakter dengan payload per pattern."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+        self._built = False
+        self.pattern_count = 0
+
+    def add(self, pattern: str, payload: Any) -> None:
+        """Tambahkan pattern beserta payload-nya (sebelum build)."""
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((len(pattern), payload))
+        self.pattern_count += 1
+        self._built = False
+
+    def build(self) -> "AhoCorasick":
+        """Hitung failure link (BFS) dan gabungkan output antar state."""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+        self._built = True
+        return self
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (start, end, payload) untuk setiap kemunculan pattern di teks."""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, payload in out[state]:
+                yield index + 1 - length, index + 1, payload
+
+    def iter_word_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Seperti iter_matches, tapi hanya match yang berada di batas kata (spasi)."""
+        size = len(text)
+        for start, end, payload in self.iter_matches(text):
+            if (start == 0 or text[start - 1] == " ") and (end == size or text[end] == " "):
+                yield start, end, payload
@@ -0,0 +1,316 @@
+"""
+Allergen Cross-Reactivity Index untuk SADEWA
+Ontologi alergen dari data/drug_classes.json (kelas obat, anggota, kelas yang
+bereaksi silang) dikompilasi menjadi tag per drug ID kanonik. Alergi pasien
+dikompilasi sekali menjadi profil (tag terlarang -> level), sehingga screening
+satu resep cukup irisan set tag obat dengan profil, tanpa tes substring M×A.
+
+Level temuan:
+- direct: obat itu sendiri, atau anggota kelas yang disebut sebagai alergen
+  ("Penicillin" -> amoxicillin)
+- class_member: anggota lain dari kelas obat alergen ("Aspirin" -> ibuprofen)
+- cross_reactive: anggota kelas yang bereaksi silang ("Penicillin" -> cefixime)
+
+Kelas farmakologis dengan "allergy_group": false (antikoagulan, inhibitor
+CYP3A4, ...) tidak dipakai untuk screening alergi, tetapi tetap menjadi kelas
+obat kanonik untuk rule klinis dan rule interaksi kelas ("interaction_rules").
+Rule interaksi diekspansi menjadi pasangan drug ID saat build.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from services.drug_canonicalizer import DATA_DIR, drug_canonicalizer, normalize_drug_text
+
+DRUG_CLASSES_FILE = os.path.join(DATA_DIR, "drug_classes.json")
+ALLERGY_PROFILE_CACHE_SIZE = int(os.getenv("ALLERGY_PROFILE_CACHE_SIZE", "4096"))
+
+# Teks alergi yang berarti "tidak ada alergi"
+NO_ALLERGY_VALUES = frozenset({"", "-", "none", "none known", "tidak ada", "nka", "nkda"})
+
+LEVEL_SEVERITY = {"direct": "MAJOR", "class_member": "MODERATE", "cross_reactive": "MODERATE"}
+_LEVEL_RANK = {"direct": 3, "class_member": 2, "cross_reactive": 1}
+
+
+def interaction_rule_row(drug_a: str, drug_b: str, rule: Dict) -> Dict:
+    """Row interaksi (format knowledge base) untuk satu pasangan hasil ekspansi rule kelas/obat."""
+    class_based = any(str(rule.get(side, "")).startswith("class:") for side in ("a", "b"))
+    return {
+        "drug_a": drug_canonicalizer.display_name(drug_a),
+        "drug_b": drug_canonicalizer.display_name(drug_b),
+        "severity": rule.get("severity", "Moderate"),
+        "description": rule.get("description", ""),
+        "recommendation": rule.get("recommendation", ""),
+        "mechanism": rule.get("mechanism", ""),
+        "interaction_type": "category_based" if class_based else "rule_based",
+        "rule": f"{rule.get('a')} + {rule.get('b')}",
+    }
+
+
+class AllergyHit:
+    """Satu temuan alergi: obat resep vs alergen pasien."""
+
+    __slots__ = ("medication", "drug_id", "allergen", "level", "class_name")
+
+    def __init__(self, medication: str, drug_id: str, allergen: str, level: str,
+                 class_name: Optional[str]):
+        self.medication = medication
+        self.drug_id = drug_id
+        self.allergen = allergen
+        self.level = level
+        self.class_name = class_name
+
+    @property
+    def severity(self) -> str:
+        return LEVEL_SEVERITY[self.level]
+
+    def describe(self) -> str:
+        """Kalimat singkat untuk warning/kontraindikasi."""
+        if self.level == "direct":
+            return f"Patient has a documented allergy: {self.allergen}"
+        if self.level == "class_member":
+            return f"Same drug class ({self.class_name}) as documented allergy: {self.allergen}"
+        return f"Possible cross-reactivity ({self.class_name}) with documented allergy: {self.allergen}"
+
+    def to_warning(self) -> Dict:
+        """Format item warnings (type ALLERGY) di InteractionResponse."""
+        direct = self.level == "direct"
+        return {
+            "severity": self.severity,
+            "type": "ALLERGY",
+            "drugs_involved": [self.medication],
+            "description": self.describe(),
+            "clinical_significance": "Risk of hypersensitivity reaction",
+            "recommendation": (
+                "Do not prescribe; choose a non-cross-reactive alternative" if direct
+                else "Confirm allergy history; prefer an agent from an unrelated class"
+            ),
+            "monitoring_required": (
+                "Not applicable - avoid drug" if direct
+                else "Observe for hypersensitivity after the first dose"
+            ),
+        }
+
+
+class AllergyProfile:
+    """Alergi satu pasien yang sudah dikompilasi: tag terlarang -> (level, alergen, kelas)."""
+
+    __slots__ = ("tags", "unresolved")
+
+    def __init__(self, tags: Dict[str, Tuple[str, str, Optional[str]]], unresolved: List[str]):
+        self.tags = tags
+        self.unresolved = unresolved
+
+
+class _Ontology:
+    """Snapshot immutable ontologi (di-swap saat rebuild)."""
+
+    __slots__ = ("class_aliases", "class_names", "cross_reactive", "drug_classes",
+                 "allergy_classes", "interaction_pairs", "non_drug", "max_alias_tokens")
+
+    def __init__(self):
+        self.class_aliases: Dict[Tuple[str, ...], str] = {}
+        self.class_names: Dict[str, str] = {}
+        self.cross_reactive: Dict[str, List[str]] = {}
+        self.drug_classes: Dict[str, FrozenSet[str]] = {}
+        # Hanya kelas alergen (allergy_group != false)
+        self.allergy_classes: Dict[str, FrozenSet[str]] = {}
+        # (drug_id_a, drug_id_b, rule) hasil ekspansi interaction_rules
+        self.interaction_pairs: List[Tuple[str, str, Dict]] = []
+        self.non_drug: set = set()
+        self.max_alias_tokens = 1
+
+
+class AllergenIndex:
+    """Screening alergi per resep berbasis tag drug ID kanonik + kelas obat."""
+
+    def __init__(self, cache_size: int = ALLERGY_PROFILE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._ontology = _Ontology()
+        self._sources: Optional[Tuple] = None
+        self._profiles: "OrderedDict[Tuple[str, ...], AllergyProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.profile_hits = 0
+        self.profile_misses = 0
+        self.screenings = 0
+
+    def _current(self) -> _Ontology:
+        """Ontologi terkini; dibangun ulang jika kamus obat atau file ontologi berubah."""
+        try:
+            mtime = os.path.getmtime(DRUG_CLASSES_FILE)
+        except OSError:
+            mtime = None
+        sources = (drug_canonicalizer.generation, mtime)
+        if sources != self._sources:
+            with self._lock:
+                if sources != self._sources:
+                    self._ontology = self._build()
+                    self._profiles.clear()
+                    self._sources = sources
+        return self._ontology
+
+    @staticmethod
+    def _build() -> _Ontology:
+        ontology = _Ontology()
+        try:
+            with open(DRUG_CLASSES_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Drug class ontology not available: {e}")
+            data = {}
+
+        drug_classes: Dict[str, set] = {}
+        allergy_classes: Dict[str, set] = {}
+        class_members: Dict[str, set] = {}
+        for entry in data.get("classes", []):
+            class_id = entry["id"]
+            ontology.class_names[class_id] = entry.get("name", class_id)
+            members = {drug_canonicalizer.canonical_id(member) for member in entry.get("members", [])}
+            members.discard(None)
+            class_members[class_id] = members
+            for drug_id in members:
+                drug_classes.setdefault(drug_id, set()).add(class_id)
+            if not entry.get("allergy_group", True):
+                continue
+            ontology.cross_reactive[class_id] = list(entry.get("cross_reactive", []))
+            for drug_id in members:
+                allergy_classes.setdefault(drug_id, set()).add(class_id)
+            for alias in [entry.get("name", "")] + entry.get("aliases", []):
+                tokens = tuple(normalize_drug_text(alias))
+                if tokens:
+                    ontology.class_aliases.setdefault(tokens, class_id)
+                    ontology.max_alias_tokens = max(ontology.max_alias_tokens, len(tokens))
+
+        def expand(side: str) -> set:
+            if side.startswith("class:"):
+                return class_members.get(side[len("class:"):], set())
+            drug_id = drug_canonicalizer.canonical_id(side)
+            return {drug_id} if drug_id else set()
+
+        for rule in data.get("interaction_rules", []):
+            for drug_a in sorted(expand(rule.get("a", ""))):
+                for drug_b in sorted(expand(rule.get("b", ""))):
+                    if drug_a != drug_b:
+                        ontology.interaction_pairs.append((drug_a, drug_b, rule))
+        for allergen in data.get("non_drug_allergens", []):
+            tokens = tuple(normalize_drug_text(allergen))
+            if tokens:
+                ontology.non_drug.add(tokens)
+                ontology.max_alias_tokens = max(ontology.max_alias_tokens, len(tokens))
+        ontology.drug_classes = {drug_id: frozenset(c) for drug_id, c in drug_classes.items()}
+        ontology.allergy_classes = {drug_id: frozenset(c) for drug_id, c in allergy_classes.items()}
+        return ontology
+
+    @staticmethod
+    def _match_phrase(tokens: List[str], phrases, max_tokens: int):
+        """Frasa terpanjang paling kiri dari `phrases` (dict/set atas tuple token)."""
+        for start in range(len(tokens)):
+            for end in range(min(len(tokens), start + max_tokens), start, -1):
+                phrase = tuple(tokens[start:end])
+                if phrase in phrases:
+                    return phrase
+        return None
+
+    def classes_of(self, drug_id: str) -> FrozenSet[str]:
+        """Kelas obat untuk satu drug ID kanonik."""
+        return self._current().drug_classes.get(drug_id, frozenset())
+
+    def members_of(self, class_id: str) -> List[str]:
+        """Drug ID kanonik anggota satu kelas obat."""
+        return sorted(
+            drug_id for drug_id, classes in self._current().drug_classes.items() if class_id in classes
+        )
+
+    def interaction_pairs(self) -> List[Tuple[str, str, Dict]]:
+        """Pasangan (drug_id_a, drug_id_b, rule) hasil ekspansi rule interaksi kelas/obat."""
+        return self._current().interaction_pairs
+
+    def profile(self, allergies: Iterable[str]) -> AllergyProfile:
+        """Profil alergi terkompilasi (di-cache per daftar alergi, LRU)."""
+        ontology = self._current()
+        key = tuple(str(allergen) for allergen in allergies or ())
+        with self._lock:
+            cached = self._profiles.get(key)
+            if cached is not None:
+                self._profiles.move_to_end(key)
+                self.profile_hits += 1
+                return cached
+        self.profile_misses += 1
+
+        tags: Dict[str, Tuple[str, str, Optional[str]]] = {}
+
+        def add(tag: str, level: str, allergen: str, class_id: Optional[str]) -> None:
+            current = tags.get(tag)
+            if current is None or _LEVEL_RANK[level] > _LEVEL_RANK[current[0]]:
+                tags[tag] = (level, allergen, class_id)
+
+        def add_class(class_id: str, level: str, allergen: str) -> None:
+            add(f"class:{class_id}", level, allergen, class_id)
+            for other in ontology.cross_reactive.get(class_id, ()):
+                add(f"class:{other}", "cross_reactive", allergen, other)
+
+        unresolved = []
+        for allergen in key:
+            if allergen.strip().lower() in NO_ALLERGY_VALUES:
+                continue
+            tokens = normalize_drug_text(allergen)
+            class_phrase = self._match_phrase(tokens, ontology.class_aliases, ontology.max_alias_tokens)
+            if class_phrase is not None:
+                # Alergen menyebut kelas: semua anggotanya dianggap alergi langsung
+                add_class(ontology.class_aliases[class_phrase], "direct", allergen)
+                continue
+            match = drug_canonicalizer.resolve(allergen)
+            if match.known:
+                add(f"drug:{match.drug_id}", "direct", allergen, None)
+                for class_id in ontology.allergy_classes.get(match.drug_id, ()):
+                    add_class(class_id, "class_member", allergen)
+                continue
+            if self._match_phrase(tokens, ontology.non_drug, ontology.max_alias_tokens) is None:
+                unresolved.append(allergen)
+
+        result = AllergyProfile(tags, unresolved)
+        with self._lock:
+            self._profiles[key] = result
+            while len(self._profiles) > self.cache_size:
+                self._profiles.popitem(last=False)
+        return result
+
+    def screen(self, medications: List[str], allergies: Iterable[str]) -> List[AllergyHit]:
+        """Temuan alergi untuk setiap obat resep (level tertinggi per obat)."""
+        self.screenings += 1
+        profile = self.profile(allergies)
+        if not profile.tags:
+            return []
+        ontology = self._current()
+        class_names = ontology.class_names
+        hits = []
+        for med, drug_id in zip(medications, drug_canonicalizer.canonical_ids(medications)):
+            med_tags = {f"drug:{drug_id}"}
+            med_tags.update(f"class:{class_id}" for class_id in ontology.allergy_classes.get(drug_id, ()))
+            matched = med_tags & profile.tags.keys()
+            if not matched:
+                continue
+            level, allergen, class_id = max(
+                (profile.tags[tag] for tag in matched), key=lambda found: _LEVEL_RANK[found[0]]
+            )
+            hits.append(AllergyHit(med, drug_id, allergen, level, class_names.get(class_id)))
+        return hits
+
+    def stats(self) -> Dict:
+        """Statistik index untuk monitoring."""
+        ontology = self._ontology
+        return {
+            "classes": len(ontology.class_names),
+            "classified_drugs": len(ontology.drug_classes),
+            "interaction_pairs": len(ontology.interaction_pairs),
+            "cached_profiles": len(self._profiles),
+            "profile_hits": self.profile_hits,
+            "profile_misses": self.profile_misses,
+            "screenings": self.screenings,
+        }
+
+
+# Global instance
+allergen_index = AllergenIndex()
@@ -0,0 +1,176 @@
+"""
+Circuit Breaker untuk SADEWA
+Melindungi dependency eksternal (Groq): jika error rate (termasuk timeout) atau,
+bila diaktifkan, rasio call lambat dalam window terakhir melewati ambang, circuit
+OPEN dan request langsung ke fallback tanpa menunggu timeout. Setelah open_duration, satu probe (HALF_OPEN)
+menentukan apakah circuit kembali CLOSED.
+
+Setiap call membawa CallPermit berisi generasi circuit saat call diizinkan. Generasi
+naik di setiap transisi state, sehingga hasil call lama (mis. dimulai saat CLOSED,
+selesai setelah circuit OPEN/HALF_OPEN) diabaikan dan hanya probe yang diizinkan
+yang bisa menutup atau membuka kembali circuit HALF_OPEN.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+BREAKER_WINDOW_SIZE = int(os.getenv("LLM_BREAKER_WINDOW_SIZE", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+# 0 = deteksi call lambat nonaktif. Jika diisi, harus jauh di bawah deadline request
+# (ANALYSIS_TIMEOUT_SECONDS): call yang memakai budget normalnya bukan tanda Groq bermasalah
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "0"))
+BREAKER_SLOW_CALL_RATE = float(os.getenv("LLM_BREAKER_SLOW_CALL_RATE", "0.8"))
+BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+
+
+class CircuitOpenError(Exception):
+    """Call ditolak karena circuit sedang OPEN."""
+
+
+class CallPermit:
+    """Izin satu call: generasi circuit saat diizinkan, dan apakah call ini probe HALF_OPEN."""
+
+    __slots__ = ("generation", "probe")
+
+    def __init__(self, generation: int, probe: bool = False):
+        self.generation = generation
+        self.probe = probe
+
+
+class LatencyTracker:
+    """Latency call sukses terakhir untuk menghitung persentil (mis. delay hedge p95)."""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Persentil q (0-1) dari sampel; None jika belum ada sampel."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class CircuitBreaker:
+    """Circuit breaker berbasis rolling window (error rate + slow call rate)."""
+
+    def __init__(self, name: str, window_size: int = BREAKER_WINDOW_SIZE,
+                 min_calls: int = BREAKER_MIN_CALLS, failure_rate: float = BREAKER_FAILURE_RATE,
+                 slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS,
+                 slow_call_rate: float = BREAKER_SLOW_CALL_RATE,
+                 open_seconds: float = BREAKER_OPEN_SECONDS):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        # (gagal, lambat) per call
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        # Naik di setiap transisi state (lihat CallPermit)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.times_opened = 0
+        self.last_open_reason: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        """State saat ini (OPEN berubah menjadi HALF_OPEN setelah open_seconds)."""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            return HALF_OPEN
+        return self._state
+
+    def allow(self) -> Optional[CallPermit]:
+        """Permit jika call boleh dilakukan (None jika ditolak); di HALF_OPEN hanya satu probe sekaligus."""
+        with self._lock:
+            state = self.state
+            if state == CLOSED:
+                return CallPermit(self._generation)
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._state = HALF_OPEN
+                self._generation += 1
+                self._probe_in_flight = True
+                return CallPermit(self._generation, probe=True)
+            self.rejected += 1
+            return None
+
+    def release_probe(self, permit: CallPermit) -> None:
+        """Call selesai tanpa hasil (mis. dibatalkan caller): bebaskan slot probe jika ini probe-nya."""
+        with self._lock:
+            if permit.probe and permit.generation == self._generation:
+                self._probe_in_flight = False
+
+    def record(self, permit: CallPermit, seconds: float, failed: bool = False) -> None:
+        """
+        Catat hasil satu call (durasi + gagal/tidak) dan evaluasi ambang. Hasil call
+        dari generasi circuit sebelumnya diabaikan.
+        """
+        slow = 0 < self.slow_call_seconds <= seconds
+        with self._lock:
+            if permit.generation != self._generation:
+                return
+            if self._state == HALF_OPEN:
+                if not permit.probe:
+                    return
+                self._probe_in_flight = False
+                if failed or slow:
+                    self._open("probe failed" if failed else "probe slow")
+                else:
+                    self._state = CLOSED
+                    self._generation += 1
+                    self._window.clear()
+                return
+
+            self._window.append((failed, slow))
+            calls = len(self._window)
+            if self._state != CLOSED or calls < self.min_calls:
+                return
+            failures = sum(1 for f, _ in self._window if f)
+            slow_calls = sum(1 for _, s in self._window if s)
+            if failures / calls >= self.failure_rate:
+                self._open(f"failure rate {failures}/{calls}")
+            elif slow_calls / calls >= self.slow_call_rate:
+                self._open(f"slow call rate {slow_calls}/{calls}")
+
+    def _open(self, reason: str) -> None:
+        """Buka circuit (lock harus sudah dipegang)."""
+        self._state = OPEN
+        self._generation += 1
+        self._opened_at = time.monotonic()
+        self._window.clear()
+        self.times_opened += 1
+        self.last_open_reason = reason
+
+    def stats(self) -> Dict:
+        """State dan statistik circuit untuk monitoring."""
+        calls = len(self._window)
+        state = self.state
+        return {
+            "name": self.name,
+            "state": state,
+            "window_calls": calls,
+            "window_failure_rate": round(sum(1 for f, _ in self._window if f) / max(calls, 1), 3),
+            "window_slow_rate": round(sum(1 for _, s in self._window if s) / max(calls, 1), 3),
+            "times_opened": self.times_opened,
+            "last_open_reason": self.last_open_reason,
+            "rejected_calls": self.rejected,
+            "retry_in_seconds": round(max(self.open_seconds - (time.monotonic() - self._opened_at), 0), 1)
+            if state == OPEN else 0,
+        }
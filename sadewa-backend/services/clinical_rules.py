@@ -0,0 +1,257 @@
+"""
+Clinical Rules untuk SADEWA
+Aturan geriatri (gaya Beers), ginjal dan kondisi lain dimuat dari
+data/clinical_rules.json: batas umur, pemicu diagnosis (prefix ICD-10 atau
+keyword teks diagnosis) dan target obat/kelas obat. Aturan dikompilasi menjadi
+tabel predikat terindeks:
+
+- kondisi pasien dideteksi sekali per resep (satu pass Aho-Corasick atas teks
+  diagnosis + walk prefix per kode ICD);
+- predikat (rentang umur, kondisi wajib) yang identik dipakai bersama dan
+  dievaluasi paling banyak sekali per resep;
+- rule diindeks per drug ID kanonik, sehingga tiap obat hanya mengecek rule
+  yang menargetkannya, berapapun jumlah rule di file.
+
+Setiap firing dicatat per rule untuk monitoring.
+"""
+import json
+import os
+import threading
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from services.aho_corasick import AhoCorasick
+from services.allergen_index import DRUG_CLASSES_FILE, allergen_index
+from services.drug_canonicalizer import DATA_DIR, drug_canonicalizer, normalize_drug_text
+from services.icd_contraindications import normalize_icd
+
+CLINICAL_RULES_FILE = os.path.join(DATA_DIR, "clinical_rules.json")
+
+
+def _file_mtime(path: str) -> Optional[float]:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class ClinicalRule:
+    """Satu rule hasil kompilasi (output berupa template teks)."""
+
+    __slots__ = ("id", "category", "predicate", "warning", "contraindication", "dosing")
+
+    def __init__(self, entry: Dict, predicate: int):
+        self.id = entry["id"]
+        self.category = entry.get("category", "clinical")
+        self.predicate = predicate
+        self.warning = entry.get("warning")
+        self.contraindication = entry.get("contraindication")
+        self.dosing = entry.get("dosing")
+
+
+class RuleFiring:
+    """Satu rule yang terpenuhi untuk satu obat resep."""
+
+    __slots__ = ("rule", "medication", "age")
+
+    def __init__(self, rule: ClinicalRule, medication: str, age):
+        self.rule = rule
+        self.medication = medication
+        self.age = age
+
+    def _render(self, template: Dict) -> Dict:
+        values = {"age": self.age, "drug": self.medication}
+        return {
+            key: value.format(**values) if isinstance(value, str) else value
+            for key, value in template.items()
+        }
+
+    def to_warning(self) -> Optional[Dict]:
+        """Item warnings (default type AGE_RELATED untuk rule geriatri, selain itu CONTRAINDICATION)."""
+        if not self.rule.warning:
+            return None
+        warning = self._render(self.rule.warning)
+        return {
+            "severity": warning.get("severity", "MODERATE"),
+            "type": warning.get(
+                "type", "AGE_RELATED" if self.rule.category == "geriatric" else "CONTRAINDICATION"
+            ),
+            "drugs_involved": [self.medication],
+            "description": warning.get("description", f"Clinical rule {self.rule.id}"),
+            "clinical_significance": warning.get("clinical_significance", "Clinical assessment required"),
+            "recommendation": warning.get("recommendation", "Consult healthcare provider"),
+            "monitoring_required": warning.get("monitoring_required", "Standard monitoring"),
+        }
+
+    def to_contraindication(self) -> Optional[Dict]:
+        if not self.rule.contraindication:
+            return None
+        contraindication = self._render(self.rule.contraindication)
+        return {
+            "drug": self.medication,
+            "diagnosis": contraindication.get("diagnosis", "Unknown"),
+            "reason": contraindication.get("reason", f"Clinical rule {self.rule.id}"),
+            "alternative_suggested": contraindication.get("alternative_suggested"),
+        }
+
+    def to_dosing(self) -> Optional[Dict]:
+        if not self.rule.dosing:
+            return None
+        dosing = self._render(self.rule.dosing)
+        return {
+            "drug": self.medication,
+            "standard_dose": dosing.get("standard_dose", "Standard dosing"),
+            "recommended_dose": dosing.get("recommended_dose", "See clinical notes"),
+            "reason": dosing.get("reason", f"Clinical rule {self.rule.id}"),
+        }
+
+
+class _CompiledRules:
+    """Snapshot immutable tabel rule (di-swap saat rebuild)."""
+
+    __slots__ = ("rules", "predicates", "by_drug", "keywords", "icd_prefixes")
+
+    def __init__(self):
+        self.rules: List[ClinicalRule] = []
+        # predikat: (min_age, max_age, kondisi wajib)
+        self.predicates: List[Tuple[Optional[float], Optional[float], FrozenSet[str]]] = []
+        self.by_drug: Dict[str, List[ClinicalRule]] = {}
+        self.keywords = AhoCorasick().build()
+        # prefix ICD ternormalisasi -> kondisi
+        self.icd_prefixes: Dict[str, Set[str]] = {}
+
+
+class ClinicalRuleEngine:
+    """Evaluasi rule geriatri/ginjal/kondisi dalam satu pass per resep."""
+
+    def __init__(self):
+        self._compiled = _CompiledRules()
+        self._sources: Optional[Tuple] = None
+        self._lock = threading.Lock()
+        self.evaluations = 0
+        self.firings: Dict[str, int] = {}
+
+    def _current(self) -> _CompiledRules:
+        """Tabel rule terkini; dikompilasi ulang jika file rule, ontologi kelas atau kamus berubah."""
+        if self._read_sources() != self._sources:
+            with self._lock:
+                if self._read_sources() != self._sources:
+                    self._compiled = self._compile()
+                    # Kompilasi bisa memicu build kamus obat pertama kali: baca ulang generasinya
+                    self._sources = self._read_sources()
+        return self._compiled
+
+    @staticmethod
+    def _read_sources() -> Tuple:
+        return (
+            drug_canonicalizer.generation,
+            _file_mtime(CLINICAL_RULES_FILE),
+            _file_mtime(DRUG_CLASSES_FILE),
+        )
+
+    @staticmethod
+    def _compile() -> _CompiledRules:
+        compiled = _CompiledRules()
+        try:
+            with open(CLINICAL_RULES_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Clinical rules not available: {e}")
+            data = {}
+
+        keywords = AhoCorasick()
+        for condition, trigger in data.get("conditions", {}).items():
+            for keyword in trigger.get("keywords", []):
+                keywords.add(" ".join(normalize_drug_text(keyword)), condition)
+            for prefix in trigger.get("icd_prefixes", []):
+                code = normalize_icd(prefix)
+                if code:
+                    compiled.icd_prefixes.setdefault(code, set()).add(condition)
+        compiled.keywords = keywords.build()
+
+        predicate_ids: Dict[Tuple, int] = {}
+        for entry in data.get("rules", []):
+            predicate = (entry.get("min_age"), entry.get("max_age"),
+                         frozenset(entry.get("conditions", [])))
+            if predicate not in predicate_ids:
+                predicate_ids[predicate] = len(compiled.predicates)
+                compiled.predicates.append(predicate)
+            rule = ClinicalRule(entry, predicate_ids[predicate])
+            compiled.rules.append(rule)
+
+            targets = {drug_canonicalizer.canonical_id(drug) for drug in entry.get("drugs", [])}
+            for class_id in entry.get("classes", []):
+                targets.update(allergen_index.members_of(class_id))
+            for drug_id in targets:
+                if drug_id:
+                    compiled.by_drug.setdefault(drug_id, []).append(rule)
+
+        print(f"✅ Clinical rules compiled: {len(compiled.rules)} rules, "
+              f"{len(compiled.predicates)} predicates, {len(compiled.by_drug)} target drugs")
+        return compiled
+
+    def conditions(self, patient_data: Dict) -> Set[str]:
+        """Kondisi pasien dari kode ICD-10 (prefix) dan teks diagnosis (keyword)."""
+        compiled = self._current()
+        found: Set[str] = set()
+        for icd_code in patient_data.get('diagnoses_icd10') or []:
+            code = normalize_icd(icd_code)
+            if code:
+                for end in range(3, len(code) + 1):
+                    found.update(compiled.icd_prefixes.get(code[:end], ()))
+        for text in patient_data.get('diagnoses_text') or []:
+            normalized = " ".join(normalize_drug_text(text))
+            found.update(payload for _, _, payload in compiled.keywords.iter_word_matches(normalized))
+        return found
+
+    def evaluate(self, patient_data: Dict, medications: List[str],
+                 record: bool = True) -> List[RuleFiring]:
+        """
+        Semua rule yang terpenuhi untuk resep ini (sekali per obat per rule).
+        record=False untuk pengecekan awal yang hasilnya dievaluasi ulang nanti
+        (metrik firing hanya dicatat sekali per request).
+        """
+        compiled = self._current()
+        if record:
+            self.evaluations += 1
+        age = patient_data.get('age') or 0
+        conditions: Optional[Set[str]] = None
+        predicate_results: Dict[int, bool] = {}
+
+        firings = []
+        seen = set()
+        for med, drug_id in zip(medications, drug_canonicalizer.canonical_ids(medications)):
+            for rule in compiled.by_drug.get(drug_id, ()):
+                if (rule.id, med) in seen:
+                    continue
+                result = predicate_results.get(rule.predicate)
+                if result is None:
+                    min_age, max_age, required = compiled.predicates[rule.predicate]
+                    if required and conditions is None:
+                        conditions = self.conditions(patient_data)
+                    result = (
+                        (min_age is None or age >= min_age)
+                        and (max_age is None or age <= max_age)
+                        and required <= (conditions or set())
+                    )
+                    predicate_results[rule.predicate] = result
+                if result:
+                    seen.add((rule.id, med))
+                    firings.append(RuleFiring(rule, med, age))
+                    if record:
+                        self.firings[rule.id] = self.firings.get(rule.id, 0) + 1
+        return firings
+
+    def stats(self) -> Dict:
+        """Statistik rule untuk monitoring (firing per rule)."""
+        compiled = self._compiled
+        return {
+            "rules": len(compiled.rules),
+            "predicates": len(compiled.predicates),
+            "target_drugs": len(compiled.by_drug),
+            "evaluations": self.evaluations,
+            "firings": dict(self.firings),
+        }
+
+
+# Global instance
+clinical_rules = ClinicalRuleEngine()
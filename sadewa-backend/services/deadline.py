@@ -0,0 +1,42 @@
+"""
+Request Deadline untuk SADEWA
+Satu deadline absolut per request yang diteruskan dari router ke service,
+sehingga timeout dan backoff setiap attempt dihitung dari sisa budget, bukan
+angka tetap yang bisa melampaui timeout di luar.
+"""
+import time
+from typing import Optional
+
+
+class Deadline:
+    """Deadline absolut (monotonic) dengan sisa budget."""
+
+    __slots__ = ("budget", "expires_at")
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        """Sisa waktu (detik), minimal 0."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def elapsed(self) -> float:
+        """Waktu yang sudah terpakai sejak deadline dibuat."""
+        return self.budget - (self.expires_at - time.monotonic())
+
+    def can_fit(self, seconds: float) -> bool:
+        """True jika pekerjaan sepanjang `seconds` masih bisa selesai sebelum deadline."""
+        return self.remaining() >= seconds
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Timeout untuk satu operasi: sisa budget, dibatasi cap jika ada."""
+        remaining = self.remaining()
+        return min(remaining, cap) if cap is not None else remaining
+
+    def __repr__(self):
+        return f"Deadline(budget={self.budget:.3f}s, remaining={self.remaining():.3f}s)"
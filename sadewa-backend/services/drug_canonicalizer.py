@@ -0,0 +1,307 @@
+"""
+Drug Name Canonicalizer untuk SADEWA
+Memetakan entri obat free-text (brand, generik, nama Indonesia, dosis, aturan pakai)
+ke ID obat kanonik yang stabil, dibangun dari tabel drugs + data sinonim.
+"""
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+SYNONYMS_FILE = os.path.join(DATA_DIR, "drug_synonyms.json")
+FORMULARY_FILE = os.path.join(DATA_DIR, "drug_formularium.json")
+INTERACTIONS_FILE = os.path.join(DATA_DIR, "drug_interactions.json")
+
+# Interval minimal (detik) antar pengecekan perubahan tabel drugs
+REFRESH_CHECK_INTERVAL = 60.0
+
+_PARENTHETICAL = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+_TOKEN = re.compile(r"[a-z0-9]+")
+_DOSE = re.compile(
+    r"(\d+(?:[.,]\d+)?)\s*(mg|mcg|µg|ug|g|ml|iu|ui|unit|units|%)(?![a-z])",
+    re.IGNORECASE,
+)
+
+# Token yang bukan bagian dari nama obat (aturan pakai, sediaan, satuan)
+_NON_NAME_TOKENS = frozenset({
+    "od", "bid", "tid", "qid", "qd", "prn", "hs", "on", "om", "stat", "ac", "pc",
+    "tab", "tablet", "tabs", "kaplet", "caplet", "kapsul", "capsule", "cap", "caps",
+    "sirup", "syrup", "inj", "injeksi", "injection", "inhaler", "salep", "krim",
+    "drop", "drops", "tetes", "mg", "mcg", "ug", "g", "ml", "iu", "unit", "units",
+    "x", "dd", "per", "hari", "daily", "for", "untuk",
+})
+
+
+def normalize_drug_text(value: str) -> List[str]:
+    """Lowercase, hapus aksen & teks dalam kurung, lalu pecah menjadi token."""
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(ch for ch in value if not unicodedata.combining(ch)).lower()
+    return _TOKEN.findall(_PARENTHETICAL.sub(" ", value))
+
+
+def extract_dose(value: str) -> Optional[str]:
+    """Ambil dosis pertama dari entri obat, mis. 'Warfarin 5 mg OD' -> '5mg'."""
+    match = _DOSE.search(value or "")
+    if not match:
+        return None
+    amount = match.group(1).replace(",", ".")
+    return f"{amount}{match.group(2).lower()}"
+
+
+class DrugMatch:
+    """Hasil resolusi satu entri obat."""
+
+    __slots__ = ("drug_id", "name", "dose", "known")
+
+    def __init__(self, drug_id: str, name: str, dose: Optional[str], known: bool):
+        self.drug_id = drug_id
+        self.name = name
+        self.dose = dose
+        self.known = known
+
+    def __repr__(self):
+        return f"<DrugMatch(drug_id='{self.drug_id}', dose='{self.dose}', known={self.known})>"
+
+
+class _Dictionary:
+    """Snapshot immutable dari kamus alias -> drug ID (di-swap saat rebuild)."""
+
+    __slots__ = ("trie", "names", "db_ids", "db_names", "aliases", "max_alias_tokens")
+
+    def __init__(self):
+        self.trie: Dict = {}
+        self.names: Dict[str, str] = {}
+        self.db_ids: Dict[str, int] = {}
+        self.db_names: Dict[str, str] = {}
+        self.aliases: Dict[str, List[str]] = {}
+        self.max_alias_tokens = 0
+
+    def lookup_tokens(self, tokens: List[str]) -> Optional[str]:
+        """Cari alias persis (seluruh token) di trie."""
+        node = self.trie
+        for token in tokens:
+            node = node.get(token)
+            if node is None:
+                return None
+        return node.get("$id")
+
+    def add_alias(self, alias: str, drug_id: str) -> bool:
+        """Tambah alias ke trie; alias yang sudah dimiliki ID lain tidak ditimpa."""
+        tokens = normalize_drug_text(alias)
+        if not tokens:
+            return False
+        node = self.trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        if "$id" in node:
+            return node["$id"] == drug_id
+        node["$id"] = drug_id
+        self.aliases.setdefault(drug_id, []).append(" ".join(tokens))
+        self.max_alias_tokens = max(self.max_alias_tokens, len(tokens))
+        return True
+
+    def add_drug(self, names: Iterable[str], display_name: Optional[str] = None) -> Optional[str]:
+        """
+        Daftarkan satu obat beserta nama-namanya. Jika salah satu nama sudah
+        dikenal, obat digabung ke ID tersebut; jika belum, ID baru dibuat dari
+        nama pertama.
+        """
+        names = [name for name in names if name and normalize_drug_text(name)]
+        if not names:
+            return None
+        drug_id = None
+        for name in names:
+            drug_id = self.lookup_tokens(normalize_drug_text(name))
+            if drug_id:
+                break
+        if drug_id is None:
+            drug_id = " ".join(normalize_drug_text(names[0]))
+            self.names[drug_id] = display_name or names[0]
+        for name in names:
+            self.add_alias(name, drug_id)
+        return drug_id
+
+
+class DrugCanonicalizer:
+    """Kamus kanonik obat dengan token trie untuk resolusi O(panjang input)."""
+
+    def __init__(self, check_interval: float = REFRESH_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._dictionary = _Dictionary()
+        self._source: Optional[str] = None
+        self._fingerprint: Optional[Tuple] = None
+        self._last_check = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        """Naik setiap kali kamus dibangun ulang (untuk invalidasi index turunan)."""
+        return self._generation
+
+    @property
+    def source(self) -> Optional[str]:
+        """Sumber kamus saat ini ('database' / 'static')."""
+        return self._source
+
+    # ----- resolusi -----
+
+    def resolve(self, value: str) -> DrugMatch:
+        """
+        Resolusi entri free-text ke drug ID kanonik.
+        Alias terpanjang yang paling kiri menang; jika tidak ada alias yang
+        cocok, semua token nama (tanpa dosis/frekuensi/sediaan) dipakai sebagai
+        ID fallback, sehingga "Insulin aspart" dan "Insulin detemir" tetap berbeda.
+        """
+        if self._source is None:
+            self.build_static()
+        dictionary = self._dictionary
+        tokens = normalize_drug_text(value)
+        dose = extract_dose(value)
+
+        for start in range(len(tokens)):
+            node = dictionary.trie
+            found = None
+            for token in tokens[start:start + dictionary.max_alias_tokens]:
+                node = node.get(token)
+                if node is None:
+                    break
+                if "$id" in node:
+                    found = node["$id"]
+            if found:
+                return DrugMatch(found, dictionary.names.get(found, found), dose, True)
+
+        fallback = " ".join(
+            t for t in tokens if t not in _NON_NAME_TOKENS and not t[0].isdigit()
+        ) or (" ".join(tokens) if tokens else (value or "").strip().lower())
+        return DrugMatch(fallback, (value or "").strip(), dose, False)
+
+    def canonical_id(self, value: str) -> str:
+        """Drug ID kanonik untuk satu entri obat."""
+        return self.resolve(value).drug_id
+
+    def canonical_ids(self, values: Iterable[str]) -> List[str]:
+        """Drug ID kanonik untuk daftar entri obat (urutan dipertahankan)."""
+        return [self.resolve(value).drug_id for value in values]
+
+    def signature(self, value: str) -> str:
+        """Signature stabil untuk cache key: drug ID + dosis (jika ada)."""
+        match = self.resolve(value)
+        return f"{match.drug_id}@{match.dose}" if match.dose else match.drug_id
+
+    def display_name(self, drug_id: str) -> str:
+        """Nama tampilan untuk drug ID."""
+        return self._dictionary.names.get(drug_id, drug_id)
+
+    def database_name(self, drug_id: str) -> Optional[str]:
+        """nama_obat dari tabel drugs untuk drug ID (jika ada)."""
+        return self._dictionary.db_names.get(drug_id)
+
+    def aliases(self, drug_id: str) -> List[str]:
+        """Semua alias ternormalisasi yang dipetakan ke drug ID."""
+        return list(self._dictionary.aliases.get(drug_id, [drug_id]))
+
+    def alias_items(self) -> List[Tuple[str, str]]:
+        """Semua pasangan (alias ternormalisasi, drug ID) di kamus saat ini."""
+        if self._source is None:
+            self.build_static()
+        return [
+            (alias, drug_id)
+            for drug_id, aliases in self._dictionary.aliases.items()
+            for alias in aliases
+        ]
+
+    # ----- build & refresh -----
+
+    def build(self, drug_rows: Iterable[Tuple[int, str, str]], source: str,
+              fingerprint: Optional[Tuple] = None) -> None:
+        """Bangun kamus dari sinonim + formularium + row tabel drugs."""
+        dictionary = _Dictionary()
+
+        for entry in _load_json(SYNONYMS_FILE):
+            dictionary.add_drug([entry["generic"]] + entry.get("synonyms", []))
+
+        for db_id, nama_obat, nama_internasional in drug_rows:
+            drug_id = dictionary.add_drug(
+                [nama_internasional, nama_obat],
+                display_name=nama_internasional or nama_obat,
+            )
+            if drug_id and drug_id not in dictionary.db_ids:
+                dictionary.db_ids[drug_id] = db_id
+                dictionary.db_names[drug_id] = nama_obat
+
+        for entry in _load_json(FORMULARY_FILE):
+            dictionary.add_drug([entry["drug_name"]])
+        for row in _load_json(INTERACTIONS_FILE):
+            dictionary.add_drug([row["drug_a"]])
+            dictionary.add_drug([row["drug_b"]])
+
+        with self._lock:
+            self._dictionary = dictionary
+            self._source = source
+            self._fingerprint = fingerprint
+            self._generation += 1
+        print(f"✅ Drug dictionary built: {len(dictionary.aliases)} drugs from {source}")
+
+    def build_static(self) -> None:
+        """Bangun kamus hanya dari file data (tanpa database)."""
+        self.build([], source="static")
+
+    def ensure_fresh(self, db) -> None:
+        """
+        Sinkronkan kamus dengan tabel drugs (Session atau Connection).
+        Error database tidak diteruskan: kamus statis tetap dipakai.
+        """
+        now = time.monotonic()
+        if self._source == "database" and now - self._last_check < self.check_interval:
+            return
+        try:
+            if db is None:
+                raise RuntimeError("database session not available")
+            fingerprint = tuple(str(value) for value in db.execute(text(
+                "SELECT COUNT(*), MAX(id), MAX(updated_at), SUM(is_active) FROM drugs"
+            )).fetchone())
+            self._last_check = now
+            if self._source == "database" and fingerprint == self._fingerprint:
+                return
+            rows = db.execute(text("""
+                SELECT id, nama_obat, nama_obat_internasional
+                FROM drugs
+                WHERE is_active = 1
+                ORDER BY id
+            """)).fetchall()
+            self.build([tuple(row) for row in rows], source="database", fingerprint=fingerprint)
+        except Exception as e:
+            if self._source is None:
+                print(f"⚠️ Drug dictionary using static data only: {e}")
+                self.build_static()
+
+    def stats(self) -> Dict:
+        """Statistik kamus untuk monitoring."""
+        dictionary = self._dictionary
+        return {
+            "source": self._source,
+            "drugs": len(dictionary.aliases),
+            "aliases": sum(len(a) for a in dictionary.aliases.values()),
+            "linked_to_drugs_table": len(dictionary.db_ids),
+            "generation": self._generation,
+        }
+
+
+def _load_json(path: str) -> List[Dict]:
+    """Load file data JSON; file yang hilang dianggap kosong."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+# Global instance
+drug_canonicalizer = DrugCanonicalizer()
@@ -3,17 +3,57 @@ Enhanced Groq Service untuk SADEWA - DAY 2
 Advanced AI integration dengan multi-layered clinical decision support
 """
 import asyncio
+import copy
 import json
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from enum import Enum
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
+import httpx
 from dotenv import load_dotenv
-from groq import Groq, APIError
+from groq import APIError
+
+from services.circuit_breaker import CLOSED, CallPermit, CircuitBreaker, CircuitOpenError, LatencyTracker
+from services.deadline import Deadline
+from services.json_stream import IncrementalJSONArrayParser
+from services.llm_backends import ReplayMissError, create_backend
+from services.prompt_builder import CLINICAL_SYSTEM_PROMPT, prompt_builder, prompt_cache_key
+from services.term_scanner import term_scanner
+from services.ttl_cache import TTLCache
 
 load_dotenv()
 
+# Batas koneksi & concurrency ke Groq API (per worker process)
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+GROQ_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GROQ_MAX_KEEPALIVE_CONNECTIONS", "10"))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "60"))
+GROQ_REQUEST_TIMEOUT = float(os.getenv("GROQ_REQUEST_TIMEOUT", "30"))
+
+# Hedged request: kirim call kedua jika call pertama belum selesai setelah p95 latency
+GROQ_HEDGE_ENABLED = os.getenv("GROQ_HEDGE_ENABLED", "false").lower() == "true"
+GROQ_HEDGE_MIN_SAMPLES = int(os.getenv("GROQ_HEDGE_MIN_SAMPLES", "20"))
+GROQ_HEDGE_MIN_DELAY = float(os.getenv("GROQ_HEDGE_MIN_DELAY", "0.2"))
+
+# Retry budget: backoff dibatasi fraksi sisa deadline; attempt tipikal minimal segini
+RETRY_BACKOFF_JSON = 1.0
+RETRY_BACKOFF_API = 2.0
+RETRY_BACKOFF_FRACTION = 0.25
+RETRY_MIN_ATTEMPT_SECONDS = 0.5
+
+# Bagian response yang di-stream per object begitu lengkap
+STREAMED_SECTIONS = ("warnings", "contraindications", "dosing_adjustments")
+
+# Cache hasil LLM lokal, key = hash bagian variabel prompt (bukan ID pasien/timestamp)
+LLM_PROMPT_CACHE_SIZE = int(os.getenv("LLM_PROMPT_CACHE_SIZE", "500"))
+LLM_PROMPT_CACHE_TTL = float(os.getenv("LLM_PROMPT_CACHE_TTL", "1800"))
+
+# Field yang di-stamp server setelah response, tidak diminta dari LLM
+SERVER_STAMPED_FIELDS = ("analysis_timestamp", "patient_id")
+
 
 class InteractionSeverity(Enum):
     """Enum untuk tingkat keparahan interaksi obat"""
@@ -26,17 +66,238 @@ class InteractionSeverity(Enum):
 class GroqService:
     """Enhanced service class untuk menangani interaksi dengan Groq LLM API."""
 
-    def __init__(self):
-        """Inisialisasi Groq client dan model yang akan digunakan."""
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    def __init__(self, max_concurrency: int = GROQ_MAX_CONCURRENCY):
+        """Inisialisasi async Groq client (connection pool bersama) dan model."""
+        # Satu httpx pool keep-alive untuk semua request di worker ini
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=GROQ_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(GROQ_REQUEST_TIMEOUT, connect=5.0),
+        )
+        # Groq asli, server LLM palsu, atau record/replay (env LLM_BACKEND)
+        self.backend = create_backend(self.http_client)
         self.model = "llama-3.3-70b-versatile"
         self.max_tokens = 2000
         self.temperature = 0.1  # Low temperature untuk konsistensi medical advice
 
+        # Batasi completion yang berjalan bersamaan; sisanya antre tanpa memblok event loop
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        self._waiting = 0
+        self._completed = 0
+        self._cancelled = 0
+
+        # Circuit breaker: Groq down/lambat -> langsung fallback, tanpa retry
+        self.breaker = CircuitBreaker("groq")
+        self.latency = LatencyTracker()
+        self.hedge_enabled = GROQ_HEDGE_ENABLED
+        self._hedges_sent = 0
+        self._hedge_wins = 0
+        self._primary_wins = 0
+
+        # Metrik retry budget: histogram attempt per request + budget habis
+        self._attempts: Dict[int, int] = {}
+        self._budget_exhausted = 0
+
+        self.prompt_cache = TTLCache(
+            "llm_prompt_cache", max_entries=LLM_PROMPT_CACHE_SIZE, default_ttl=LLM_PROMPT_CACHE_TTL
+        )
+
+    @asynccontextmanager
+    async def _slot(self, timing: Optional[Dict] = None):
+        """
+        Ambil satu slot concurrency; cancel dari caller ikut membatalkan HTTP request.
+        timing["started"] = saat slot pertama didapat (waktu antre tidak dihitung latency LLM).
+        """
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        if timing is not None:
+            timing.setdefault("started", time.monotonic())
+        self._in_flight += 1
+        try:
+            yield
+            self._completed += 1
+        except (asyncio.CancelledError, GeneratorExit):
+            self._cancelled += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+    async def _create_completion(self, timeout: Optional[float] = None, **kwargs):
+        """
+        Chat completion lewat circuit breaker (dan hedging jika aktif).
+        Raise CircuitOpenError tanpa memanggil Groq saat circuit OPEN, dan
+        asyncio.TimeoutError jika call belum selesai dalam `timeout` detik.
+        """
+        permit = self.breaker.allow()
+        if permit is None:
+            raise CircuitOpenError(f"Groq circuit {self.breaker.state}")
+        # Durasi dihitung sejak slot didapat: antrean semaphore lokal bukan kelambatan Groq
+        timing: Dict = {}
+        try:
+            if self.hedge_enabled:
+                completion = self._hedged_completion(timing, **kwargs)
+            else:
+                completion = self._single_completion(timing, **kwargs)
+            response = await asyncio.wait_for(completion, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._record_timeout(permit, self._since_slot(timing))
+            raise
+        except asyncio.CancelledError:
+            self.breaker.release_probe(permit)
+            raise
+        except Exception as e:
+            self.breaker.record(permit, self._since_slot(timing), failed=self._is_service_failure(e))
+            raise
+        elapsed = self._since_slot(timing)
+        self.breaker.record(permit, elapsed)
+        self.latency.add(elapsed)
+        return response
+
+    @staticmethod
+    def _since_slot(timing: Dict) -> float:
+        """Detik sejak slot concurrency didapat (0 jika masih antre)."""
+        started = timing.get("started")
+        return time.monotonic() - started if started is not None else 0.0
+
+    async def _single_completion(self, timing: Optional[Dict] = None, **kwargs):
+        """Satu chat completion lewat semaphore."""
+        async with self._slot(timing):
+            return await self.backend.create(**kwargs)
+
+    async def _hedged_completion(self, timing: Dict, **kwargs):
+        """
+        Kirim call kedua jika call pertama belum selesai setelah p95 latency;
+        response pertama yang berhasil menang, call lainnya dibatalkan.
+        """
+        delay = self._hedge_delay()
+        if delay is None:
+            return await self._single_completion(timing, **kwargs)
+
+        primary = asyncio.ensure_future(self._single_completion(timing, **kwargs))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+
+            self._hedges_sent += 1
+            hedge = asyncio.ensure_future(self._single_completion(timing, **kwargs))
+            tasks.append(hedge)
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._hedge_wins += 1
+                        else:
+                            self._primary_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _expected_attempt_seconds(self) -> float:
+        """Durasi tipikal satu attempt (p50 latency), untuk memutuskan retry."""
+        p50 = self.latency.percentile(0.5)
+        return max(p50, RETRY_MIN_ATTEMPT_SECONDS) if p50 is not None else RETRY_MIN_ATTEMPT_SECONDS
+
+    def _hedge_delay(self):
+        """Delay hedge = p95 latency; None jika sampel belum cukup."""
+        if len(self.latency) < GROQ_HEDGE_MIN_SAMPLES:
+            return None
+        return max(self.latency.percentile(0.95), GROQ_HEDGE_MIN_DELAY)
+
+    async def _stream_completion(self, **kwargs) -> AsyncIterator[str]:
+        """Stream chat completion; slot dipegang sampai stream habis atau dibatalkan."""
+        permit = self.breaker.allow()
+        if permit is None:
+            raise CircuitOpenError(f"Groq circuit {self.breaker.state}")
+        timing: Dict = {}
+        try:
+            async with self._slot(timing):
+                async for delta in self.backend.stream(**kwargs):
+                    yield delta
+        except (asyncio.CancelledError, GeneratorExit):
+            self.breaker.release_probe(permit)
+            raise
+        except Exception as e:
+            self.breaker.record(permit, self._since_slot(timing), failed=self._is_service_failure(e))
+            raise
+        self.breaker.record(permit, self._since_slot(timing))
+
+    def _record_timeout(self, permit: CallPermit, elapsed: float) -> None:
+        """
+        Call melewati deadline: dihitung gagal jika Groq sudah memegang call-nya.
+        Timeout selama antre di semaphore lokal bukan kegagalan Groq.
+        """
+        if elapsed > 0:
+            self.breaker.record(permit, elapsed, failed=True)
+        else:
+            self.breaker.release_probe(permit)
+
+    @staticmethod
+    def _is_service_failure(error: Exception) -> bool:
+        """Error yang menandakan Groq bermasalah (koneksi, timeout, 429, 5xx), bukan request kita."""
+        if isinstance(error, ReplayMissError):
+            return False
+        status = getattr(error, "status_code", None)
+        return status is None or status == 429 or status >= 500
+
+    def stats(self) -> Dict:
+        """Statistik concurrency LLM untuk monitoring."""
+        return {
+            "model": self.model,
+            "backend": self.backend.stats(),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "completed": self._completed,
+            "cancelled": self._cancelled,
+            "max_connections": GROQ_MAX_CONNECTIONS,
+            "circuit_breaker": self.breaker.stats(),
+            "hedging": {
+                "enabled": self.hedge_enabled,
+                "delay_seconds": self._hedge_delay(),
+                "p95_latency_seconds": self.latency.percentile(0.95),
+                "hedges_sent": self._hedges_sent,
+                "hedge_wins": self._hedge_wins,
+                "primary_wins_after_hedge": self._primary_wins,
+                "hedge_win_rate": f"{(self._hedge_wins / max(self._hedges_sent, 1)) * 100:.1f}%",
+            },
+            "retry_budget": {
+                "attempts_per_request": dict(sorted(self._attempts.items())),
+                "avg_attempts": round(
+                    sum(k * v for k, v in self._attempts.items()) / max(sum(self._attempts.values()), 1), 2
+                ),
+                "budget_exhausted": self._budget_exhausted,
+                "expected_attempt_seconds": round(self._expected_attempt_seconds(), 3),
+            },
+            "prompt": prompt_builder.stats(),
+            "prompt_cache": self.prompt_cache.stats(),
+        }
+
+    async def aclose(self) -> None:
+        """Tutup backend dan connection pool (dipanggil saat shutdown)."""
+        await self.backend.aclose()
+        await self.http_client.aclose()
+
     async def test_connection(self) -> str:
         """Menguji koneksi ke Groq API."""
         try:
-            response = self.client.chat.completions.create(
+            response = await self._create_completion(
                 messages=[
                     {
                         "role": "system",
@@ -52,217 +313,252 @@ class GroqService:
                 temperature=0
             )
             return response.choices[0].message.content.strip()
-        except APIError as e:
+        except CircuitOpenError as e:
+            return f"Error: {str(e)}"
+        except (APIError, ReplayMissError) as e:
             return f"Error: {str(e)}"
         except ValueError as e:
             return f"Unexpected error: {str(e)}"
 
     def _create_clinical_prompt(self, patient_data: Dict, new_medications: List[str],
-                               drug_interactions_db: List[Dict], notes: str = "") -> str:
-        """Membuat prompt klinis yang comprehensive untuk analisis interaksi."""
-        # Extract patient info
-        patient_name = patient_data.get('name', 'Unknown Patient')
-        age = patient_data.get('age', 'Unknown')
-        gender = patient_data.get('gender', 'Unknown')
-        weight = patient_data.get('weight_kg', 'Unknown')
-
-        # Format diagnoses
-        diagnoses = patient_data.get('diagnoses_text', [])
-        current_meds = patient_data.get('current_medications', [])
-        allergies = patient_data.get('allergies', ['None known'])
-
+                               drug_interactions_db: List[Dict], notes: str = "") -> Tuple[str, Dict]:
+        """
+        Membuat bagian variabel prompt klinis (data pasien, obat, interaksi).
+        Instruksi dan schema JSON ada di CLINICAL_SYSTEM_PROMPT yang statis.
+        Return (prompt, prompt_metrics).
+        """
         # Filter relevant interactions
         relevant_interactions = self._find_relevant_interactions(
-            current_meds + new_medications, drug_interactions_db
+            patient_data.get('current_medications', []) + new_medications, drug_interactions_db
         )
-
-        prompt = f"""You are SADEWA, a clinical pharmacist AI assistant specializing in drug interaction analysis for Indonesian healthcare settings.
-
-PATIENT PROFILE:
-- Name: {patient_name}
-- Age: {age} years old
-- Gender: {gender}
-- Weight: {weight} kg
-- Current Diagnoses: {', '.join(diagnoses) if diagnoses else 'None listed'}
-- Known Allergies: {', '.join(allergies)}
-
-CURRENT MEDICATIONS:
-{self._format_medication_list(current_meds)}
-
-NEW MEDICATIONS TO PRESCRIBE:
-{self._format_medication_list(new_medications)}
-
-CLINICAL NOTES:
-{notes if notes else 'No additional notes provided'}
-
-DRUG INTERACTIONS DATABASE (Indonesian format):
-{json.dumps(relevant_interactions, indent=2, ensure_ascii=False) if relevant_interactions else 'No direct interactions found in database'}
-
-CLINICAL DECISION SUPPORT ANALYSIS REQUIRED:
-Analyze the following aspects in order of priority:
-
-1. **MAJOR DRUG-DRUG INTERACTIONS** (Life-threatening)
-2. **MODERATE DRUG-DRUG INTERACTIONS** (Clinically significant)
-3. **DRUG-DISEASE CONTRAINDICATIONS** (Based on patient diagnoses)
-4. **ALLERGY CONSIDERATIONS** (Cross-reactivity risks)
-5. **AGE-RELATED CONCERNS** (Geriatric/pediatric considerations)
-6. **DOSING RECOMMENDATIONS** (Based on patient profile)
-
-IMPORTANT: Use the provided drug interactions database structure where:
-- "drug_a" and "drug_b" are the interacting medications
-- "severity" can be "Major", "Moderate", or "Minor"
-- "description" contains the clinical consequence in Indonesian
-
-RESPONSE FORMAT REQUIRED - Return ONLY valid JSON:
-{{
-    "analysis_timestamp": "{datetime.now().isoformat()}",
-    "patient_id": "{patient_data.get('id', 'Unknown')}",
-    "overall_risk_level": "MAJOR|MODERATE|MINOR|LOW",
-    "safe_to_prescribe": true|false,
-    "warnings": [
-        {{
-            "severity": "MAJOR|MODERATE|MINOR",
-            "type": "DRUG_INTERACTION|CONTRAINDICATION|ALLERGY|AGE_RELATED|DOSING",
-            "drugs_involved": ["Drug A", "Drug B"],
-            "description": "Clear explanation of the interaction/concern",
-            "clinical_significance": "What could happen to the patient",
-            "recommendation": "Specific action to take",
-            "monitoring_required": "What to monitor if prescribed anyway"
-        }}
-    ],
-    "contraindications": [
-        {{
-            "drug": "Drug name",
-            "diagnosis": "Relevant diagnosis",
-            "reason": "Why contraindicated",
-            "alternative_suggested": "Alternative medication if available"
-        }}
-    ],
-    "dosing_adjustments": [
-        {{
-            "drug": "Drug name",
-            "standard_dose": "Normal dosing",
-            "recommended_dose": "Adjusted dose for this patient",
-            "reason": "Why adjustment needed"
-        }}
-    ],
-    "monitoring_plan": [
-        "Parameter 1 to monitor",
-        "Parameter 2 to monitor"
-    ],
-    "llm_reasoning": "Detailed clinical reasoning for the analysis",
-    "confidence_score": 0.85
-}}
-
-IMPORTANT GUIDELINES:
-- Prioritize patient safety above all
-- Be specific about drug names and interactions
-- Provide actionable clinical recommendations
-- Consider Indonesian healthcare context
-- Flag any life-threatening combinations immediately
-- Include monitoring recommendations for continuing existing medications
-- Response must be valid JSON only, no additional text
-"""
-        return prompt
-
-    def _format_medication_list(self, medications: List[str]) -> str:
-        """Format medication list untuk prompt."""
-        if not medications:
-            return "None currently prescribed"
-
-        formatted = []
-        for i, med in enumerate(medications, 1):
-            formatted.append(f"  {i}. {med}")
-
-        return "\n".join(formatted)
+        prompt, metrics = prompt_builder.build(
+            patient_data, new_medications, relevant_interactions, notes
+        )
+        return prompt, prompt_builder.record(metrics, prompt)
 
     def _find_relevant_interactions(self, all_medications: List[str],
                                    drug_interactions_db: List[Dict]) -> List[Dict]:
         """Cari interaksi yang relevan dari database."""
         relevant = []
+        seen = set()
 
-        # Normalize medication names untuk matching
-        med_names = [med.lower().split()[0] for med in all_medications]  # Ambil nama obat pertama
+        # Satu pass automaton per obat: semua drug ID yang disebut di entri
+        med_ids = set()
+        for hits in term_scanner.scan_all(all_medications):
+            med_ids.add(hits.drug_id)
+            med_ids.update(hits.drug_ids)
 
         for interaction in drug_interactions_db:
-            drug_a = interaction.get("drug_a", "").lower()
-            drug_b = interaction.get("drug_b", "").lower()
+            drug_a = term_scanner.drug_id(interaction.get("drug_a", ""))
+            drug_b = term_scanner.drug_id(interaction.get("drug_b", ""))
 
             # Check if any medication matches the interaction
-            for med in med_names:
-                if (drug_a in med or med in drug_a) or (drug_b in med or med in drug_b):
-                    if interaction not in relevant:
-                        relevant.append(interaction)
-                    break
+            if (drug_a in med_ids or drug_b in med_ids) and id(interaction) not in seen:
+                seen.add(id(interaction))
+                relevant.append(interaction)
 
         return relevant
 
     async def analyze_drug_interactions(self, patient_data: Dict, new_medications: List[str],
-                                       drug_interactions_db: List[Dict], notes: str = "") -> Dict:
-        """Main function untuk analisis interaksi obat menggunakan enhanced prompting."""
+                                       drug_interactions_db: List[Dict], notes: str = "",
+                                       deadline: Optional[Deadline] = None) -> Dict:
+        """
+        Main function untuk analisis interaksi obat menggunakan enhanced prompting.
+        deadline: budget per request dari caller; default GROQ_REQUEST_TIMEOUT.
+        """
         try:
             # Create comprehensive clinical prompt
-            prompt = self._create_clinical_prompt(
+            prompt, prompt_metrics = self._create_clinical_prompt(
                 patient_data, new_medications, drug_interactions_db, notes
             )
-
-            # Call Groq API dengan retry logic
+            cache_key = prompt_cache_key(self.model, prompt)
+            cached = self.prompt_cache.get(cache_key)
+            if cached is not None:
+                prompt_metrics["prompt_cache_hit"] = True
+                return self._stamp_result(copy.deepcopy(cached), patient_data, prompt_metrics)
+
+            # Call Groq API dengan retry; timeout & backoff setiap attempt dari sisa budget
+            deadline = deadline or Deadline(GROQ_REQUEST_TIMEOUT)
             max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    response = self.client.chat.completions.create(
-                        messages=[
-                            {
-                                "role": "system",
-                                "content": "You are SADEWA, a clinical pharmacist AI. Always respond with valid JSON only."
-                            },
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ],
-                        model=self.model,
-                        max_tokens=self.max_tokens,
-                        temperature=self.temperature,
-                    )
-
-                    # Parse JSON response
-                    response_text = response.choices[0].message.content.strip()
-
-                    # Clean response if wrapped in markdown
-                    if response_text.startswith("```json"):
-                        response_text = response_text[7:-3].strip()
-                    elif response_text.startswith("```"):
-                        response_text = response_text[3:-3].strip()
-
-                    result = json.loads(response_text)
-
-                    # Validate required fields
-                    self._validate_response(result)
-
-                    return result
-
-                except json.JSONDecodeError as e:
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(1)  # Wait before retry
-                        continue
-                    return self._create_fallback_response(
-                        patient_data, new_medications, f"JSON parsing error: {str(e)}"
-                    )
-
-                except APIError as e:
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(2)  # Wait longer for API errors
-                        continue
-                    return self._create_fallback_response(
-                        patient_data, new_medications, f"Groq API error: {str(e)}"
-                    )
+            attempts = 0
+            backoff = 0.0
+            last_attempt = 0.0
+            error_msg = f"Analysis budget of {deadline.budget:.1f}s exhausted"
+            analysis_path = "timeout_fallback"
+            try:
+                for attempt in range(max_retries):
+                    # Retry hanya jika backoff + satu attempt (tipikal, atau selama attempt
+                    # sebelumnya) masih muat di sisa budget
+                    expected = max(self._expected_attempt_seconds(), last_attempt)
+                    if attempt and not deadline.can_fit(backoff + expected):
+                        self._budget_exhausted += 1
+                        break
+                    if backoff:
+                        await asyncio.sleep(backoff)
+                    attempts += 1
+                    attempt_started = time.monotonic()
+                    try:
+                        response = await self._create_completion(
+                            timeout=deadline.remaining(),
+                            messages=self._analysis_messages(prompt),
+                            model=self.model,
+                            max_tokens=self.max_tokens,
+                            temperature=self.temperature,
+                        )
+
+                        # Parse JSON response
+                        result = json.loads(self._clean_response_text(response.choices[0].message.content))
+
+                        # Validate required fields
+                        self._validate_response(result)
+
+                        self._cache_result(cache_key, result)
+                        return self._stamp_result(
+                            result, patient_data, self._with_usage(prompt_metrics, response)
+                        )
+
+                    except asyncio.TimeoutError:
+                        self._budget_exhausted += 1
+                        error_msg = f"Analysis budget of {deadline.budget:.1f}s exhausted"
+                        analysis_path = "timeout_fallback"
+                        break
+
+                    except json.JSONDecodeError as e:
+                        last_attempt = time.monotonic() - attempt_started
+                        error_msg, analysis_path = f"JSON parsing error: {str(e)}", "llm_fallback"
+                        backoff = min(RETRY_BACKOFF_JSON, deadline.remaining() * RETRY_BACKOFF_FRACTION)
+
+                    except APIError as e:
+                        last_attempt = time.monotonic() - attempt_started
+                        error_msg, analysis_path = f"Groq API error: {str(e)}", "llm_fallback"
+                        # Tidak ada retry jika error ini membuat circuit terbuka
+                        if self.breaker.state != CLOSED:
+                            break
+                        backoff = min(RETRY_BACKOFF_API, deadline.remaining() * RETRY_BACKOFF_FRACTION)
+
+                    except CircuitOpenError as e:
+                        error_msg, analysis_path = str(e), "circuit_open"
+                        break
+
+                    except ReplayMissError as e:
+                        error_msg, analysis_path = str(e), "llm_fallback"
+                        break
+            finally:
+                self._attempts[attempts] = self._attempts.get(attempts, 0) + 1
+
+            return self._create_fallback_response(
+                patient_data, new_medications, error_msg, analysis_path=analysis_path
+            )
 
         except (json.JSONDecodeError, APIError, ValueError) as e:
             return self._create_fallback_response(
                 patient_data, new_medications, f"Unexpected error: {str(e)}"
             )
 
+    async def stream_drug_interactions(self, patient_data: Dict, new_medications: List[str],
+                                       drug_interactions_db: List[Dict],
+                                       notes: str = "") -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Versi streaming dari analyze_drug_interactions. Yield (section, object)
+        untuk setiap warning/contraindication/dosing adjustment begitu object
+        tersebut lengkap di stream token, lalu ("result", result) di akhir.
+        Tidak ada retry: object yang sudah terkirim tidak bisa ditarik kembali.
+        """
+        prompt, prompt_metrics = self._create_clinical_prompt(
+            patient_data, new_medications, drug_interactions_db, notes
+        )
+        cache_key = prompt_cache_key(self.model, prompt)
+        cached = self.prompt_cache.get(cache_key)
+        if cached is not None:
+            prompt_metrics["prompt_cache_hit"] = True
+            result = copy.deepcopy(cached)
+            for section in STREAMED_SECTIONS:
+                for item in result.get(section) or []:
+                    yield section, item
+            yield "result", self._stamp_result(result, patient_data, prompt_metrics)
+            return
+
+        parser = IncrementalJSONArrayParser(STREAMED_SECTIONS)
+        try:
+            async for delta in self._stream_completion(
+                messages=self._analysis_messages(prompt),
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+            ):
+                for section, item in parser.feed(delta):
+                    yield section, item
+
+            result = json.loads(self._clean_response_text(parser.text))
+            self._validate_response(result)
+            self._cache_result(cache_key, result)
+            result = self._stamp_result(result, patient_data, prompt_metrics)
+        except json.JSONDecodeError as e:
+            result = self._create_fallback_response(
+                patient_data, new_medications, f"JSON parsing error: {str(e)}"
+            )
+        except APIError as e:
+            result = self._create_fallback_response(
+                patient_data, new_medications, f"Groq API error: {str(e)}"
+            )
+        except CircuitOpenError as e:
+            result = self._create_fallback_response(
+                patient_data, new_medications, str(e), analysis_path="circuit_open"
+            )
+        except ReplayMissError as e:
+            result = self._create_fallback_response(patient_data, new_medications, str(e))
+        except ValueError as e:
+            result = self._create_fallback_response(
+                patient_data, new_medications, f"Unexpected error: {str(e)}"
+            )
+        yield "result", result
+
+    def _cache_result(self, cache_key: str, result: Dict) -> None:
+        """Simpan hasil LLM yang valid (tanpa field yang di-stamp server) ke prompt cache."""
+        cached = {k: v for k, v in result.items() if k not in SERVER_STAMPED_FIELDS}
+        self.prompt_cache.set(cache_key, copy.deepcopy(cached))
+
+    @staticmethod
+    def _stamp_result(result: Dict, patient_data: Dict, prompt_metrics: Dict) -> Dict:
+        """Stamp timestamp & patient ID di server setelah response diterima."""
+        result['analysis_timestamp'] = datetime.now().isoformat()
+        result['patient_id'] = str(patient_data.get('id', 'Unknown'))
+        result['prompt_metrics'] = prompt_metrics
+        return result
+
+    @staticmethod
+    def _with_usage(prompt_metrics: Dict, response) -> Dict:
+        """Tambahkan jumlah token prompt aktual dari Groq (jika tersedia) ke metrics."""
+        actual = getattr(getattr(response, "usage", None), "prompt_tokens", None)
+        if actual is not None:
+            prompt_metrics["prompt_tokens_actual"] = actual
+            prompt_builder.last_actual_tokens = actual
+        return prompt_metrics
+
+    @staticmethod
+    def _analysis_messages(prompt: str) -> List[Dict]:
+        """Messages untuk analisis interaksi: prefix statis (system) + bagian variabel."""
+        return [
+            {
+                "role": "system",
+                "content": CLINICAL_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+
+    @staticmethod
+    def _clean_response_text(response_text: str) -> str:
+        """Buang pembungkus markdown (```json ... ```) dari response LLM."""
+        response_text = (response_text or "").strip()
+        if response_text.startswith("```json"):
+            response_text = response_text[7:-3].strip()
+        elif response_text.startswith("```"):
+            response_text = response_text[3:-3].strip()
+        return response_text
+
     def _validate_response(self, result: Dict) -> None:
         """Validasi struktur response dari LLM."""
         required_fields = ['overall_risk_level', 'safe_to_prescribe', 'warnings', 'llm_reasoning']
@@ -281,7 +577,7 @@ IMPORTANT GUIDELINES:
             result['warnings'] = []
 
     def _create_fallback_response(self, patient_data: Dict, new_medications: List[str],
-                                 error_msg: str) -> Dict:
+                                 error_msg: str, analysis_path: str = "llm_fallback") -> Dict:
         """Buat response fallback jika LLM call gagal."""
         return {
             "analysis_timestamp": datetime.now().isoformat(),
@@ -305,7 +601,8 @@ IMPORTANT GUIDELINES:
             "llm_reasoning": f"System error occurred: {error_msg}. Manual review recommended.",
             "confidence_score": 0.0,
             "error": True,
-            "error_message": error_msg
+            "error_message": error_msg,
+            "analysis_path": analysis_path
         }
 
 
@@ -0,0 +1,294 @@
+"""
+ICD-10 Search Index untuk SADEWA
+Tabel icds (~10.5k kode) dimuat sekali ke memori dan dikompilasi menjadi inverted
+index n-gram (bigram + trigram) atas kode, nama Indonesia dan nama Inggris.
+Pencarian per ketikan di frontend dijawab dari memori tanpa `LIKE '%q%'` (full
+scan di MySQL):
+
+- query dinormalisasi (lowercase, tanpa diakritik/tanda baca) lalu dipecah per kata;
+- peringkat 1, prefix kode: range bisect atas kode terurut ("a09" -> A09, A09.0, ...);
+- peringkat 2, prefix kata: semua kata query adalah awal kata di nama ID/EN
+  (range bisect atas kosakata terurut, posting kata di-merge);
+- peringkat 3, substring: irisan posting list n-gram setiap kata (posting
+  terkecil dulu), diverifikasi dengan substring biasa.
+
+Tiap peringkat dibaca lazy dalam urutan kode dan berhenti begitu `limit` hasil
+terkumpul, sehingga query pendek ("de") tidak memverifikasi ribuan kandidat.
+
+Dimuat ulang jika fingerprint isi tabel (jumlah row + checksum kode dan nama) berubah,
+sehingga UPDATE in-place pada nama atau kode juga terlihat.
+"""
+import heapq
+import os
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from services.interaction_index import table_content_fingerprint
+
+# Interval minimal (detik) antar pengecekan fingerprint tabel icds
+ICD10_INDEX_CHECK_INTERVAL = float(os.getenv("ICD10_INDEX_CHECK_INTERVAL", "300"))
+NGRAM_SIZES = (2, 3)
+# Kolom isi icds yang ikut fingerprint
+ICD_COLUMNS = ("code", "name_id", "name_en")
+
+# Peringkat hasil (lebih kecil = lebih relevan)
+RANK_CODE_PREFIX = 0
+RANK_WORD_PREFIX = 1
+RANK_SUBSTRING = 2
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_search_text(value) -> str:
+    """'Demam Berdarah (Dengue)' -> 'demam berdarah dengue' (tanpa diakritik dan tanda baca)."""
+    decomposed = unicodedata.normalize("NFKD", str(value or "").lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(" ", stripped).strip()
+
+
+def normalize_code(value) -> str:
+    """'A09.0' -> 'a090' (kode tanpa titik untuk pencocokan prefix)."""
+    return _NON_ALNUM.sub("", str(value or "").lower())
+
+
+def ngrams(token: str) -> List[str]:
+    """N-gram terpanjang yang muat di token (trigram; bigram untuk token 2 huruf)."""
+    size = 3 if len(token) >= 3 else len(token)
+    return [token[i:i + size] for i in range(len(token) - size + 1)]
+
+
+class _ICDSnapshot:
+    """Snapshot immutable (row + inverted index) yang di-swap saat reload."""
+
+    __slots__ = ("codes", "names_id", "names_en", "by_code", "keys", "key_order",
+                 "texts", "words", "vocabulary", "word_docs", "postings")
+
+    def __init__(self):
+        # Row diurutkan per kode; posisi row = doc ID di posting list
+        self.codes: List[str] = []
+        self.names_id: List[str] = []
+        self.names_en: List[str] = []
+        self.by_code: Dict[str, int] = {}
+        self.keys: List[str] = []
+        # (kode ternormalisasi, doc ID) terurut untuk range prefix kode
+        self.key_order: List[Tuple[str, int]] = []
+        # kode + nama ID + nama EN ternormalisasi (dipisah "|", tidak lolos normalisasi query)
+        self.texts: List[str] = []
+        self.words: List[Tuple[str, ...]] = []
+        # kata unik terurut (range prefix kata) dan kata -> doc ID terurut
+        self.vocabulary: List[str] = []
+        self.word_docs: Dict[str, array] = {}
+        # n-gram -> doc ID terurut
+        self.postings: Dict[str, array] = {}
+
+
+class ICD10SearchIndex:
+    """Pencarian ICD-10 bilingual dari memori dengan ranking prefix kode/kata/substring."""
+
+    def __init__(self, check_interval: float = ICD10_INDEX_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._snapshot = _ICDSnapshot()
+        self._fingerprint: Optional[Tuple] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.last_load_ms: Optional[float] = None
+        self.searches = 0
+
+    @property
+    def loaded(self) -> bool:
+        """True jika index berisi data (jika tidak, caller memakai query database)."""
+        return bool(self._snapshot.codes)
+
+    def ensure_fresh(self, db) -> None:
+        """
+        Muat tabel icds jika belum dimuat atau fingerprint-nya berubah (paling sering
+        sekali per check_interval). Error database tidak diteruskan: index terakhir
+        tetap dipakai.
+        """
+        now = time.monotonic()
+        if self.loaded and now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            if self.loaded and now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            try:
+                fingerprint = table_content_fingerprint(db, "icds", ICD_COLUMNS, order_by="code")
+                if fingerprint == self._fingerprint and self.loaded:
+                    return
+                rows = db.execute(text(
+                    "SELECT code, name_id, name_en FROM icds ORDER BY code"
+                )).fetchall()
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ ICD-10 index not refreshed: {e}")
+                return
+            started = time.perf_counter()
+            self._snapshot = self._build(rows)
+            self._fingerprint = fingerprint
+            self.loads += 1
+            self.last_load_ms = round((time.perf_counter() - started) * 1000, 2)
+            print(f"✅ ICD-10 index built: {len(rows)} codes, "
+                  f"{len(self._snapshot.postings)} n-grams in {self.last_load_ms}ms")
+
+    @staticmethod
+    def _build(rows) -> _ICDSnapshot:
+        snapshot = _ICDSnapshot()
+        postings: Dict[str, List[int]] = {}
+        word_docs: Dict[str, List[int]] = {}
+        for doc, (code, name_id, name_en) in enumerate(sorted(rows, key=lambda row: str(row[0]))):
+            snapshot.by_code[code] = doc
+            snapshot.codes.append(code)
+            snapshot.names_id.append(name_id or "")
+            snapshot.names_en.append(name_en or "")
+            key = normalize_code(code)
+            words = tuple(dict.fromkeys(normalize_search_text(f"{name_id or ''} {name_en or ''}").split()))
+            snapshot.keys.append(key)
+            snapshot.texts.append("|".join(
+                (normalize_search_text(code), normalize_search_text(name_id), normalize_search_text(name_en))
+            ))
+            snapshot.words.append(words)
+            for word in words:
+                word_docs.setdefault(word, []).append(doc)
+
+            grams = set()
+            for token in (key,) + words:
+                for size in NGRAM_SIZES:
+                    grams.update(token[i:i + size] for i in range(len(token) - size + 1))
+            for gram in grams:
+                postings.setdefault(gram, []).append(doc)
+        # Doc ID ditambahkan berurutan: array sudah terurut untuk bisect/merge
+        snapshot.key_order = sorted((key, doc) for doc, key in enumerate(snapshot.keys))
+        snapshot.vocabulary = sorted(word_docs)
+        snapshot.word_docs = {word: array("I", docs) for word, docs in word_docs.items()}
+        snapshot.postings = {gram: array("I", docs) for gram, docs in postings.items()}
+        return snapshot
+
+    @staticmethod
+    def _code_prefix_docs(snapshot: _ICDSnapshot, code_query: str) -> List[int]:
+        """Doc ID dengan kode berawalan code_query (urut doc ID)."""
+        start = bisect_left(snapshot.key_order, (code_query,))
+        end = bisect_left(snapshot.key_order, (code_query + "~",))
+        return sorted(doc for _, doc in snapshot.key_order[start:end])
+
+    @staticmethod
+    def _word_prefix_docs(snapshot: _ICDSnapshot, token: str) -> Iterator[int]:
+        """Doc ID (unik, urut) yang punya kata berawalan token; dihasilkan secara lazy."""
+        vocabulary = snapshot.vocabulary
+        start = bisect_left(vocabulary, token)
+        end = bisect_left(vocabulary, token + "~")
+        merged = heapq.merge(*(snapshot.word_docs[word] for word in vocabulary[start:end]))
+        previous = -1
+        for doc in merged:
+            if doc != previous:
+                previous = doc
+                yield doc
+
+    @staticmethod
+    def _ngram_docs(snapshot: _ICDSnapshot, tokens: List[str]) -> Iterable[int]:
+        """
+        Doc ID (urut) yang memuat semua n-gram query: posting terkecil diiterasi
+        lazy dan dicek ke posting lain dengan bisect. Scan penuh jika query tidak
+        punya n-gram (semua kata 1 huruf).
+        """
+        grams = {gram for token in tokens if len(token) >= 2 for gram in ngrams(token)}
+        if not grams:
+            return range(len(snapshot.codes))
+        lists = []
+        for gram in grams:
+            docs = snapshot.postings.get(gram)
+            if docs is None:
+                return ()
+            lists.append(docs)
+        lists.sort(key=len)
+        smallest, others = lists[0], lists[1:]
+        return (
+            doc for doc in smallest
+            if all((position := bisect_left(docs, doc)) < len(docs) and docs[position] == doc
+                   for docs in others)
+        )
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Maksimal `limit` diagnosis yang cocok dengan query, urut relevansi lalu kode.
+        Tiap peringkat dibaca lazy dan berhenti begitu `limit` hasil terkumpul.
+        """
+        self.searches += 1
+        snapshot = self._snapshot
+        normalized = normalize_search_text(query)
+        if not normalized or limit <= 0:
+            return []
+        code_query = normalize_code(query)
+        tokens = normalized.split()
+        # Kata paling panjang biasanya paling selektif untuk prefix kata
+        anchor = max(tokens, key=len)
+        rest = [token for token in tokens if token is not anchor]
+
+        ranked: List[Tuple[int, int]] = []
+        seen = set()
+
+        def collect(rank: int, docs: Iterable[int], accept) -> bool:
+            for doc in docs:
+                if doc not in seen and accept(doc):
+                    seen.add(doc)
+                    ranked.append((rank, doc))
+                    if len(ranked) >= limit:
+                        return True
+            return False
+
+        done = collect(RANK_CODE_PREFIX, self._code_prefix_docs(snapshot, code_query),
+                       lambda doc: True) if code_query else False
+        if not done:
+            done = collect(
+                RANK_WORD_PREFIX, self._word_prefix_docs(snapshot, anchor),
+                lambda doc: all(any(word.startswith(token) for word in snapshot.words[doc])
+                                for token in rest),
+            )
+        if not done:
+            collect(
+                RANK_SUBSTRING, self._ngram_docs(snapshot, tokens),
+                lambda doc: normalized in snapshot.texts[doc]
+                or bool(code_query) and code_query in snapshot.keys[doc],
+            )
+
+        return [
+            {
+                "code": snapshot.codes[doc],
+                "name_id": snapshot.names_id[doc],
+                "name_en": snapshot.names_en[doc],
+                "rank": rank,
+            }
+            for rank, doc in ranked
+        ]
+
+    def get(self, code: str) -> Optional[Dict]:
+        """Satu diagnosis berdasarkan kode persis (None jika tidak ada di index)."""
+        snapshot = self._snapshot
+        doc = snapshot.by_code.get(code)
+        if doc is None:
+            return None
+        return {"code": code, "name_id": snapshot.names_id[doc], "name_en": snapshot.names_en[doc]}
+
+    def stats(self) -> Dict:
+        """Statistik index untuk monitoring."""
+        snapshot = self._snapshot
+        return {
+            "codes": len(snapshot.codes),
+            "ngrams": len(snapshot.postings),
+            "postings": sum(len(docs) for docs in snapshot.postings.values()),
+            "loads": self.loads,
+            "last_load_ms": self.last_load_ms,
+            "searches": self.searches,
+        }
+
+
+# Global instance
+icd10_index = ICD10SearchIndex()
@@ -0,0 +1,246 @@
+"""
+ICD-10 Contraindication Engine untuk SADEWA
+Kompilasi kontraindikasi penyakit dari drug_formularium.json (kode, kategori dan
+rentang ICD-10 seperti "K71", "I35.0", "O00-O9A") menjadi:
+
+- prefix trie atas hierarki kategori: kode/kategori tunggal mencakup semua
+  subkodenya ("K71" -> K71.0, K71.11, ...), dicek dengan satu walk O(panjang kode);
+- interval tree atas rentang kode yang dinormalisasi ("O00-O9A"), dicek dengan
+  stabbing query O(log n + hasil).
+
+Semua diagnosis pasien dicek terhadap seluruh obat resep sekaligus, sehingga
+kontraindikasi formularium menjadi hasil deterministik tanpa LLM.
+"""
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from services.drug_canonicalizer import FORMULARY_FILE, drug_canonicalizer
+
+_ICD_CODE = re.compile(r"^([A-Z])([0-9][0-9A-Z])\.?([0-9A-Z]{0,4})$")
+# Lebih besar dari semua karakter kode ICD (0-9, A-Z): batas atas "semua subkode"
+_DESCENDANTS = "~"
+
+
+def normalize_icd(code) -> Optional[str]:
+    """'i35.0' -> 'I350'; None jika bukan kode ICD-10 yang valid."""
+    match = _ICD_CODE.match(str(code or "").strip().upper())
+    if not match:
+        return None
+    return "".join(match.groups())
+
+
+def parse_icd_spec(spec) -> Optional[Tuple[str, str]]:
+    """
+    Interval (lo, hi) inklusif atas kode ternormalisasi untuk satu entri formularium.
+    "K71" -> ("K71", "K71~"); "O00-O9A" -> ("O00", "O9A~"). None jika tidak valid.
+    """
+    parts = str(spec or "").split("-")
+    if len(parts) == 1:
+        code = normalize_icd(parts[0])
+        return (code, code + _DESCENDANTS) if code else None
+    if len(parts) == 2:
+        lo, hi = normalize_icd(parts[0]), normalize_icd(parts[1])
+        if lo and hi and lo <= hi:
+            return lo, hi + _DESCENDANTS
+    return None
+
+
+class IntervalTree:
+    """Centered interval tree statis: stabbing query O(log n + jumlah hasil)."""
+
+    __slots__ = ("center", "left", "right", "by_start", "by_end")
+
+    def __init__(self, intervals: List[Tuple[str, str, object]]):
+        points = sorted(point for lo, hi, _ in intervals for point in (lo, hi))
+        self.center = points[len(points) // 2] if points else ""
+        here = [iv for iv in intervals if iv[0] <= self.center <= iv[1]]
+        left = [iv for iv in intervals if iv[1] < self.center]
+        right = [iv for iv in intervals if iv[0] > self.center]
+        self.by_start = sorted(here, key=lambda iv: iv[0])
+        self.by_end = sorted(here, key=lambda iv: iv[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def stab(self, point: str) -> List[object]:
+        """Payload semua interval yang memuat point."""
+        found = []
+        node = self
+        while node is not None:
+            if point < node.center:
+                for lo, _, payload in node.by_start:
+                    if lo > point:
+                        break
+                    found.append(payload)
+                node = node.left
+            elif point > node.center:
+                for _, hi, payload in node.by_end:
+                    if hi < point:
+                        break
+                    found.append(payload)
+                node = node.right
+            else:
+                found.extend(payload for _, _, payload in node.by_start)
+                break
+        return found
+
+
+class ContraindicationHit:
+    """Satu kontraindikasi: obat resep vs diagnosis pasien."""
+
+    __slots__ = ("medication", "drug_id", "icd_code", "rule")
+
+    def __init__(self, medication: str, drug_id: str, icd_code: str, rule: str):
+        self.medication = medication
+        self.drug_id = drug_id
+        self.icd_code = icd_code
+        self.rule = rule
+
+    def to_dict(self) -> Dict:
+        """Format item contraindications di InteractionResponse."""
+        reason = f"Contraindicated in {self.icd_code} per formularium"
+        if self.rule != self.icd_code:
+            reason += f" ({self.rule})"
+        return {
+            "drug": self.medication,
+            "diagnosis": self.icd_code,
+            "reason": reason,
+            "alternative_suggested": None,
+        }
+
+
+class _CompiledRules:
+    """Snapshot immutable (trie + interval tree) yang di-swap saat rebuild."""
+
+    __slots__ = ("trie", "tree", "drugs", "rules", "ranges")
+
+    def __init__(self):
+        # node: {"$": [(drug_id, rule)], char: node}
+        self.trie: Dict = {}
+        self.tree: Optional[IntervalTree] = None
+        self.drugs: Set[str] = set()
+        self.rules = 0
+        self.ranges = 0
+
+
+class ContraindicationEngine:
+    """Kontraindikasi obat-penyakit formularium atas kode ICD-10 diagnosis pasien."""
+
+    def __init__(self):
+        self._compiled = _CompiledRules()
+        self._sources: Optional[Tuple] = None
+        self._lock = threading.Lock()
+        self.invalid_rules: List[str] = []
+        self.checks = 0
+        self.hits = 0
+
+    def _ensure_compiled(self) -> _CompiledRules:
+        """Kompilasi ulang jika kamus obat dibangun ulang atau formularium berubah."""
+        try:
+            mtime = os.path.getmtime(FORMULARY_FILE)
+        except OSError:
+            mtime = None
+        sources = (drug_canonicalizer.generation, mtime)
+        if sources != self._sources:
+            with self._lock:
+                if sources != self._sources:
+                    self._compiled = self._compile()
+                    self._sources = sources
+        return self._compiled
+
+    def _compile(self) -> _CompiledRules:
+        compiled = _CompiledRules()
+        invalid = []
+        try:
+            with open(FORMULARY_FILE, "r", encoding="utf-8") as f:
+                formulary = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Formularium not available for contraindication engine: {e}")
+            formulary = []
+
+        intervals = []
+        for entry in formulary:
+            drug_id = drug_canonicalizer.canonical_id(entry.get("drug_name", ""))
+            if not drug_id:
+                continue
+            compiled.drugs.add(drug_id)
+            for spec in (entry.get("contraindications") or {}).get("diseases", []):
+                bounds = parse_icd_spec(spec)
+                if bounds is None:
+                    invalid.append(f"{entry.get('drug_name')}: {spec}")
+                    continue
+                payload = (drug_id, str(spec).upper())
+                compiled.rules += 1
+                if "-" in str(spec):
+                    intervals.append((bounds[0], bounds[1], payload))
+                    continue
+                node = compiled.trie
+                for char in bounds[0]:
+                    node = node.setdefault(char, {})
+                node.setdefault("$", []).append(payload)
+
+        compiled.tree = IntervalTree(intervals) if intervals else None
+        compiled.ranges = len(intervals)
+        self.invalid_rules = invalid
+        if invalid:
+            print(f"⚠️ Skipped {len(invalid)} invalid ICD-10 contraindication(s): {invalid[:5]}")
+        return compiled
+
+    def has_drug(self, drug_id: str) -> bool:
+        """True jika drug ID ada di formularium (kontraindikasinya diketahui)."""
+        return drug_id in self._ensure_compiled().drugs
+
+    def rules_for_code(self, icd_code) -> List[Tuple[str, str]]:
+        """(drug_id, rule) semua obat yang dikontraindikasikan untuk satu kode ICD-10."""
+        code = normalize_icd(icd_code)
+        if code is None:
+            return []
+        compiled = self._ensure_compiled()
+        found = []
+        node = compiled.trie
+        for char in code:
+            node = node.get(char)
+            if node is None:
+                break
+            found.extend(node.get("$", ()))
+        if compiled.tree is not None:
+            found.extend(compiled.tree.stab(code))
+        return found
+
+    def check(self, medications: List[str], icd_codes: Iterable[str]) -> List[ContraindicationHit]:
+        """Kontraindikasi untuk semua pasangan (obat resep, diagnosis pasien)."""
+        self.checks += 1
+        by_drug: Dict[str, List[str]] = {}
+        for med, drug_id in zip(medications, drug_canonicalizer.canonical_ids(medications)):
+            by_drug.setdefault(drug_id, []).append(med)
+
+        hits = []
+        seen = set()
+        for icd_code in icd_codes:
+            display_code = str(icd_code).strip().upper()
+            for drug_id, rule in self.rules_for_code(icd_code):
+                for med in by_drug.get(drug_id, ()):
+                    if (med, display_code) in seen:
+                        continue
+                    seen.add((med, display_code))
+                    hits.append(ContraindicationHit(med, drug_id, display_code, rule))
+        self.hits += len(hits)
+        return hits
+
+    def stats(self) -> Dict:
+        """Statistik engine untuk monitoring."""
+        compiled = self._compiled
+        return {
+            "formulary_drugs": len(compiled.drugs),
+            "rules": compiled.rules,
+            "range_rules": compiled.ranges,
+            "invalid_rules": len(self.invalid_rules),
+            "checks": self.checks,
+            "hits": self.hits,
+        }
+
+
+# Global instance
+contraindication_engine = ContraindicationEngine()
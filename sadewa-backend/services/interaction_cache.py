@@ -0,0 +1,395 @@
+"""
+Two-tier Interaction Cache untuk SADEWA
+L1: TTLCache in-process (per worker). L2: tabel drug_interaction_cache (MySQL),
+dipakai bersama oleh semua worker uvicorn.
+
+- Read-through: miss di L1 dibaca dari L2 lalu dipromosikan ke L1. Handler async
+  memakai get_async, yang membaca L2 di thread supaya event loop tidak tertahan.
+- Write-behind: tulis ke L1 langsung, tulis ke L2 di-batch oleh task background
+  (entry tetap antre sampai writer berjalan; set() tidak pernah menulis L2 langsung).
+- Negative caching: hasil "tidak ada interaksi" juga disimpan (TTL lebih pendek).
+- Row L2 yang expired dihapus secara berkala.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, text
+
+from app import database
+from services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+L1_MAX_ENTRIES = int(os.getenv("INTERACTION_CACHE_L1_MAX_ENTRIES", "2000"))
+L1_MAX_BYTES = int(os.getenv("INTERACTION_CACHE_L1_MAX_BYTES", str(32 * 1024 * 1024)))
+L1_TTL = float(os.getenv("INTERACTION_CACHE_L1_TTL", "3600"))
+NEGATIVE_TTL = timedelta(days=1)
+WRITE_BATCH_SIZE = 100
+# Batas antrean tulis L2 saat L2 tidak tersedia (entry tertua dibuang lebih dulu)
+MAX_PENDING_WRITES = int(os.getenv("INTERACTION_CACHE_MAX_PENDING_WRITES", "5000"))
+PURGE_INTERVAL = 3600.0
+# Setelah L2 gagal dibaca/ditulis, L2 dilewati selama interval ini
+L2_RETRY_INTERVAL = 30.0
+
+SEVERITY_RANK = {"MINOR": 1, "MODERATE": 2, "MAJOR": 3}
+
+
+def max_severity(severities: Iterable[Any]) -> Optional[str]:
+    """Severity tertinggi (MAJOR > MODERATE > MINOR); None jika kosong."""
+    values = [getattr(s, "value", s) for s in severities]
+    values = [str(v).upper() for v in values if v]
+    ranked = [v for v in values if v in SEVERITY_RANK]
+    return max(ranked, key=SEVERITY_RANK.get) if ranked else None
+
+
+def _json_default(value: Any) -> Any:
+    """Serializer untuk model pydantic, Enum, dan datetime di hasil analisis."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class InteractionCache:
+    """Cache dua tingkat (L1 in-process + L2 tabel drug_interaction_cache)."""
+
+    def __init__(self):
+        self.l1 = TTLCache(
+            "interaction_cache_l1",
+            max_entries=L1_MAX_ENTRIES,
+            max_bytes=L1_MAX_BYTES,
+            default_ttl=L1_TTL,
+        )
+        self._pending: Dict[str, Dict] = {}
+        self._pending_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._l2_disabled_until = 0.0
+        self._last_purge = 0.0
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self.l2_writes = 0
+        self.l2_purged = 0
+        self.negative_writes = 0
+
+    # ----- read path -----
+
+    def get(self, key: str, db=None) -> Optional[Any]:
+        """Read-through: L1, lalu L2 (hasil L2 dipromosikan ke L1). Blocking: untuk kode sync."""
+        value = self._get_local(key)
+        if value is not None:
+            return value
+        return self._get_l2(key, db)
+
+    async def get_async(self, key: str, db=None) -> Optional[Any]:
+        """Seperti get, tetapi L2 dibaca di thread (untuk handler async)."""
+        value = self._get_local(key)
+        if value is not None:
+            return value
+        if not self._l2_available():
+            return None
+        return await asyncio.to_thread(self._get_l2, key, db)
+
+    async def get_many_async(self, keys: Iterable[str], db=None) -> Dict[str, Any]:
+        """Read-through banyak key: L1/antrean langsung, sisanya satu query L2 (di thread)."""
+        found: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            value = self._get_local(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+        if missing and self._l2_available():
+            found.update(await asyncio.to_thread(self._get_many_l2, missing, db))
+        return found
+
+    def _get_local(self, key: str) -> Optional[Any]:
+        """L1, lalu antrean tulis yang belum masuk L2."""
+        value = self.l1.get(key)
+        if value is not None:
+            return value
+        pending = self._pending.get(key)
+        return pending["value"] if pending is not None else None
+
+    def _get_l2(self, key: str, db=None) -> Optional[Any]:
+        """Baca satu key dari L2 dan promosikan ke L1 (blocking DB I/O)."""
+        if not self._l2_available():
+            return None
+        try:
+            row = self._with_session(db, lambda session: session.execute(text("""
+                SELECT interaction_result, expiry_date
+                FROM drug_interaction_cache
+                WHERE drug_combination_hash = :hash
+                AND expiry_date > NOW()
+                LIMIT 1
+            """), {"hash": key}).fetchone())
+        except Exception as e:
+            self._l2_failed("read", e)
+            return None
+
+        if row is None:
+            self.l2_misses += 1
+            return None
+        self.l2_hits += 1
+        value = row.interaction_result
+        if isinstance(value, (str, bytes)):
+            value = json.loads(value)
+        self.l1.set(key, value, ttl=self._remaining_ttl(row.expiry_date))
+        return value
+
+    def _get_many_l2(self, keys: List[str], db=None) -> Dict[str, Any]:
+        """Baca banyak key dari L2 dalam satu query dan promosikan ke L1 (blocking DB I/O)."""
+        if not self._l2_available():
+            return {}
+        query = text("""
+            SELECT drug_combination_hash, interaction_result, expiry_date
+            FROM drug_interaction_cache
+            WHERE drug_combination_hash IN :hashes
+            AND expiry_date > NOW()
+        """).bindparams(bindparam("hashes", expanding=True))
+        try:
+            rows = self._with_session(
+                db, lambda session: session.execute(query, {"hashes": keys}).fetchall()
+            )
+        except Exception as e:
+            self._l2_failed("read", e)
+            return {}
+
+        found: Dict[str, Any] = {}
+        for row in rows:
+            value = row.interaction_result
+            if isinstance(value, (str, bytes)):
+                value = json.loads(value)
+            found[row.drug_combination_hash] = value
+            self.l1.set(row.drug_combination_hash, value, ttl=self._remaining_ttl(row.expiry_date))
+        self.l2_hits += len(found)
+        self.l2_misses += len(keys) - len(found)
+        return found
+
+    # ----- write path -----
+
+    def set(self, key: str, value: Any, drug_names: List[str],
+            severity_max: Optional[str] = None, ttl: timedelta = timedelta(days=7),
+            negative: bool = False) -> None:
+        """
+        Simpan ke L1 sekarang; L2 ditulis oleh writer background (write-behind).
+        negative=True untuk hasil tanpa interaksi (TTL dibatasi NEGATIVE_TTL).
+        """
+        if negative:
+            ttl = min(ttl, NEGATIVE_TTL)
+            self.negative_writes += 1
+        self.l1.set(key, value, ttl=min(ttl.total_seconds(), L1_TTL))
+        with self._pending_lock:
+            self._pending[key] = {
+                "value": value,
+                "drug_names": drug_names,
+                "severity_max": severity_max,
+                "expiry": datetime.now() + ttl,
+            }
+            self._trim_pending()
+        # Tanpa writer (sebelum startup, script/CLI) entry tetap antre: writer atau
+        # flush() eksplisit yang menulisnya, bukan request yang sedang berjalan
+        if self._wakeup is not None and len(self._pending) >= WRITE_BATCH_SIZE:
+            self._wakeup.set()
+
+    def delete(self, key: str, db=None) -> None:
+        """Hapus key dari L1, antrean tulis, dan L2."""
+        self.l1.delete(key)
+        with self._pending_lock:
+            self._pending.pop(key, None)
+        if not self._l2_available():
+            return
+        try:
+            self._with_session(db, lambda session: session.execute(text(
+                "DELETE FROM drug_interaction_cache WHERE drug_combination_hash = :hash"
+            ), {"hash": key}), commit=True)
+        except Exception as e:
+            self._l2_failed("delete", e)
+
+    def clear_l1(self) -> int:
+        """Kosongkan L1 worker ini (L2 tidak disentuh)."""
+        return self.l1.clear()
+
+    def flush(self) -> int:
+        """Tulis semua entry yang antre ke L2 dalam satu transaksi; return jumlahnya."""
+        if not self._l2_available():
+            # Antrean tetap disimpan sampai L2 bisa ditulis lagi
+            return 0
+        with self._pending_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+        params = [
+            {
+                "hash": key,
+                "drugs": json.dumps(entry["drug_names"], ensure_ascii=False),
+                "result": json.dumps(entry["value"], default=_json_default, ensure_ascii=False),
+                "severity": entry["severity_max"],
+                "expiry": entry["expiry"],
+            }
+            for key, entry in batch.items()
+        ]
+        try:
+            self._with_session(None, lambda session: session.execute(text("""
+                INSERT INTO drug_interaction_cache
+                (drug_combination_hash, drug_names, interaction_result, severity_max, expiry_date)
+                VALUES (:hash, :drugs, :result, :severity, :expiry)
+                ON DUPLICATE KEY UPDATE
+                    drug_names = VALUES(drug_names),
+                    interaction_result = VALUES(interaction_result),
+                    severity_max = VALUES(severity_max),
+                    last_checked = NOW(),
+                    expiry_date = VALUES(expiry_date)
+            """), params), commit=True)
+        except Exception as e:
+            self._l2_failed("write", e)
+            self._requeue(batch)
+            return 0
+        self.l2_writes += len(params)
+        return len(params)
+
+    def _requeue(self, batch: Dict[str, Dict]) -> None:
+        """Kembalikan batch yang gagal ditulis ke antrean (entry lebih baru untuk key yang sama menang)."""
+        now = datetime.now()
+        with self._pending_lock:
+            merged = {key: entry for key, entry in batch.items() if entry["expiry"] > now}
+            merged.update(self._pending)
+            self._pending = merged
+            self._trim_pending()
+
+    def _trim_pending(self) -> None:
+        """Batasi antrean ke MAX_PENDING_WRITES, entry yang paling cepat expired dibuang (caller memegang _pending_lock)."""
+        overflow = len(self._pending) - MAX_PENDING_WRITES
+        if overflow > 0:
+            for key in sorted(self._pending, key=lambda k: self._pending[k]["expiry"])[:overflow]:
+                del self._pending[key]
+
+    def purge_expired(self) -> int:
+        """Hapus row L2 yang sudah expired."""
+        self._last_purge = time.monotonic()
+        if not self._l2_available():
+            return 0
+        try:
+            result = self._with_session(None, lambda session: session.execute(text(
+                "DELETE FROM drug_interaction_cache WHERE expiry_date <= NOW()"
+            )), commit=True)
+        except Exception as e:
+            self._l2_failed("purge", e)
+            return 0
+        purged = result.rowcount or 0
+        self.l2_purged += purged
+        if purged:
+            logger.info(f"🧹 Purged {purged} expired drug_interaction_cache rows")
+        return purged
+
+    # ----- background writer -----
+
+    def start(self, flush_interval: float = 2.0) -> None:
+        """Mulai writer write-behind + sweep L1 (dipanggil saat startup)."""
+        self.l1.start_sweeper()
+        if self._writer is not None and not self._writer.done():
+            return
+        self._wakeup = asyncio.Event()
+        if self._pending:
+            # Entry yang antre sebelum writer berjalan langsung ditulis
+            self._wakeup.set()
+        self._writer = asyncio.get_running_loop().create_task(self._write_loop(flush_interval))
+
+    async def stop(self) -> None:
+        """Hentikan writer dan tulis sisa antrean (dipanggil saat shutdown)."""
+        await self.l1.stop_sweeper()
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        self._wakeup = None
+        await asyncio.to_thread(self.flush)
+
+    async def _write_loop(self, flush_interval: float) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                # Blocking DB I/O dijalankan di thread supaya event loop tidak tertahan
+                await asyncio.to_thread(self.flush)
+                if time.monotonic() - self._last_purge >= PURGE_INTERVAL:
+                    await asyncio.to_thread(self.purge_expired)
+            except Exception as e:
+                logger.error(f"Interaction cache writer error: {e}")
+
+    # ----- helpers -----
+
+    @staticmethod
+    def _with_session(db, operation, commit: bool = False):
+        """Jalankan operasi dengan session request, atau session baru dari SessionLocal."""
+        if db is not None:
+            try:
+                result = operation(db)
+                if commit:
+                    db.commit()
+                return result
+            except Exception:
+                db.rollback()
+                raise
+        if database.SessionLocal is None:
+            raise RuntimeError("database session not available")
+        with database.SessionLocal() as session:
+            result = operation(session)
+            if commit:
+                session.commit()
+            return result
+
+    def _l2_available(self) -> bool:
+        return time.monotonic() >= self._l2_disabled_until
+
+    def _l2_failed(self, operation: str, error: Exception) -> None:
+        self.l2_errors += 1
+        self._l2_disabled_until = time.monotonic() + L2_RETRY_INTERVAL
+        logger.warning(f"Interaction cache L2 {operation} failed, using L1 only for "
+                       f"{L2_RETRY_INTERVAL:.0f}s: {error}")
+
+    @staticmethod
+    def _remaining_ttl(expiry_date: Any) -> float:
+        """Sisa umur row L2 (detik), dibatasi TTL L1."""
+        if isinstance(expiry_date, datetime):
+            return max(1.0, min((expiry_date - datetime.now()).total_seconds(), L1_TTL))
+        return L1_TTL
+
+    def stats(self) -> Dict:
+        """Statistik kedua tier untuk monitoring."""
+        return {
+            "l1": self.l1.stats(),
+            "l2": {
+                "hits": self.l2_hits,
+                "misses": self.l2_misses,
+                "errors": self.l2_errors,
+                "writes": self.l2_writes,
+                "pending_writes": len(self._pending),
+                "negative_writes": self.negative_writes,
+                "purged_rows": self.l2_purged,
+                "available": self._l2_available(),
+                "writer_running": self._writer is not None and not self._writer.done(),
+            },
+        }
+
+
+# Global instance
+interaction_cache = InteractionCache()
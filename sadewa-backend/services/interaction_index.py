@@ -0,0 +1,247 @@
+"""
+Drug Interaction Index untuk SADEWA
+Process-wide adjacency index atas knowledge base interaksi obat, dibangun sekali
+dan di-refresh hanya ketika tabel drug_interactions berubah.
+
+Perubahan tabel dideteksi dari checksum isi row (bukan COUNT/MAX id), sehingga
+UPDATE in-place pada severity/rekomendasi juga memicu refresh.
+"""
+import hashlib
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models import DrugInteraction
+from services.drug_canonicalizer import drug_canonicalizer
+
+# Interval minimal (detik) antar pengecekan fingerprint tabel
+REFRESH_CHECK_INTERVAL = 30.0
+
+# Kolom isi drug_interactions yang ikut fingerprint
+INTERACTION_COLUMNS = (
+    "id", "drug_a", "drug_b", "severity", "description", "mechanism",
+    "clinical_effect", "recommendation", "monitoring", "evidence_level", "is_active",
+)
+
+
+def table_content_fingerprint(db: Session, table: str, columns: Sequence[str],
+                              order_by: str = "id") -> Tuple:
+    """
+    Fingerprint isi tabel: (jumlah row, checksum semua kolom). Berubah juga saat row
+    di-UPDATE in-place. MySQL menghitungnya di server (SUM CRC32); dialek lain
+    (SQLite untuk benchmark) di-hash di Python, urut `order_by` (primary key).
+    `table`/`columns`/`order_by` adalah konstanta kode.
+    """
+    if db.get_bind().dialect.name == "mysql":
+        fields = ", ".join(f"IFNULL({column}, '')" for column in columns)
+        row = db.execute(text(
+            f"SELECT COUNT(*), SUM(CRC32(CONCAT_WS('|', {fields}))) FROM {table}"
+        )).fetchone()
+        return tuple(str(value) for value in row)
+    digest = hashlib.sha1()
+    count = 0
+    for row in db.execute(text(f"SELECT {', '.join(columns)} FROM {table} ORDER BY {order_by}")):
+        digest.update("|".join("" if value is None else str(value) for value in row).encode("utf-8"))
+        digest.update(b"\n")
+        count += 1
+    return str(count), digest.hexdigest()
+
+
+class InteractionEdge:
+    """Record interaksi yang compact untuk disimpan di adjacency map."""
+
+    __slots__ = (
+        "id", "drug_a", "drug_b", "severity", "description", "mechanism",
+        "clinical_effect", "recommendation", "monitoring", "evidence_level",
+    )
+
+    def __init__(self, row: Dict):
+        self.id = row.get("id")
+        self.drug_a = row.get("drug_a", "")
+        self.drug_b = row.get("drug_b", "")
+        self.severity = row.get("severity")
+        self.description = row.get("description")
+        self.mechanism = row.get("mechanism")
+        self.clinical_effect = row.get("clinical_effect")
+        self.recommendation = row.get("recommendation")
+        self.monitoring = row.get("monitoring")
+        self.evidence_level = row.get("evidence_level")
+
+    def to_dict(self) -> Dict:
+        """Format dict yang sama dengan row knowledge base (field kosong dihilangkan)."""
+        result = {
+            "id": self.id,
+            "drug_a": self.drug_a,
+            "drug_b": self.drug_b,
+            "severity": self.severity,
+        }
+        for field in ("description", "mechanism", "clinical_effect",
+                      "recommendation", "monitoring", "evidence_level"):
+            value = getattr(self, field)
+            if value is not None:
+                result[field] = value
+        return result
+
+
+class InteractionIndex:
+    """Adjacency map: canonical drug ID -> daftar InteractionEdge."""
+
+    def __init__(self, check_interval: float = REFRESH_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._adjacency: Dict[str, List[InteractionEdge]] = {}
+        self._edges: List[InteractionEdge] = []
+        self._dictionary_generation = -1
+        self._edge_count = 0
+        self._source: Optional[str] = None
+        self._fingerprint: Optional[Tuple] = None
+        self._last_check = 0.0
+        self._built_at: Optional[float] = None
+        self._rebuilds = 0
+        self._lock = threading.Lock()
+
+    @property
+    def source(self) -> Optional[str]:
+        """Sumber data index saat ini ('database' / 'json_fallback')."""
+        return self._source
+
+    @property
+    def edge_count(self) -> int:
+        """Jumlah interaksi yang ter-index."""
+        return self._edge_count
+
+    @property
+    def rebuilds(self) -> int:
+        """Naik setiap kali index dibangun ulang (untuk stamp knowledge base)."""
+        return self._rebuilds
+
+    @property
+    def edges(self) -> List[InteractionEdge]:
+        """Semua edge yang ter-index saat ini."""
+        return self._edges
+
+    def build(self, rows: Iterable[Dict], source: str,
+              fingerprint: Optional[Tuple] = None) -> None:
+        """Bangun ulang adjacency map dari daftar row interaksi."""
+        edges = [InteractionEdge(row) for row in rows]
+        adjacency = self._build_adjacency(edges)
+        generation = drug_canonicalizer.generation
+
+        with self._lock:
+            self._edges = edges
+            self._adjacency = adjacency
+            self._dictionary_generation = generation
+            self._edge_count = len(edges)
+            self._source = source
+            self._fingerprint = fingerprint
+            self._built_at = time.time()
+            self._rebuilds += 1
+        print(f"✅ Interaction index built: {len(edges)} interactions from {source}")
+
+    @staticmethod
+    def _build_adjacency(edges: List[InteractionEdge]) -> Dict[str, List[InteractionEdge]]:
+        """Kelompokkan edge berdasarkan drug ID kanonik kedua sisinya."""
+        adjacency: Dict[str, List[InteractionEdge]] = {}
+        for edge in edges:
+            key_a = drug_canonicalizer.canonical_id(edge.drug_a)
+            key_b = drug_canonicalizer.canonical_id(edge.drug_b)
+            if not key_a or not key_b:
+                continue
+            adjacency.setdefault(key_a, []).append(edge)
+            if key_b != key_a:
+                adjacency.setdefault(key_b, []).append(edge)
+        return adjacency
+
+    def _adjacency_for_lookup(self) -> Dict[str, List[InteractionEdge]]:
+        """Adjacency map, di-rekey jika kamus obat sudah dibangun ulang."""
+        generation = drug_canonicalizer.generation
+        if generation != self._dictionary_generation:
+            adjacency = self._build_adjacency(self._edges)
+            generation = drug_canonicalizer.generation
+            with self._lock:
+                self._adjacency = adjacency
+                self._dictionary_generation = generation
+        return self._adjacency
+
+    def edges_for(self, drug_id: str) -> List[InteractionEdge]:
+        """Semua edge yang melibatkan satu drug ID kanonik."""
+        return self._adjacency_for_lookup().get(drug_id, [])
+
+    def lookup(self, medications: Iterable[str]) -> List[Dict]:
+        """Ambil semua interaksi yang melibatkan minimal satu obat dari daftar."""
+        adjacency = self._adjacency_for_lookup()
+        seen = set()
+        relevant = []
+        for drug_id in dict.fromkeys(drug_canonicalizer.canonical_ids(medications)):
+            for edge in adjacency.get(drug_id, ()):
+                if id(edge) not in seen:
+                    seen.add(id(edge))
+                    relevant.append(edge.to_dict())
+        return relevant
+
+    def ensure_fresh(self, db: Session) -> None:
+        """
+        Pastikan index sinkron dengan tabel drug_interactions.
+        Fingerprint tabel hanya dicek sekali per check_interval; row dimuat
+        ulang hanya jika fingerprint berubah. Error database diteruskan ke caller.
+        """
+        now = time.monotonic()
+        if self._source == "database" and now - self._last_check < self.check_interval:
+            return
+
+        fingerprint = self._fetch_fingerprint(db)
+        self._last_check = now
+        if self._source == "database" and fingerprint == self._fingerprint:
+            return
+
+        self.build(self._fetch_rows(db), source="database", fingerprint=fingerprint)
+
+    def invalidate(self) -> None:
+        """Paksa pengecekan ulang pada request berikutnya."""
+        with self._lock:
+            self._fingerprint = None
+            self._last_check = 0.0
+
+    def stats(self) -> Dict:
+        """Statistik index untuk monitoring."""
+        return {
+            "source": self._source,
+            "indexed_interactions": self._edge_count,
+            "indexed_drugs": len(self._adjacency),
+            "rebuilds": self._rebuilds,
+            "built_at": self._built_at,
+            "check_interval_seconds": self.check_interval,
+        }
+
+    @staticmethod
+    def _fetch_fingerprint(db: Session) -> Tuple:
+        """Fingerprint isi tabel (checksum di server, tanpa memuat row di MySQL)."""
+        return table_content_fingerprint(db, DrugInteraction.__tablename__, INTERACTION_COLUMNS)
+
+    @staticmethod
+    def _fetch_rows(db: Session) -> List[Dict]:
+        """Muat semua interaksi aktif dari database."""
+        interactions = db.query(DrugInteraction).filter(
+            DrugInteraction.is_active == True
+        ).all()
+        return [
+            {
+                "id": interaction.id,
+                "drug_a": interaction.drug_a,
+                "drug_b": interaction.drug_b,
+                "severity": interaction.severity.value,
+                "description": interaction.description,
+                "mechanism": interaction.mechanism,
+                "clinical_effect": interaction.clinical_effect,
+                "recommendation": interaction.recommendation,
+                "monitoring": interaction.monitoring,
+                "evidence_level": interaction.evidence_level
+            }
+            for interaction in interactions
+        ]
+
+
+# Global instance
+interaction_index = InteractionIndex()
@@ -0,0 +1,311 @@
+"""
+Interaction Matrix untuk SADEWA
+Matriks severity pairwise yang dihitung di muka atas drug ID kanonik (formularium,
+tabel drugs, sinonim dan semua obat di knowledge base interaksi). Disimpan sebagai
+array NumPy uint8 upper-triangular yang dipadatkan (condensed, tanpa diagonal),
+teks interaksi disimpan di side table per pasangan. Cek semua pasangan untuk resep
+N obat menjadi satu fancy-index vektor, bukan N² query atau scan string.
+
+Array ditulis ke file per isi knowledge base (nama file = digest isi) lalu dibuka
+read-only dengan np.memmap, sehingga worker lain dengan knowledge base yang sama
+berbagi halaman yang sama di page cache. Dibangun ulang saat versi knowledge base
+berubah.
+
+Rule interaksi kelas/obat dari data/drug_classes.json ("class:nsaids" x
+"class:anticoagulants", ...) diekspansi ke pasangan drug ID saat build dan hanya
+mengisi pasangan yang belum punya row di knowledge base interaksi.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.allergen_index import allergen_index, interaction_rule_row
+from services.drug_canonicalizer import drug_canonicalizer
+from services.interaction_index import interaction_index
+from services.knowledge_base import knowledge_base
+
+INTERACTION_MATRIX_ENABLED = os.getenv("INTERACTION_MATRIX_ENABLED", "true").lower() != "false"
+INTERACTION_MATRIX_DIR = os.getenv(
+    "INTERACTION_MATRIX_DIR", os.path.join(tempfile.gettempdir(), "sadewa_interaction_matrix")
+)
+FILE_PREFIX = "interaction_matrix-"
+
+# Kode severity di matriks (0 = tidak ada interaksi yang diketahui)
+SEVERITY_CODES = {"MINOR": 1, "MODERATE": 2, "MAJOR": 3}
+SEVERITY_NAMES = {code: name for name, code in SEVERITY_CODES.items()}
+
+
+def severity_code(severity) -> int:
+    """Kode uint8 untuk teks severity; severity tidak dikenal dianggap MODERATE."""
+    return SEVERITY_CODES.get(str(severity or "").upper(), SEVERITY_CODES["MODERATE"])
+
+
+def condensed_index(lo, hi, size: int):
+    """Posisi pasangan (lo < hi) di array upper-triangular tanpa diagonal (skalar atau array)."""
+    return lo * (2 * size - lo - 1) // 2 + (hi - lo - 1)
+
+
+class _MatrixSnapshot:
+    """Snapshot immutable (index drug, array severity, side table) yang di-swap saat rebuild."""
+
+    __slots__ = ("ids", "matrix", "details")
+
+    def __init__(self, ids: Dict[str, int], matrix: np.ndarray, details: Dict[int, List[Dict]]):
+        self.ids = ids
+        self.matrix = matrix
+        # posisi condensed -> row interaksi (urutan: simple_drug_interactions, drug_interactions,
+        # lalu satu rule kelas/obat untuk pasangan yang belum tercakup)
+        self.details = details
+
+
+class InteractionMatrix:
+    """Matriks severity simetris (disimpan upper-triangular) + side table teks interaksi."""
+
+    def __init__(self, enabled: bool = INTERACTION_MATRIX_ENABLED,
+                 directory: str = INTERACTION_MATRIX_DIR):
+        self.enabled = enabled
+        self.directory = directory
+        self._snapshot = _MatrixSnapshot({}, np.zeros(0, dtype=np.uint8), {})
+        self._kb_version = -1
+        self._digest: Optional[str] = None
+        self._path: Optional[str] = None
+        self._mapped = False
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.reused_files = 0
+        self.last_build_ms: Optional[float] = None
+        self.lookups = 0
+
+    @property
+    def size(self) -> int:
+        """Jumlah drug ID di matriks."""
+        return len(self._snapshot.ids)
+
+    def ensure_fresh(self) -> None:
+        """Bangun ulang matriks jika versi knowledge base berubah sejak build terakhir."""
+        version = knowledge_base.ensure_fresh()
+        if version == self._kb_version:
+            return
+        with self._lock:
+            if version != self._kb_version:
+                self._build(version)
+
+    def _build(self, version: int) -> None:
+        started = time.perf_counter()
+        rows = [dict(row, _source=0) for row in knowledge_base.simple_rows]
+        rows += [dict(edge.to_dict(), _source=1) for edge in interaction_index.edges]
+
+        endpoints = []
+        drug_ids = {drug_id for _, drug_id in drug_canonicalizer.alias_items()}
+        for row in rows:
+            pair = (drug_canonicalizer.canonical_id(row.get("drug_a") or ""),
+                    drug_canonicalizer.canonical_id(row.get("drug_b") or ""))
+            endpoints.append(pair)
+            drug_ids.update(drug_id for drug_id in pair if drug_id)
+        for order, (drug_a, drug_b, rule) in enumerate(allergen_index.interaction_pairs()):
+            rows.append(dict(interaction_rule_row(drug_a, drug_b, rule), id=order, _source=2))
+            endpoints.append((drug_a, drug_b))
+            drug_ids.update((drug_a, drug_b))
+        ordered = sorted(drug_ids)
+        ids = {drug_id: position for position, drug_id in enumerate(ordered)}
+        size = len(ordered)
+
+        details: Dict[int, List[Dict]] = {}
+        severities: Dict[int, int] = {}
+        seen = set()
+        for row, (drug_a, drug_b) in sorted(
+            zip(rows, endpoints), key=lambda item: (item[0]["_source"], item[0].get("id") or 0)
+        ):
+            if not drug_a or not drug_b or drug_a == drug_b:
+                continue
+            lo, hi = sorted((ids[drug_a], ids[drug_b]))
+            k = condensed_index(lo, hi, size)
+            if row.pop("_source") == 2 and k in details:
+                continue
+            # Row yang sama persis dari dua tabel cukup sekali per pasangan
+            row_key = (k, json.dumps({f: v for f, v in row.items() if f != "id"},
+                                     sort_keys=True, default=str))
+            if row_key in seen:
+                continue
+            seen.add(row_key)
+            details.setdefault(k, []).append(row)
+            severities[k] = max(severities.get(k, 0), severity_code(row.get("severity")))
+
+        digest = hashlib.sha1(json.dumps(
+            [ordered, sorted(severities.items())], separators=(",", ":")
+        ).encode("utf-8")).hexdigest()[:16]
+        matrix, path = self._load_or_write(digest, size, severities)
+
+        self._snapshot = _MatrixSnapshot(ids, matrix, details)
+        self._kb_version = version
+        self._digest = digest
+        self._path = path
+        self._mapped = path is not None
+        self.builds += 1
+        self.last_build_ms = round((time.perf_counter() - started) * 1000, 2)
+        print(f"✅ Interaction matrix built: {size} drugs, {len(severities)} interacting pairs "
+              f"({'memmap' if path else 'in-memory'})")
+
+    def _load_or_write(self, digest: str, size: int,
+                       severities: Dict[int, int]) -> Tuple[np.ndarray, Optional[str]]:
+        """Buka file matriks untuk digest ini (tulis dulu jika belum ada); fallback ke RAM."""
+        length = size * (size - 1) // 2
+        matrix = np.zeros(length, dtype=np.uint8)
+        if severities:
+            positions = np.fromiter(severities.keys(), dtype=np.int64, count=len(severities))
+            matrix[positions] = np.fromiter(severities.values(), dtype=np.uint8, count=len(severities))
+        if length == 0:
+            return matrix, None
+
+        path = os.path.join(self.directory, f"{FILE_PREFIX}{digest}.u8")
+        try:
+            if os.path.getsize(path) == length:
+                self.reused_files += 1
+                return np.memmap(path, dtype=np.uint8, mode="r", shape=(length,)), path
+        except OSError:
+            pass
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=FILE_PREFIX, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                matrix.tofile(f)
+            # Rename atomik: worker lain tidak pernah melihat file setengah jadi
+            os.replace(tmp_path, path)
+            self._remove_stale(path)
+            return np.memmap(path, dtype=np.uint8, mode="r", shape=(length,)), path
+        except OSError as e:
+            print(f"⚠️ Interaction matrix not shared, using in-memory copy: {e}")
+            return matrix, None
+
+    def _remove_stale(self, current: str) -> None:
+        """Hapus file matriks versi lama (mapping yang masih terbuka tetap valid di POSIX)."""
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(FILE_PREFIX) and name.endswith(".u8") and path != current:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    # ----- lookup -----
+
+    @staticmethod
+    def _pair_positions(snapshot: _MatrixSnapshot, medications: List[str]):
+        """(i, j, posisi condensed) untuk semua pasangan obat i<j yang ada di matriks."""
+        return InteractionMatrix._id_pair_positions(
+            snapshot, drug_canonicalizer.canonical_ids(medications)
+        )
+
+    @staticmethod
+    def _id_pair_positions(snapshot: _MatrixSnapshot, drug_ids: List[str]):
+        """Seperti _pair_positions, tetapi dari drug ID kanonik yang sudah di-resolve."""
+        size = len(snapshot.ids)
+        indices = np.array([snapshot.ids.get(drug_id, -1) for drug_id in drug_ids], dtype=np.int64)
+        first, second = np.triu_indices(len(indices), k=1)
+        a, b = indices[first], indices[second]
+        valid = (a >= 0) & (b >= 0) & (a != b)
+        first, second, a, b = first[valid], second[valid], a[valid], b[valid]
+        lo, hi = np.minimum(a, b), np.maximum(a, b)
+        return first, second, condensed_index(lo, hi, size)
+
+    def pair_severities(self, medications: List[str]) -> List[Tuple[int, int, str]]:
+        """(posisi obat i, posisi obat j, severity) untuk setiap pasangan yang berinteraksi."""
+        self.ensure_fresh()
+        self.lookups += 1
+        snapshot = self._snapshot
+        first, second, positions = self._pair_positions(snapshot, medications)
+        codes = snapshot.matrix[positions]
+        hits = np.nonzero(codes)[0]
+        return [
+            (int(first[h]), int(second[h]), SEVERITY_NAMES[int(codes[h])])
+            for h in hits
+        ]
+
+    def find_interactions(self, medications: List[str], include_rules: bool = True) -> List[Dict]:
+        """
+        Row interaksi untuk semua pasangan yang berinteraksi (urutan pasangan = urutan input).
+        include_rules=False hanya mengembalikan row tabel interaksi (tanpa rule kelas/obat).
+        """
+        self.ensure_fresh()
+        self.lookups += 1
+        snapshot = self._snapshot
+        _, _, positions = self._pair_positions(snapshot, medications)
+        hits = np.nonzero(snapshot.matrix[positions])[0]
+        return [
+            dict(row)
+            for h in hits
+            for row in snapshot.details.get(int(positions[h]), ())
+            if include_rules or "rule" not in row
+        ]
+
+    def pair_interactions(self, medications: List[str]) -> List[Tuple[int, int, List[Dict]]]:
+        """(posisi obat i, posisi obat j, row interaksi) untuk setiap pasangan yang berinteraksi."""
+        self.ensure_fresh()
+        self.lookups += 1
+        snapshot = self._snapshot
+        first, second, positions = self._pair_positions(snapshot, medications)
+        hits = np.nonzero(snapshot.matrix[positions])[0]
+        return [
+            (int(first[h]), int(second[h]),
+             [dict(row) for row in snapshot.details.get(int(positions[h]), ())])
+            for h in hits
+        ]
+
+    def interactions_touching(self, new_ids: Iterable[str], drug_ids: Iterable[str]) -> List[Dict]:
+        """
+        Row interaksi untuk setiap pasangan (drug ID baru x drug ID lain, termasuk
+        sesama obat baru) yang berinteraksi; satu fancy-index, tanpa scan knowledge base.
+        """
+        self.ensure_fresh()
+        self.lookups += 1
+        snapshot = self._snapshot
+        new = list(dict.fromkeys(new_ids))
+        new_set = set(new)
+        # Obat baru di depan: pasangan i<j menyentuh obat baru jika i < len(new)
+        ordered = new + [drug_id for drug_id in dict.fromkeys(drug_ids) if drug_id not in new_set]
+        first, _, positions = self._id_pair_positions(snapshot, ordered)
+        positions = positions[first < len(new)]
+        hits = np.nonzero(snapshot.matrix[positions])[0]
+        return [
+            dict(row)
+            for h in hits
+            for row in snapshot.details.get(int(positions[h]), ())
+        ]
+
+    def max_severity(self, medications: List[str]) -> Optional[str]:
+        """Severity tertinggi di antara semua pasangan, atau None jika tidak ada interaksi."""
+        self.ensure_fresh()
+        self.lookups += 1
+        snapshot = self._snapshot
+        _, _, positions = self._pair_positions(snapshot, medications)
+        if len(positions) == 0:
+            return None
+        code = int(snapshot.matrix[positions].max())
+        return SEVERITY_NAMES.get(code)
+
+    def stats(self) -> Dict:
+        """Statistik matriks untuk monitoring."""
+        return {
+            "enabled": self.enabled,
+            "drugs": self.size,
+            "interacting_pairs": len(self._snapshot.details),
+            "matrix_bytes": int(self._snapshot.matrix.nbytes),
+            "memory_mapped": self._mapped,
+            "path": self._path,
+            "digest": self._digest,
+            "knowledge_base_version": self._kb_version,
+            "builds": self.builds,
+            "reused_files": self.reused_files,
+            "last_build_ms": self.last_build_ms,
+            "lookups": self.lookups,
+        }
+
+
+# Global instance
+interaction_matrix = InteractionMatrix()
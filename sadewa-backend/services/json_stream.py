@@ -0,0 +1,110 @@
+"""
+Incremental JSON parser untuk SADEWA
+Membaca output LLM yang di-stream per token dan mengeluarkan setiap elemen
+object dari array top-level tertentu (mis. "warnings") begitu object itu lengkap,
+tanpa menunggu seluruh JSON selesai.
+"""
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class IncrementalJSONArrayParser:
+    """
+    State machine karakter demi karakter atas object JSON top-level.
+    Teks sebelum '{' pertama (mis. pembuka ```json) diabaikan.
+    """
+
+    def __init__(self, array_keys: Iterable[str]):
+        self.array_keys = frozenset(array_keys)
+        self._buffer: List[str] = []
+        self._position = 0
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start: Optional[int] = None
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._active_key: Optional[str] = None
+        self._item_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """Seluruh teks yang sudah diterima."""
+        return "".join(self._buffer)
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict]]:
+        """Tambahkan potongan teks; kembalikan (key, object) yang baru lengkap."""
+        completed: List[Tuple[str, Dict]] = []
+        if not chunk:
+            return completed
+        self._buffer.append(chunk)
+        text = None
+
+        for char in chunk:
+            index = self._position
+            self._position += 1
+
+            if self._done:
+                break
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        text = text or "".join(self._buffer)
+                        self._last_string = _decode_string(text[self._string_start:index + 1])
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char == ":" and self._depth == 1:
+                self._current_key = self._last_string
+            elif char in "{[":
+                if char == "[" and self._depth == 1 and self._current_key in self.array_keys:
+                    self._active_key = self._current_key
+                elif char == "{" and self._depth == 2 and self._active_key:
+                    self._item_start = index
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._depth == 2 and self._item_start is not None:
+                    text = text or "".join(self._buffer)
+                    item = _load_object(text[self._item_start:index + 1])
+                    if item is not None:
+                        completed.append((self._active_key, item))
+                    self._item_start = None
+                elif char == "]" and self._depth == 1:
+                    self._active_key = None
+                elif self._depth == 0:
+                    self._done = True
+            elif char == "," and self._depth == 1:
+                self._current_key = None
+
+        return completed
+
+
+def _decode_string(literal: str) -> Optional[str]:
+    try:
+        return json.loads(literal)
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+
+def _load_object(literal: str) -> Optional[Dict]:
+    try:
+        value = json.loads(literal)
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
@@ -0,0 +1,230 @@
+"""
+Knowledge Base Version untuk SADEWA
+Stamp per obat atas isi knowledge base (interaksi di drug_interactions dan
+simple_drug_interactions, entri formularium, kelas obat di ontologi alergen,
+clinical rules, alias kamus obat) yang ikut masuk ke cache key hasil analisis.
+Jika row yang melibatkan suatu obat berubah, stamp obat itu berubah sehingga hanya
+entry cache yang melibatkan obat tersebut yang tidak lagi terbaca; entry lain
+tetap hit.
+
+Stamp diturunkan dari isi data (bukan counter per proses), sehingga semua
+worker menghasilkan key yang sama untuk L2 bersama. `version` adalah counter
+monotonik per proses yang naik setiap kali perubahan terdeteksi (monitoring).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from services.allergen_index import DRUG_CLASSES_FILE, allergen_index
+from services.clinical_rules import CLINICAL_RULES_FILE
+from services.drug_canonicalizer import FORMULARY_FILE, drug_canonicalizer
+from services.interaction_index import interaction_index, table_content_fingerprint
+
+# Interval minimal (detik) antar pengecekan fingerprint simple_drug_interactions
+KB_CHECK_INTERVAL = float(os.getenv("KB_VERSION_CHECK_INTERVAL", "30"))
+STAMP_LENGTH = 12
+# Kolom isi simple_drug_interactions yang ikut fingerprint
+SIMPLE_COLUMNS = ("id", "drug_a", "drug_b", "severity", "description", "recommendation", "is_active")
+# Stamp obat yang tidak punya data di knowledge base
+EMPTY_STAMP = "-"
+
+
+def _file_mtime(path: str) -> Optional[float]:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class KnowledgeBaseVersion:
+    """Stamp isi knowledge base per drug ID kanonik + counter versi monotonik."""
+
+    def __init__(self, check_interval: float = KB_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.version = 0
+        self._stamps: Dict[str, str] = {}
+        # (generasi kamus, rebuild index, mtime file data, fingerprint simple table)
+        self._sources: Optional[Tuple] = None
+        self._simple_rows: List[Dict] = []
+        self._simple_fingerprint: Optional[Tuple] = None
+        self._last_simple_check = 0.0
+        self._lock = threading.Lock()
+        self.changed_at: Optional[str] = None
+        self.last_changed_drugs: List[str] = []
+        self.total_changed_drugs = 0
+
+    @property
+    def simple_rows(self) -> List[Dict]:
+        """Row aktif simple_drug_interactions terakhir yang dimuat (kosong tanpa database)."""
+        return self._simple_rows
+
+    @property
+    def simple_rows_loaded(self) -> bool:
+        """True jika simple_drug_interactions pernah berhasil dimuat dari database."""
+        return self._simple_fingerprint is not None
+
+    def ensure_fresh(self, db=None, refresh_index: bool = False) -> int:
+        """
+        Sinkronkan stamp dengan kamus obat, index interaksi, formularium dan
+        simple_drug_interactions. refresh_index=True juga me-refresh index
+        interaksi (untuk caller yang tidak memakai ensure_interaction_index).
+        Error database tidak diteruskan: stamp terakhir tetap dipakai.
+        """
+        if db is not None:
+            if refresh_index:
+                try:
+                    interaction_index.ensure_fresh(db)
+                except Exception as e:
+                    db.rollback()
+                    print(f"⚠️ Knowledge base stamp using current interaction index: {e}")
+            self._refresh_simple_rows(db)
+
+        sources = (
+            drug_canonicalizer.generation,
+            interaction_index.rebuilds,
+            _file_mtime(FORMULARY_FILE),
+            _file_mtime(DRUG_CLASSES_FILE),
+            _file_mtime(CLINICAL_RULES_FILE),
+            self._simple_fingerprint,
+        )
+        if sources != self._sources:
+            self._rebuild(sources)
+        return self.version
+
+    def _refresh_simple_rows(self, db) -> None:
+        """Muat ulang simple_drug_interactions hanya jika fingerprint tabel berubah."""
+        now = time.monotonic()
+        if now - self._last_simple_check < self.check_interval:
+            return
+        self._last_simple_check = now
+        try:
+            # Checksum isi row: UPDATE in-place (severity, rekomendasi) juga terdeteksi
+            fingerprint = table_content_fingerprint(db, "simple_drug_interactions", SIMPLE_COLUMNS)
+            if fingerprint == self._simple_fingerprint:
+                return
+            rows = db.execute(text("""
+                SELECT id, drug_a, drug_b, severity, description, recommendation
+                FROM simple_drug_interactions
+                WHERE is_active = 1
+                ORDER BY id
+            """)).fetchall()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ simple_drug_interactions not available for knowledge base stamp: {e}")
+            return
+        self._simple_rows = [dict(row._mapping) for row in rows]
+        self._simple_fingerprint = fingerprint
+
+    def _rebuild(self, sources: Tuple) -> None:
+        """Hitung ulang stamp semua obat dan naikkan versi jika ada yang berubah."""
+        content: Dict[str, List[str]] = {}
+
+        def add(drug_id: str, item: Dict, kind: str) -> None:
+            if drug_id:
+                content.setdefault(drug_id, []).append(
+                    kind + json.dumps(item, sort_keys=True, default=str, ensure_ascii=False)
+                )
+
+        for edge in interaction_index.edges:
+            row = edge.to_dict()
+            drug_a = drug_canonicalizer.canonical_id(edge.drug_a)
+            drug_b = drug_canonicalizer.canonical_id(edge.drug_b)
+            add(drug_a, row, "interaction:")
+            if drug_b != drug_a:
+                add(drug_b, row, "interaction:")
+        for row in self._simple_rows:
+            drug_a = drug_canonicalizer.canonical_id(row.get("drug_a") or "")
+            drug_b = drug_canonicalizer.canonical_id(row.get("drug_b") or "")
+            add(drug_a, row, "simple:")
+            if drug_b != drug_a:
+                add(drug_b, row, "simple:")
+        try:
+            with open(FORMULARY_FILE, "r", encoding="utf-8") as f:
+                formulary = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            formulary = []
+        for entry in formulary:
+            add(drug_canonicalizer.canonical_id(entry.get("drug_name", "")), entry, "formulary:")
+        try:
+            with open(DRUG_CLASSES_FILE, "r", encoding="utf-8") as f:
+                drug_classes = json.load(f).get("classes", [])
+        except (OSError, json.JSONDecodeError, AttributeError):
+            drug_classes = []
+        class_members: Dict[str, List[str]] = {}
+        for entry in drug_classes:
+            for member in entry.get("members", []):
+                drug_id = drug_canonicalizer.canonical_id(member)
+                add(drug_id, entry, "class:")
+                class_members.setdefault(entry.get("id"), []).append(drug_id)
+        for drug_a, drug_b, rule in allergen_index.interaction_pairs():
+            add(drug_a, rule, "class_interaction:")
+            add(drug_b, rule, "class_interaction:")
+        try:
+            with open(CLINICAL_RULES_FILE, "r", encoding="utf-8") as f:
+                clinical = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            clinical = {}
+        conditions = clinical.get("conditions", {})
+        for rule in clinical.get("rules", []):
+            # Rule beserta definisi kondisi pemicunya ikut stamp setiap obat targetnya
+            item = {"rule": rule, "conditions": {c: conditions.get(c) for c in rule.get("conditions", [])}}
+            targets = {drug_canonicalizer.canonical_id(drug) for drug in rule.get("drugs", [])}
+            for class_id in rule.get("classes", []):
+                targets.update(class_members.get(class_id, []))
+            for drug_id in targets:
+                add(drug_id, item, "rule:")
+        for alias, drug_id in drug_canonicalizer.alias_items():
+            content.setdefault(drug_id, []).append("alias:" + alias)
+
+        stamps = {
+            drug_id: hashlib.sha1("\n".join(sorted(lines)).encode("utf-8")).hexdigest()[:STAMP_LENGTH]
+            for drug_id, lines in content.items()
+        }
+
+        with self._lock:
+            changed = sorted(
+                drug_id for drug_id in stamps.keys() | self._stamps.keys()
+                if stamps.get(drug_id) != self._stamps.get(drug_id)
+            )
+            first_build = self._sources is None
+            self._stamps = stamps
+            self._sources = sources
+            if first_build or changed:
+                self.version += 1
+                self.changed_at = datetime.now().isoformat()
+            if changed and not first_build:
+                self.last_changed_drugs = changed[:50]
+                self.total_changed_drugs += len(changed)
+                print(f"🔄 Knowledge base v{self.version}: {len(changed)} drug(s) changed")
+
+    def invalidate(self) -> None:
+        """Paksa pengecekan ulang simple_drug_interactions pada refresh berikutnya."""
+        self._last_simple_check = 0.0
+
+    def stamp(self, medications: Iterable[str]) -> str:
+        """Stamp gabungan untuk cache key: stamp setiap drug ID yang terlibat (urut)."""
+        if self._sources is None:
+            self.ensure_fresh()
+        drug_ids = sorted(set(drug_canonicalizer.canonical_ids(medications)))
+        return ",".join(f"{drug_id}:{self._stamps.get(drug_id, EMPTY_STAMP)}" for drug_id in drug_ids)
+
+    def stats(self) -> Dict:
+        """Versi dan perubahan terakhir untuk monitoring."""
+        return {
+            "version": self.version,
+            "stamped_drugs": len(self._stamps),
+            "simple_interactions": len(self._simple_rows),
+            "changed_at": self.changed_at,
+            "last_changed_drugs": self.last_changed_drugs,
+            "total_changed_drugs": self.total_changed_drugs,
+        }
+
+
+# Global instance
+knowledge_base = KnowledgeBaseVersion()
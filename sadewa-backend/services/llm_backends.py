@@ -0,0 +1,267 @@
+"""
+LLM Backends untuk SADEWA
+Interface backend yang dipakai GroqService, supaya service bisa di-load-test
+tanpa memanggil Groq sungguhan:
+- groq:   Groq API asli (default)
+- fake:   server lokal OpenAI-compatible (benchmarks/fake_llm_server.py)
+- record: panggil backend asli lalu simpan completion ke file rekaman
+- replay: jawab dari file rekaman saja (offline), key = hash prompt
+Pilih lewat env LLM_BACKEND.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+from groq import AsyncGroq
+
+logger = logging.getLogger(__name__)
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq").lower()
+LLM_FAKE_URL = os.getenv("LLM_FAKE_URL", "http://127.0.0.1:8787")
+# Backend yang direkam pada mode record (groq atau fake)
+LLM_RECORD_UPSTREAM = os.getenv("LLM_RECORD_UPSTREAM", "groq").lower()
+LLM_RECORDINGS_PATH = os.getenv(
+    "LLM_RECORDINGS_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "benchmarks", "llm_recordings.jsonl"),
+)
+# Ukuran potongan teks saat replay completion sebagai stream
+REPLAY_STREAM_CHUNK = 24
+
+
+class ReplayMissError(LookupError):
+    """Prompt tidak ada di file rekaman (mode replay)."""
+
+
+class Usage:
+    __slots__ = ("prompt_tokens", "completion_tokens")
+
+    def __init__(self, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+class Message:
+    __slots__ = ("content",)
+
+    def __init__(self, content: str):
+        self.content = content
+
+
+class Choice:
+    __slots__ = ("message",)
+
+    def __init__(self, content: str):
+        self.message = Message(content)
+
+
+class Completion:
+    """Bentuk minimal response chat completion (choices[0].message.content + usage)."""
+
+    __slots__ = ("choices", "usage")
+
+    def __init__(self, content: str, usage: Optional[Usage] = None):
+        self.choices = [Choice(content)]
+        self.usage = usage
+
+
+def prompt_hash(kwargs: Dict) -> str:
+    """Key rekaman: hash dari model, messages, dan parameter sampling."""
+    material = {
+        "model": kwargs.get("model"),
+        "messages": kwargs.get("messages"),
+        "temperature": kwargs.get("temperature"),
+        "max_tokens": kwargs.get("max_tokens"),
+    }
+    encoded = json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class LLMBackend:
+    """Interface backend chat completion."""
+
+    name = "base"
+
+    async def create(self, **kwargs):
+        """Satu chat completion; return object dengan choices[0].message.content dan usage."""
+        raise NotImplementedError
+
+    async def stream(self, **kwargs) -> AsyncIterator[str]:
+        """Chat completion streaming; yield potongan teks."""
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    async def aclose(self) -> None:
+        """Tutup resource backend (dipanggil saat shutdown)."""
+
+    def stats(self) -> Dict:
+        return {"backend": self.name}
+
+
+class GroqBackend(LLMBackend):
+    """Groq API (atau server OpenAI-compatible lain lewat base_url)."""
+
+    name = "groq"
+
+    def __init__(self, http_client: httpx.AsyncClient, base_url: Optional[str] = None,
+                 api_key: Optional[str] = None):
+        # Retry SDK dimatikan: retry ditangani GroqService, di belakang circuit breaker
+        self.client = AsyncGroq(
+            api_key=api_key or os.getenv("GROQ_API_KEY"),
+            base_url=base_url,
+            http_client=http_client,
+            max_retries=0,
+        )
+        self.base_url = base_url
+
+    async def create(self, **kwargs):
+        return await self.client.chat.completions.create(**kwargs)
+
+    async def stream(self, **kwargs) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(stream=True, **kwargs)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+    def stats(self) -> Dict:
+        return {"backend": self.name, "base_url": self.base_url or "default"}
+
+
+class FakeLLMBackend(GroqBackend):
+    """Server LLM palsu lokal (OpenAI-compatible) untuk load test offline."""
+
+    name = "fake"
+
+    def __init__(self, http_client: httpx.AsyncClient, base_url: str = LLM_FAKE_URL):
+        super().__init__(http_client, base_url=base_url, api_key="fake-key")
+
+
+class RecordReplayBackend(LLMBackend):
+    """
+    mode="record": teruskan ke backend asli dan simpan content ke file JSONL.
+    mode="replay": hanya jawab dari rekaman; prompt yang tidak ada -> ReplayMissError.
+    """
+
+    def __init__(self, mode: str, path: str = LLM_RECORDINGS_PATH,
+                 inner: Optional[LLMBackend] = None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown record/replay mode: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("record mode needs an inner backend")
+        self.name = mode
+        self.mode = mode
+        self.path = path
+        self.inner = inner
+        self._lock = threading.Lock()
+        self._recordings: Dict[str, Dict] = self._load(path)
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    @staticmethod
+    def _load(path: str) -> Dict[str, Dict]:
+        recordings: Dict[str, Dict] = {}
+        if not os.path.exists(path):
+            return recordings
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                recordings[entry["key"]] = entry
+        logger.info(f"Loaded {len(recordings)} LLM recordings from {path}")
+        return recordings
+
+    def _append(self, key: str, kwargs: Dict, content: str, usage: Optional[Usage]) -> None:
+        entry = {
+            "key": key,
+            "model": kwargs.get("model"),
+            "content": content,
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+        }
+        with self._lock:
+            self._recordings[key] = entry
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.recorded += 1
+
+    def _lookup(self, key: str) -> Optional[Dict]:
+        entry = self._recordings.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    async def create(self, **kwargs):
+        key = prompt_hash(kwargs)
+        entry = self._lookup(key)
+        if entry is not None:
+            return Completion(entry["content"], Usage(entry.get("prompt_tokens"),
+                                                      entry.get("completion_tokens")))
+        if self.mode == "replay":
+            raise ReplayMissError(f"No recorded completion for prompt {key[:12]}")
+
+        response = await self.inner.create(**kwargs)
+        content = response.choices[0].message.content
+        await asyncio.to_thread(self._append, key, kwargs, content, getattr(response, "usage", None))
+        return response
+
+    async def stream(self, **kwargs) -> AsyncIterator[str]:
+        key = prompt_hash(kwargs)
+        entry = self._lookup(key)
+        if entry is not None:
+            content = entry["content"]
+            for start in range(0, len(content), REPLAY_STREAM_CHUNK):
+                yield content[start:start + REPLAY_STREAM_CHUNK]
+            return
+        if self.mode == "replay":
+            raise ReplayMissError(f"No recorded completion for prompt {key[:12]}")
+
+        parts: List[str] = []
+        async for delta in self.inner.stream(**kwargs):
+            parts.append(delta)
+            yield delta
+        await asyncio.to_thread(self._append, key, kwargs, "".join(parts), None)
+
+    async def aclose(self) -> None:
+        if self.inner is not None:
+            await self.inner.aclose()
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.name,
+            "recordings_path": os.path.abspath(self.path),
+            "recordings": len(self._recordings),
+            "hits": self.hits,
+            "misses": self.misses,
+            "recorded": self.recorded,
+        }
+
+
+def create_backend(http_client: httpx.AsyncClient, kind: str = LLM_BACKEND) -> LLMBackend:
+    """Buat backend sesuai LLM_BACKEND (groq / fake / record / replay)."""
+    if kind == "groq":
+        return GroqBackend(http_client)
+    if kind == "fake":
+        return FakeLLMBackend(http_client)
+    if kind == "record":
+        if LLM_RECORD_UPSTREAM not in ("groq", "fake"):
+            raise ValueError(f"Unknown LLM_RECORD_UPSTREAM: {LLM_RECORD_UPSTREAM}")
+        return RecordReplayBackend("record", inner=create_backend(http_client, LLM_RECORD_UPSTREAM))
+    if kind == "replay":
+        return RecordReplayBackend("replay")
+    raise ValueError(f"Unknown LLM_BACKEND: {kind}")
@@ -0,0 +1,254 @@
+"""
+Patient Context Loader untuk SADEWA
+Memuat konteks klinis SATU pasien (obat aktif, diagnosis, alergi) dalam satu
+round trip, dengan cache per-pasien opsional yang di-invalidasi saat data berubah.
+load_many() memuat banyak pasien sekaligus (endpoint batch) dalam satu query.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import bindparam, text
+
+# TTL cache konteks pasien (detik); 0 = cache nonaktif
+PATIENT_CONTEXT_CACHE_TTL = float(os.getenv("PATIENT_CONTEXT_CACHE_TTL", "300"))
+PATIENT_CONTEXT_CACHE_SIZE = int(os.getenv("PATIENT_CONTEXT_CACHE_SIZE", "1024"))
+
+# Pasien dicari berdasarkan no_rm, atau id lama (backward compatibility);
+# match no_rm diprioritaskan. Subquery ini dipakai ulang di setiap cabang UNION.
+_TARGET = """
+    (SELECT no_rm FROM patients
+     WHERE no_rm = :patient_key OR id = :patient_id
+     ORDER BY CASE WHEN no_rm = :patient_key THEN 0 ELSE 1 END
+     LIMIT 1)
+"""
+
+# Versi batch: semua pasien yang no_rm ATAU id-nya ada di daftar
+_BATCH_TARGET = """
+    (SELECT no_rm FROM patients
+     WHERE no_rm IN :patient_keys OR id IN :patient_ids)
+"""
+
+
+def _context_query_sql(target: str) -> str:
+    return f"""
+    SELECT 0 AS section, 'patient' AS kind, p.no_rm, p.id, p.name, p.age, p.gender, p.weight_kg,
+           NULL AS value, NULL AS detail
+    FROM patients p JOIN {target} t ON t.no_rm = p.no_rm
+    UNION ALL
+    SELECT 1, 'medication', m.no_rm, m.id, NULL, NULL, NULL, NULL,
+           m.medication_name, m.dosage
+    FROM patient_medications m JOIN {target} t ON t.no_rm = m.no_rm
+    WHERE m.is_active = 1
+    UNION ALL
+    SELECT 2, 'diagnosis', d.no_rm, d.id, NULL, NULL, NULL, NULL,
+           d.diagnosis_text, d.icd_code
+    FROM patient_diagnoses d JOIN {target} t ON t.no_rm = d.no_rm
+    UNION ALL
+    SELECT 3, 'allergy', a.no_rm, a.id, NULL, NULL, NULL, NULL,
+           a.allergen, a.severity
+    FROM patient_allergies a JOIN {target} t ON t.no_rm = a.no_rm
+    ORDER BY section, id
+"""
+
+
+PATIENT_CONTEXT_QUERY = text(_context_query_sql(_TARGET))
+
+PATIENT_CONTEXT_BATCH_QUERY = text(_context_query_sql(_BATCH_TARGET)).bindparams(
+    bindparam("patient_keys", expanding=True),
+    bindparam("patient_ids", expanding=True),
+)
+
+
+class PatientContextLoader:
+    """Loader konteks pasien tunggal dengan cache LRU + TTL per pasien."""
+
+    def __init__(self, cache_ttl: float = PATIENT_CONTEXT_CACHE_TTL,
+                 max_entries: int = PATIENT_CONTEXT_CACHE_SIZE):
+        self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._keys_by_no_rm: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._invalidations = 0
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, db, patient_key: str, use_cache: bool = True) -> Optional[Dict]:
+        """
+        Konteks pasien dengan format yang sama seperti data patients.json
+        (id, no_rm, name, age, gender, weight_kg, current_medications,
+        diagnoses_text, diagnoses_icd10, allergies). None jika pasien tidak ditemukan.
+        Error database diteruskan ke caller.
+        """
+        patient_key = str(patient_key).strip()
+        if use_cache and self.cache_ttl > 0:
+            cached = self._get_cached(patient_key)
+            if cached is not None:
+                return cached
+
+        invalidations = self._invalidations
+        context = self._query(db, patient_key)
+        if context is not None and use_cache and self.cache_ttl > 0:
+            self._store(patient_key, context, invalidations)
+        return context
+
+    @staticmethod
+    def _query(db, patient_key: str) -> Optional[Dict]:
+        """Satu query UNION ALL untuk pasien + obat aktif + diagnosis + alergi."""
+        rows = db.execute(PATIENT_CONTEXT_QUERY, {
+            "patient_key": patient_key,
+            "patient_id": int(patient_key) if patient_key.isdigit() else None,
+        }).fetchall()
+
+        contexts = _contexts_from_rows(rows)
+        return next(iter(contexts.values()), None)
+
+    def load_many(self, db, patient_keys: Iterable[str], use_cache: bool = True) -> Dict[str, Dict]:
+        """
+        Konteks banyak pasien: cache dulu, sisanya dalam SATU query UNION ALL.
+        Return dict patient_key -> konteks (pasien yang tidak ditemukan tidak ada di dict).
+        """
+        keys = list(dict.fromkeys(str(key).strip() for key in patient_keys))
+        found: Dict[str, Dict] = {}
+        missing: List[str] = []
+        for key in keys:
+            cached = self._get_cached(key) if use_cache and self.cache_ttl > 0 else None
+            if cached is not None:
+                found[key] = cached
+            else:
+                missing.append(key)
+        if not missing:
+            return found
+
+        invalidations = self._invalidations
+        rows = db.execute(PATIENT_CONTEXT_BATCH_QUERY, {
+            "patient_keys": missing,
+            "patient_ids": [int(key) for key in missing if key.isdigit()],
+        }).fetchall()
+        contexts = _contexts_from_rows(rows)
+        by_id = {str(context["id"]): context for context in contexts.values()}
+
+        for key in missing:
+            # Sama seperti load(): match no_rm diprioritaskan atas id lama
+            context = contexts.get(key) or by_id.get(key)
+            if context is None:
+                continue
+            found[key] = _copy_context(context)
+            if use_cache and self.cache_ttl > 0:
+                self._store(key, context, invalidations)
+        return found
+
+    # ----- cache -----
+
+    def _get_cached(self, patient_key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._cache.get(patient_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, context = entry
+            if time.monotonic() - stored_at > self.cache_ttl:
+                self._drop(patient_key)
+                self.misses += 1
+                return None
+            self._cache.move_to_end(patient_key)
+            self.hits += 1
+            return _copy_context(context)
+
+    def _store(self, patient_key: str, context: Dict, invalidations: int) -> None:
+        with self._lock:
+            # Ada invalidasi selama query berjalan: hasil mungkin sudah basi
+            if invalidations != self._invalidations:
+                return
+            self._cache[patient_key] = (time.monotonic(), _copy_context(context))
+            self._cache.move_to_end(patient_key)
+            self._keys_by_no_rm.setdefault(context["no_rm"], set()).add(patient_key)
+            while len(self._cache) > self.max_entries:
+                oldest = next(iter(self._cache))
+                self._drop(oldest)
+
+    def _drop(self, patient_key: str) -> None:
+        """Hapus satu entry cache (lock harus sudah dipegang)."""
+        entry = self._cache.pop(patient_key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_no_rm.get(entry[1]["no_rm"])
+        if keys is not None:
+            keys.discard(patient_key)
+            if not keys:
+                del self._keys_by_no_rm[entry[1]["no_rm"]]
+
+    def invalidate(self, no_rm: str) -> None:
+        """Invalidasi cache pasien setelah obat/diagnosis/alergi/profil berubah."""
+        with self._lock:
+            self._invalidations += 1
+            for patient_key in list(self._keys_by_no_rm.get(no_rm, ())):
+                self._drop(patient_key)
+
+    def clear(self) -> None:
+        """Kosongkan seluruh cache."""
+        with self._lock:
+            self._invalidations += 1
+            self._cache.clear()
+            self._keys_by_no_rm.clear()
+
+    def stats(self) -> Dict:
+        """Statistik cache untuk monitoring."""
+        return {
+            "cache_enabled": self.cache_ttl > 0,
+            "cache_ttl_seconds": self.cache_ttl,
+            "cached_patients": len(self._cache),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _contexts_from_rows(rows) -> Dict[str, Dict]:
+    """Rakit konteks per no_rm dari row hasil PATIENT_CONTEXT_(BATCH_)QUERY."""
+    contexts: Dict[str, Dict] = {}
+    sections: Dict[str, Dict[str, List]] = {}
+    for row in rows:
+        if row.kind == "patient":
+            contexts[row.no_rm] = {
+                "id": row.id,
+                "no_rm": row.no_rm,
+                "name": row.name,
+                "age": row.age,
+                "gender": getattr(row.gender, "value", row.gender),
+                "weight_kg": row.weight_kg,
+            }
+            continue
+        lists = sections.setdefault(row.no_rm, {
+            "current_medications": [], "diagnoses_text": [], "diagnoses_icd10": [], "allergies": [],
+        })
+        if row.kind == "medication":
+            lists["current_medications"].append(f"{row.value} {row.detail or ''}".strip())
+        elif row.kind == "diagnosis":
+            if row.value:
+                lists["diagnoses_text"].append(row.value)
+            if row.detail:
+                lists["diagnoses_icd10"].append(row.detail)
+        elif row.kind == "allergy":
+            lists["allergies"].append(row.value)
+
+    for no_rm, context in contexts.items():
+        context.update(sections.get(no_rm) or {
+            "current_medications": [], "diagnoses_text": [], "diagnoses_icd10": [], "allergies": [],
+        })
+    return contexts
+
+
+def _copy_context(context: Dict) -> Dict:
+    """Copy dangkal + list, supaya caller tidak mengubah isi cache."""
+    copied = dict(context)
+    for field in ("current_medications", "diagnoses_text", "diagnoses_icd10", "allergies"):
+        copied[field] = list(context[field])
+    return copied
+
+
+# Global instance
+patient_context_loader = PatientContextLoader()
@@ -0,0 +1,131 @@
+"""
+Precompute Queue untuk SADEWA
+Setelah obat pasien disimpan, daftar obat aktifnya berubah dan cek interaksi
+berikutnya mulai dingin. Queue ini menjalankan analisis (rule engine, opsional
+LLM) untuk obat yang baru ditulis di background, sehingga cek berikutnya oleh
+klinisi menjadi cache hit.
+
+- Coalescing per pasien: beberapa penulisan berdekatan digabung jadi satu job.
+- Debounce singkat supaya transaksi penulisan sudah commit sebelum dianalisis.
+- Antrean dibatasi; job baru ditolak (bukan memblok request) jika penuh.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTE_ENABLED = os.getenv("PRECOMPUTE_ENABLED", "true").lower() != "false"
+# LLM ikut di-precompute untuk resep yang tidak diputuskan rule engine (memakai kuota Groq)
+PRECOMPUTE_LLM = os.getenv("PRECOMPUTE_LLM", "false").lower() == "true"
+PRECOMPUTE_LLM_TIMEOUT = float(os.getenv("PRECOMPUTE_LLM_TIMEOUT", "10"))
+PRECOMPUTE_DEBOUNCE_SECONDS = float(os.getenv("PRECOMPUTE_DEBOUNCE_SECONDS", "0.5"))
+PRECOMPUTE_MAX_PENDING = int(os.getenv("PRECOMPUTE_MAX_PENDING", "1000"))
+
+# handler(no_rm, medications) -> outcome ("rules", "llm", "deferred", "cached", ...)
+PrecomputeHandler = Callable[[str, List[str]], Awaitable[str]]
+
+
+class PrecomputeQueue:
+    """Antrean precompute analisis interaksi per pasien (satu worker background)."""
+
+    def __init__(self, enabled: bool = PRECOMPUTE_ENABLED,
+                 debounce: float = PRECOMPUTE_DEBOUNCE_SECONDS,
+                 max_pending: int = PRECOMPUTE_MAX_PENDING):
+        self.enabled = enabled
+        self.debounce = debounce
+        self.max_pending = max_pending
+        # no_rm -> obat yang ditulis (urutan dipertahankan, tanpa duplikat)
+        self._pending: Dict[str, List[str]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._handler: Optional[PrecomputeHandler] = None
+        self.scheduled = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self.outcomes: Dict[str, int] = {}
+        self.last_duration_ms: Optional[float] = None
+
+    def schedule(self, no_rm: str, medications: List[str]) -> bool:
+        """Jadwalkan precompute untuk pasien; aman dipanggil dari request handler."""
+        if not self.enabled or self._handler is None or not medications:
+            return False
+        pending = self._pending.get(no_rm)
+        if pending is not None:
+            pending.extend(med for med in medications if med not in pending)
+            self.coalesced += 1
+            return True
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._pending[no_rm] = list(dict.fromkeys(medications))
+        self.scheduled += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def start(self, handler: PrecomputeHandler) -> None:
+        """Mulai worker background (dipanggil saat startup)."""
+        self._handler = handler
+        if not self.enabled or (self._worker is not None and not self._worker.done()):
+            return
+        self._wakeup = asyncio.Event()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Hentikan worker; job yang belum jalan dibuang (dipanggil saat shutdown)."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._wakeup = None
+        self._pending.clear()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Beri waktu penulisan berikutnya digabung dan transaksi selesai commit
+            await asyncio.sleep(self.debounce)
+            while self._pending:
+                no_rm = next(iter(self._pending))
+                medications = self._pending.pop(no_rm)
+                await self._execute(no_rm, medications)
+
+    async def _execute(self, no_rm: str, medications: List[str]) -> None:
+        started = time.perf_counter()
+        try:
+            outcome = await self._handler(no_rm, medications)
+            self.completed += 1
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Precompute failed for {no_rm}: {e}")
+        self.last_duration_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def stats(self) -> Dict:
+        """Statistik precompute untuk monitoring."""
+        return {
+            "enabled": self.enabled,
+            "llm_enabled": PRECOMPUTE_LLM,
+            "worker_running": self._worker is not None and not self._worker.done(),
+            "pending": len(self._pending),
+            "scheduled": self.scheduled,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "completed": self.completed,
+            "failed": self.failed,
+            "outcomes": dict(self.outcomes),
+            "last_duration_ms": self.last_duration_ms,
+        }
+
+
+# Global instance
+precompute_queue = PrecomputeQueue()
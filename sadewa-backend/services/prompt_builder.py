@@ -0,0 +1,302 @@
+"""
+Prompt builder untuk SADEWA
+Prompt klinis = prefix statis berversi (instruksi + schema JSON, identik byte
+per byte di setiap request sehingga bisa di-cache provider) + bagian variabel
+kecil berisi data pasien. Bagian variabel disusun ringkas: interaksi dalam
+format tabel (bukan JSON indent=2), budget token keras per section dengan
+pemotongan berdasarkan severity, dan estimasi token lokal untuk metrik per request.
+"""
+import hashlib
+import math
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Budget token per section (estimasi lokal, bukan tokenizer resmi model)
+SECTION_BUDGETS = {
+    "patient": int(os.getenv("PROMPT_BUDGET_PATIENT", "200")),
+    "current_medications": int(os.getenv("PROMPT_BUDGET_CURRENT_MEDICATIONS", "250")),
+    "new_medications": int(os.getenv("PROMPT_BUDGET_NEW_MEDICATIONS", "150")),
+    "notes": int(os.getenv("PROMPT_BUDGET_NOTES", "250")),
+    "interactions": int(os.getenv("PROMPT_BUDGET_INTERACTIONS", "800")),
+}
+
+SEVERITY_ORDER = {"major": 0, "moderate": 1, "minor": 2}
+INTERACTION_HEADER = "drug_a|drug_b|severity|description"
+TRUNCATION_MARK = "…[truncated]"
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+# Naikkan versi setiap kali CLINICAL_SYSTEM_PROMPT berubah (ikut masuk key prompt cache)
+CLINICAL_PROMPT_VERSION = "3"
+
+# Prefix statis: JANGAN interpolasi nilai per request (timestamp, ID pasien) di sini.
+# analysis_timestamp dan patient_id di-stamp server setelah response diterima.
+CLINICAL_SYSTEM_PROMPT = """You are SADEWA, a clinical pharmacist AI assistant specializing in drug interaction analysis for Indonesian healthcare settings. Always respond with valid JSON only.
+
+The user message contains PATIENT PROFILE, CURRENT MEDICATIONS, NEW MEDICATIONS TO PRESCRIBE, CLINICAL NOTES and DRUG INTERACTIONS DATABASE sections.
+
+CLINICAL DECISION SUPPORT ANALYSIS REQUIRED:
+Analyze the following aspects in order of priority:
+
+1. **MAJOR DRUG-DRUG INTERACTIONS** (Life-threatening)
+2. **MODERATE DRUG-DRUG INTERACTIONS** (Clinically significant)
+3. **DRUG-DISEASE CONTRAINDICATIONS** (Based on patient diagnoses; formulary ICD-10 contraindications are added by the server, focus on clinical judgement beyond them)
+4. **ALLERGY CONSIDERATIONS** (Cross-reactivity risks)
+5. **AGE-RELATED CONCERNS** (Geriatric/pediatric considerations)
+6. **DOSING RECOMMENDATIONS** (Based on patient profile)
+
+IMPORTANT: The drug interactions database has one row per interaction, columns drug_a|drug_b|severity|description, where:
+- "drug_a" and "drug_b" are the interacting medications
+- "severity" can be "Major", "Moderate", or "Minor"
+- "description" contains the clinical consequence in Indonesian
+
+RESPONSE FORMAT REQUIRED - Return ONLY valid JSON:
+{
+    "overall_risk_level": "MAJOR|MODERATE|MINOR|LOW",
+    "safe_to_prescribe": true|false,
+    "warnings": [
+        {
+            "severity": "MAJOR|MODERATE|MINOR",
+            "type": "DRUG_INTERACTION|CONTRAINDICATION|ALLERGY|AGE_RELATED|DOSING",
+            "drugs_involved": ["Drug A", "Drug B"],
+            "description": "Clear explanation of the interaction/concern",
+            "clinical_significance": "What could happen to the patient",
+            "recommendation": "Specific action to take",
+            "monitoring_required": "What to monitor if prescribed anyway"
+        }
+    ],
+    "contraindications": [
+        {
+            "drug": "Drug name",
+            "diagnosis": "Relevant diagnosis",
+            "reason": "Why contraindicated",
+            "alternative_suggested": "Alternative medication if available"
+        }
+    ],
+    "dosing_adjustments": [
+        {
+            "drug": "Drug name",
+            "standard_dose": "Normal dosing",
+            "recommended_dose": "Adjusted dose for this patient",
+            "reason": "Why adjustment needed"
+        }
+    ],
+    "monitoring_plan": [
+        "Parameter 1 to monitor",
+        "Parameter 2 to monitor"
+    ],
+    "llm_reasoning": "Detailed clinical reasoning for the analysis",
+    "confidence_score": 0.85
+}
+
+IMPORTANT GUIDELINES:
+- Prioritize patient safety above all
+- Be specific about drug names and interactions
+- Provide actionable clinical recommendations
+- Consider Indonesian healthcare context
+- Flag any life-threatening combinations immediately
+- Include monitoring recommendations for continuing existing medications
+- Response must be valid JSON only, no additional text
+"""
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Estimasi jumlah token BPE secara lokal: potongan kata ~4 karakter per token,
+    setiap tanda baca 1 token. Cukup akurat untuk budgeting tanpa tokenizer model.
+    """
+    total = 0
+    for piece in _TOKEN_PATTERN.findall(text or ""):
+        if piece[0].isalnum() or piece[0] == "_":
+            total += math.ceil(len(piece) / 4)
+        else:
+            total += 1
+    return total
+
+
+def prompt_cache_key(model: str, variable_prompt: str) -> str:
+    """Key prompt cache: versi prefix + model + hash bagian variabel saja."""
+    digest = hashlib.sha256(variable_prompt.encode("utf-8")).hexdigest()
+    return f"{CLINICAL_PROMPT_VERSION}:{model}:{digest}"
+
+
+def _fit_lines(lines: List[str], budget: int) -> Tuple[List[str], int]:
+    """Ambil baris dari depan selama total token <= budget; return (baris, jumlah dibuang)."""
+    kept: List[str] = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1  # +1 untuk newline
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return kept, len(lines) - len(kept)
+
+
+def _fit_text(text: str, budget: int) -> Tuple[str, bool]:
+    """Potong teks bebas per kata agar muat dalam budget; return (teks, terpotong)."""
+    if estimate_tokens(text) <= budget:
+        return text, False
+    kept: List[str] = []
+    used = estimate_tokens(TRUNCATION_MARK)
+    for word in text.split():
+        cost = estimate_tokens(word)
+        if used + cost > budget:
+            break
+        kept.append(word)
+        used += cost
+    return " ".join(kept) + " " + TRUNCATION_MARK, True
+
+
+def _cell(value) -> str:
+    """Nilai satu sel tabel (tanpa pemisah kolom/baris)."""
+    return " ".join(str(value or "-").replace("|", "/").split())
+
+
+def format_interaction_table(interactions: List[Dict], budget: int) -> Tuple[str, int, int]:
+    """
+    Encode interaksi sebagai tabel pipe-separated, diurutkan Major > Moderate > Minor.
+    Baris yang tidak muat budget dibuang dari severity terendah.
+    Return (teks, jumlah baris masuk, jumlah baris dibuang).
+    """
+    if not interactions:
+        return "No direct interactions found in database", 0, 0
+
+    ranked = sorted(
+        interactions,
+        key=lambda row: SEVERITY_ORDER.get(str(row.get("severity", "")).lower(), len(SEVERITY_ORDER)),
+    )
+    # Baris identik (entri duplikat di database) cukup dikirim sekali
+    rows = list(dict.fromkeys(
+        "|".join(_cell(row.get(column)) for column in ("drug_a", "drug_b", "severity", "description"))
+        for row in ranked
+    ))
+    header_cost = estimate_tokens(INTERACTION_HEADER) + 1
+    kept, omitted = _fit_lines(rows, max(budget - header_cost, 0))
+    lines = [INTERACTION_HEADER] + kept
+    if omitted:
+        lines.append(f"({omitted} lower-severity interactions omitted)")
+    return "\n".join(lines), len(kept), omitted
+
+
+def format_medication_list(medications: List[str], budget: int) -> Tuple[str, int]:
+    """Daftar obat bernomor dalam budget; return (teks, jumlah dibuang)."""
+    if not medications:
+        return "None currently prescribed", 0
+    lines = [f"  {i}. {_cell(med)}" for i, med in enumerate(medications, 1)]
+    kept, omitted = _fit_lines(lines, budget)
+    if omitted:
+        kept.append(f"  (+{omitted} more)")
+    return "\n".join(kept), omitted
+
+
+class PromptBuilder:
+    """Bangun bagian data pasien dari prompt klinis dengan budget token per section."""
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None):
+        self.budgets = dict(SECTION_BUDGETS, **(budgets or {}))
+        self.prompts_built = 0
+        self.total_tokens = 0
+        self.max_tokens = 0
+        self.truncated_prompts = 0
+        self.interactions_omitted = 0
+        self.last_actual_tokens: Optional[int] = None
+        self.prefix_tokens = estimate_tokens(CLINICAL_SYSTEM_PROMPT)
+
+    def build(self, patient_data: Dict, new_medications: List[str],
+              relevant_interactions: List[Dict], notes: str = "") -> Tuple[str, Dict]:
+        """
+        Susun section PATIENT PROFILE s/d DRUG INTERACTIONS.
+        Return (teks, metrics) dengan estimasi token per section.
+        """
+        truncated: List[str] = []
+
+        patient_text, patient_cut = self._patient_section(patient_data)
+        current_text, current_omitted = format_medication_list(
+            patient_data.get('current_medications', []), self.budgets["current_medications"]
+        )
+        new_text, new_omitted = format_medication_list(new_medications, self.budgets["new_medications"])
+        notes_text, notes_cut = _fit_text(notes or 'No additional notes provided', self.budgets["notes"])
+        interactions_text, included, omitted = format_interaction_table(
+            relevant_interactions, self.budgets["interactions"]
+        )
+        for name, was_cut in (("patient", patient_cut), ("current_medications", current_omitted),
+                              ("new_medications", new_omitted), ("notes", notes_cut),
+                              ("interactions", omitted)):
+            if was_cut:
+                truncated.append(name)
+
+        sections = {
+            "patient": patient_text,
+            "current_medications": current_text,
+            "new_medications": new_text,
+            "notes": notes_text,
+            "interactions": interactions_text,
+        }
+        text = (
+            f"PATIENT PROFILE:\n{patient_text}\n\n"
+            f"CURRENT MEDICATIONS:\n{current_text}\n\n"
+            f"NEW MEDICATIONS TO PRESCRIBE:\n{new_text}\n\n"
+            f"CLINICAL NOTES:\n{notes_text}\n\n"
+            f"DRUG INTERACTIONS DATABASE (Indonesian format, pipe-separated):\n{interactions_text}"
+        )
+        metrics = {
+            "prompt_tokens_estimate": estimate_tokens(text),
+            "section_tokens": {name: estimate_tokens(value) for name, value in sections.items()},
+            "interactions_included": included,
+            "interactions_omitted": omitted,
+            "truncated_sections": truncated,
+        }
+        return text, metrics
+
+    def _patient_section(self, patient_data: Dict) -> Tuple[str, bool]:
+        """Profil pasien; daftar diagnosis/alergi dipotong jika melebihi budget."""
+        fixed = (
+            f"- Age: {patient_data.get('age', 'Unknown')} years old\n"
+            f"- Gender: {patient_data.get('gender', 'Unknown')}\n"
+            f"- Weight: {patient_data.get('weight_kg', 'Unknown')} kg"
+        )
+        remaining = max(self.budgets["patient"] - estimate_tokens(fixed), 0)
+        diagnoses = patient_data.get('diagnoses_text') or []
+        allergies = patient_data.get('allergies') or ['None known']
+        diagnoses_text, diagnoses_cut = _fit_text(
+            ', '.join(diagnoses) if diagnoses else 'None listed', remaining * 2 // 3
+        )
+        allergies_text, allergies_cut = _fit_text(', '.join(allergies), remaining // 3)
+        return (
+            f"{fixed}\n- Current Diagnoses: {diagnoses_text}\n- Known Allergies: {allergies_text}",
+            diagnoses_cut or allergies_cut,
+        )
+
+    def record(self, metrics: Dict, prompt: str) -> Dict:
+        """Catat metrik satu request; prompt_tokens_estimate = prefix statis + bagian variabel."""
+        metrics["prompt_version"] = CLINICAL_PROMPT_VERSION
+        metrics["prefix_tokens_estimate"] = self.prefix_tokens
+        metrics["variable_tokens_estimate"] = estimate_tokens(prompt)
+        metrics["prompt_tokens_estimate"] = self.prefix_tokens + metrics["variable_tokens_estimate"]
+        self.prompts_built += 1
+        self.total_tokens += metrics["prompt_tokens_estimate"]
+        self.max_tokens = max(self.max_tokens, metrics["prompt_tokens_estimate"])
+        self.interactions_omitted += metrics["interactions_omitted"]
+        if metrics["truncated_sections"]:
+            self.truncated_prompts += 1
+        return metrics
+
+    def stats(self) -> Dict:
+        """Statistik ukuran prompt untuk monitoring."""
+        return {
+            "prompt_version": CLINICAL_PROMPT_VERSION,
+            "prefix_tokens": self.prefix_tokens,
+            "prompts_built": self.prompts_built,
+            "avg_prompt_tokens": round(self.total_tokens / max(self.prompts_built, 1), 1),
+            "max_prompt_tokens": self.max_tokens,
+            "truncated_prompts": self.truncated_prompts,
+            "interactions_omitted": self.interactions_omitted,
+            "last_actual_prompt_tokens": self.last_actual_tokens,
+            "budgets": self.budgets,
+        }
+
+
+# Global instance
+prompt_builder = PromptBuilder()
@@ -0,0 +1,210 @@
+"""
+Deterministic Rule Engine untuk SADEWA
+Tahap sebelum LLM: memutuskan resep yang jelas aman atau jelas MAJOR hanya dari
+knowledge base lokal (drug_interactions, rule interaksi kelas obat di
+drug_classes.json, kontraindikasi drug_formularium.json, alergi langsung,
+aturan geriatri/ginjal). Kasus lain dikembalikan ke LLM.
+"""
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from services.allergen_index import allergen_index
+from services.clinical_rules import clinical_rules
+from services.drug_canonicalizer import drug_canonicalizer
+from services.icd_contraindications import contraindication_engine
+from services.interaction_matrix import interaction_matrix
+from services.knowledge_base import knowledge_base
+from services.term_scanner import term_scanner
+
+RULE_ENGINE_ENABLED = os.getenv("RULE_ENGINE_ENABLED", "true").lower() != "false"
+
+
+class RuleEngine:
+    """Putuskan resep trivially safe / trivially MAJOR tanpa LLM."""
+
+    def __init__(self, enabled: bool = RULE_ENGINE_ENABLED):
+        self.enabled = enabled
+        self.evaluated = 0
+        self.decided_safe = 0
+        self.decided_major = 0
+        self.deferred = 0
+        self.defer_reasons: Dict[str, int] = {}
+
+    def evaluate(self, patient_data: Dict, new_medications: List[str],
+                 drug_interactions_db: List[Dict]) -> Optional[Dict]:
+        """
+        Hasil analisis lengkap (format InteractionResponse) jika keputusan pasti,
+        atau None jika kasusnya ambigu dan perlu LLM.
+        """
+        if not self.enabled or not new_medications:
+            return None
+        self.evaluated += 1
+        uncertain: List[str] = []
+
+        new_hits = term_scanner.scan_all(new_medications)
+        new_ids: Set[str] = set()
+        for hits in new_hits:
+            if not hits.drug_ids:
+                # Tidak cocok dengan kamus obat (drug_id hanya ID fallback)
+                uncertain.append("unknown_drug")
+            else:
+                new_ids.add(hits.drug_id)
+        all_ids = set(new_ids)
+        current_medications = [med for med in patient_data.get('current_medications') or [] if str(med).strip()]
+        for hits in term_scanner.scan_all(current_medications):
+            if not hits.drug_ids:
+                # Obat yang sedang dipakai tidak dikenal: interaksinya tidak bisa dipastikan
+                uncertain.append("unknown_drug")
+            all_ids.update(hits.drug_ids)
+
+        # 1. Interaksi knowledge base (drug_interactions, simple_drug_interactions, rule
+        #    kelas obat) antara obat baru dan obat lain yang dipakai, dari matriks pasangan
+        if interaction_matrix.enabled:
+            if not knowledge_base.simple_rows_loaded:
+                # Tanpa simple_drug_interactions (database tidak tersedia) cek interaksi tidak lengkap
+                uncertain.append("interaction_source_unavailable")
+            interactions = interaction_matrix.interactions_touching(new_ids, all_ids)
+        else:
+            # Tanpa matriks hanya row drug_interactions dari adjacency index (sudah terbatas
+            # pada obat resep) yang bisa dicek; simple table dan rule kelas tidak
+            uncertain.append("interaction_source_unavailable")
+            interactions = [
+                row for row in drug_interactions_db
+                if self._touches(new_ids, all_ids,
+                                 drug_canonicalizer.canonical_id(row.get("drug_a") or ""),
+                                 drug_canonicalizer.canonical_id(row.get("drug_b") or ""))
+            ]
+        major_interactions = [
+            row for row in interactions if str(row.get("severity", "")).upper() == "MAJOR"
+        ]
+        if len(major_interactions) < len(interactions):
+            uncertain.append("non_major_interaction")
+
+        # 2. Alergi terhadap obat baru (langsung, satu kelas, atau reaksi silang antar kelas)
+        allergies = patient_data.get('allergies') or []
+        if allergen_index.profile(allergies).unresolved:
+            # Alergen yang tidak dikenal ontologi: cross-reactivity tidak bisa dipastikan
+            uncertain.append("unresolved_allergen")
+        allergy_hits = []
+        for hit in allergen_index.screen(new_medications, allergies):
+            if hit.level == "direct":
+                allergy_hits.append(hit)
+            else:
+                uncertain.append("allergy_cross_reactivity")
+
+        # 3. Kontraindikasi penyakit dari formularium (kategori & rentang kode ICD-10)
+        icd_codes = patient_data.get('diagnoses_icd10') or []
+        if len(icd_codes) < len(patient_data.get('diagnoses_text') or []):
+            # Ada diagnosis tanpa kode ICD: kontraindikasi tidak bisa dicek lengkap
+            uncertain.append("diagnoses_without_icd")
+        known_meds = []
+        for med, hits in zip(new_medications, new_hits):
+            if not hits.drug_ids:
+                continue
+            if not contraindication_engine.has_drug(hits.drug_id):
+                uncertain.append("not_in_formulary")
+                continue
+            known_meds.append(med)
+        contraindication_hits = contraindication_engine.check(known_meds, icd_codes)
+
+        # 4. Aturan geriatri / ginjal / kondisi (detailnya ditambahkan oleh _enhance_analysis_result)
+        for firing in clinical_rules.evaluate(patient_data, new_medications, record=False):
+            uncertain.append(f"{firing.rule.category}_rule")
+
+        if major_interactions or allergy_hits or contraindication_hits:
+            self.decided_major += 1
+            return self._major_result(
+                patient_data, interactions, allergy_hits, contraindication_hits
+            )
+        if not uncertain:
+            self.decided_safe += 1
+            return self._safe_result(patient_data, new_medications)
+
+        self.deferred += 1
+        for reason in set(uncertain):
+            self.defer_reasons[reason] = self.defer_reasons.get(reason, 0) + 1
+        return None
+
+    @staticmethod
+    def _touches(new_ids: Set[str], all_ids: Set[str], drug_a: str, drug_b: str) -> bool:
+        return (drug_a in new_ids and drug_b in all_ids) or (drug_b in new_ids and drug_a in all_ids)
+
+    @staticmethod
+    def _base_result(patient_data: Dict) -> Dict:
+        return {
+            "analysis_timestamp": datetime.now().isoformat(),
+            "patient_id": str(patient_data.get('id', 'Unknown')),
+            "warnings": [],
+            "contraindications": [],
+            "dosing_adjustments": [],
+            "monitoring_plan": [],
+            "analysis_path": "rules",
+        }
+
+    def _safe_result(self, patient_data: Dict, new_medications: List[str]) -> Dict:
+        result = self._base_result(patient_data)
+        result.update({
+            "overall_risk_level": "LOW",
+            "safe_to_prescribe": True,
+            "monitoring_plan": ["Routine clinical monitoring"],
+            "llm_reasoning": (
+                f"Rule engine: no known interactions, allergies, formulary contraindications "
+                f"or geriatric/renal rule hits for {', '.join(new_medications)}."
+            ),
+            "confidence_score": 0.9,
+        })
+        return result
+
+    def _major_result(self, patient_data: Dict, interactions: List[Dict],
+                      allergy_hits: List, contraindication_hits: List) -> Dict:
+        result = self._base_result(patient_data)
+        for row in interactions:
+            severity = str(row.get("severity", "MODERATE")).upper()
+            description = row.get("description") or row.get("clinical_effect") or "Known drug interaction"
+            result["warnings"].append({
+                "severity": severity if severity in ("MAJOR", "MODERATE", "MINOR") else "MODERATE",
+                "type": "DRUG_INTERACTION",
+                "drugs_involved": [row.get("drug_a"), row.get("drug_b")],
+                "description": description,
+                "clinical_significance": row.get("clinical_effect") or description,
+                "recommendation": row.get("recommendation") or "Avoid combination or choose an alternative",
+                "monitoring_required": row.get("monitoring") or "Close clinical monitoring if co-prescribed",
+            })
+            if row.get("monitoring"):
+                result["monitoring_plan"].append(row["monitoring"])
+        for hit in allergy_hits:
+            result["warnings"].append(hit.to_warning())
+        for hit in contraindication_hits:
+            result["contraindications"].append(hit.to_dict())
+        if not result["monitoring_plan"]:
+            result["monitoring_plan"] = ["Pharmacist review before prescribing"]
+
+        findings = len(interactions) + len(allergy_hits) + len(contraindication_hits)
+        result.update({
+            "overall_risk_level": "MAJOR",
+            "safe_to_prescribe": False,
+            "llm_reasoning": (
+                f"Rule engine: {findings} knowledge-base finding(s) including a MAJOR "
+                f"interaction, direct allergy or formulary contraindication."
+            ),
+            "confidence_score": 0.95,
+        })
+        return result
+
+    def stats(self) -> Dict:
+        """Statistik keputusan rule engine untuk monitoring."""
+        decided = self.decided_safe + self.decided_major
+        return {
+            "enabled": self.enabled,
+            "evaluated": self.evaluated,
+            "decided_safe": self.decided_safe,
+            "decided_major": self.decided_major,
+            "deferred_to_llm": self.deferred,
+            "fast_path_ratio": f"{(decided / max(self.evaluated, 1)) * 100:.1f}%",
+            "defer_reasons": dict(self.defer_reasons),
+        }
+
+
+# Global instance
+rule_engine = RuleEngine()
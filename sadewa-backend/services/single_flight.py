@@ -0,0 +1,60 @@
+"""
+Single-flight request coalescing untuk SADEWA
+Request identik yang datang bersamaan (double-click, beberapa apoteker membuka
+resep yang sama) menunggu SATU eksekusi bersama, bukan memanggil LLM berkali-kali.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """Coalesce pemanggilan async dengan key yang sama selama masih in-flight."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Jalankan func() untuk key, atau tunggu eksekusi yang sedang berjalan.
+        Return (hasil, shared); shared=True jika caller ikut menunggu eksekusi
+        milik request lain. Eksekusi berjalan sebagai task tersendiri, sehingga
+        request pertama yang dibatalkan (client disconnect) tidak ikut
+        membatalkan request lain yang menunggu hasil yang sama.
+        """
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(func())
+        self._in_flight[key] = task
+        self.executions += 1
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), False
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if task.cancelled() or task.exception() is not None:
+            self.failures += 1
+
+    def stats(self) -> Dict:
+        """Statistik coalescing untuk monitoring."""
+        total = self.executions + self.coalesced
+        return {
+            "name": self.name,
+            "in_flight": len(self._in_flight),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "coalesced_ratio": f"{(self.coalesced / max(total, 1)) * 100:.1f}%",
+        }
+
+
+# Global instances
+interaction_analysis_flight = SingleFlight("interaction_analysis")
+drug_interaction_flight = SingleFlight("drug_interaction_analysis")
@@ -0,0 +1,97 @@
+"""
+Term Scanner untuk SADEWA
+Satu automaton Aho-Corasick atas semua alias obat, sehingga scan daftar obat
+cukup satu pass linear berapapun jumlah alias di kamus. Automaton dibangun ulang
+hanya ketika kamus obat berubah.
+
+Term rule klinis (kelas obat, keyword kondisi di teks diagnosis) tidak ada di
+sini: kelas obat di-resolve lewat data/drug_classes.json (allergen_index) dan
+keyword diagnosis dikompilasi oleh clinical_rules.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from services.aho_corasick import AhoCorasick
+from services.drug_canonicalizer import drug_canonicalizer, normalize_drug_text
+
+
+class TermHits:
+    """Hasil scan satu entri teks."""
+
+    __slots__ = ("drug_id", "drug_ids")
+
+    def __init__(self, drug_id: Optional[str], drug_ids: List[str]):
+        self.drug_id = drug_id
+        self.drug_ids = drug_ids
+
+    def __repr__(self):
+        return f"<TermHits(drug_id='{self.drug_id}', drug_ids={self.drug_ids})>"
+
+
+class TermScanner:
+    """Automaton alias obat, terikat ke generasi kamus obat."""
+
+    def __init__(self):
+        self._automaton: Optional[AhoCorasick] = None
+        self._generation = -1
+        self._builds = 0
+        self._lock = threading.Lock()
+
+    def _current(self) -> AhoCorasick:
+        """Automaton aktif; dibangun ulang jika kamus obat sudah berubah."""
+        if self._automaton is None or drug_canonicalizer.generation != self._generation:
+            with self._lock:
+                aliases = drug_canonicalizer.alias_items()
+                generation = drug_canonicalizer.generation
+                if self._automaton is None or generation != self._generation:
+                    self._build(aliases, generation)
+        return self._automaton
+
+    def _build(self, aliases, generation: int) -> None:
+        """Compile semua alias obat."""
+        automaton = AhoCorasick()
+        for alias, drug_id in aliases:
+            automaton.add(alias, drug_id)
+        self._automaton = automaton.build()
+        self._generation = generation
+        self._builds += 1
+
+    def scan(self, value: str) -> TermHits:
+        """Scan satu entri obat dalam satu pass."""
+        automaton = self._current()
+        normalized = " ".join(normalize_drug_text(value))
+        size = len(normalized)
+
+        best = None
+        drug_ids: List[str] = []
+        for start, end, drug_id in automaton.iter_matches(normalized):
+            if (start and normalized[start - 1] != " ") or (end < size and normalized[end] != " "):
+                continue
+            if best is None or start < best[0] or (start == best[0] and end > best[1]):
+                best = (start, end, drug_id)
+            if drug_id not in drug_ids:
+                drug_ids.append(drug_id)
+
+        drug_id = best[2] if best else drug_canonicalizer.canonical_id(value)
+        return TermHits(drug_id, drug_ids)
+
+    def scan_all(self, values: Iterable[str]) -> List[TermHits]:
+        """Scan daftar entri (urutan dipertahankan)."""
+        return [self.scan(value) for value in values]
+
+    def drug_id(self, value: str) -> str:
+        """Drug ID kanonik (leftmost-longest) untuk satu entri obat."""
+        return self.scan(value).drug_id
+
+    def stats(self) -> Dict:
+        """Statistik automaton untuk monitoring."""
+        automaton = self._automaton
+        return {
+            "patterns": automaton.pattern_count if automaton else 0,
+            "dictionary_generation": self._generation,
+            "builds": self._builds,
+        }
+
+
+# Global instance
+term_scanner = TermScanner()
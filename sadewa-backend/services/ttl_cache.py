@@ -0,0 +1,165 @@
+"""
+Bounded LRU + TTL cache untuk SADEWA
+Cache in-process dengan batas jumlah entry DAN batas ukuran (byte), TTL per
+entry, sweep expiry di background, serta counter hit/miss/eviction yang nyata.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class _Entry:
+    """Satu entry cache."""
+
+    __slots__ = ("value", "expires_at", "size")
+
+    def __init__(self, value: Any, expires_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+
+def estimate_size(value: Any) -> int:
+    """Estimasi ukuran entry dalam byte (panjang serialisasi JSON-nya)."""
+    try:
+        return len(json.dumps(value, default=str, ensure_ascii=False).encode("utf-8"))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+class TTLCache:
+    """LRU cache dengan TTL per entry, batas entry, dan batas byte."""
+
+    def __init__(self, name: str, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 default_ttl: float = 3600.0):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._sweeper: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires_at > time.monotonic()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Ambil value (dan tandai sebagai baru dipakai); None jika miss/expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """Simpan value; entry lama (LRU) dikeluarkan sampai batas terpenuhi."""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            self.rejected += 1
+            return False
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def delete(self, key: Hashable) -> bool:
+        """Hapus satu entry."""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def clear(self) -> int:
+        """Kosongkan cache; return jumlah entry yang dihapus."""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            return count
+
+    def purge_expired(self) -> int:
+        """Hapus semua entry yang sudah expired; return jumlahnya."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+        return len(expired)
+
+    def _remove(self, key: Hashable) -> None:
+        """Hapus entry (lock harus sudah dipegang)."""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    # ----- background sweep -----
+
+    def start_sweeper(self, interval: float = 60.0) -> None:
+        """Mulai task background yang membuang entry expired secara berkala."""
+        if self._sweeper is not None and not self._sweeper.done():
+            return
+        self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop(interval))
+
+    async def stop_sweeper(self) -> None:
+        """Hentikan task sweep (dipanggil saat shutdown)."""
+        if self._sweeper is None:
+            return
+        self._sweeper.cancel()
+        try:
+            await self._sweeper
+        except asyncio.CancelledError:
+            pass
+        self._sweeper = None
+
+    async def _sweep_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.purge_expired()
+
+    def stats(self) -> Dict:
+        """Statistik cache untuk monitoring."""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.default_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": f"{(self.hits / max(lookups, 1)) * 100:.1f}%",
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rejected_oversize": self.rejected,
+            "sweeper_running": self._sweeper is not None and not self._sweeper.done(),
+        }